@@ -0,0 +1,134 @@
+"""
+Throughput of the artifact extractor on a fixed corpus, in MB/s of decoded body.
+
+    python -m benchmarks.bench_artifacts
+    python -m benchmarks.bench_artifacts --corpus saved_pages/ --keywords 10,100,1000
+
+Artifacts are added to a fraction of the generated pages: emails, Bitcoin and Monero addresses,
+PGP public key blocks and onion addresses in plain text. Reported are:
+
+- each type alone, all types in one pass, and all types in one pass per type,
+  to see that adding a type doesn't add a pass over the body;
+- a single alternation of the full patterns of all types, which is the obvious way to combine them;
+- keyword lists of several sizes, matched by the trie pattern and by a plain alternation;
+- `scrape_page` with and without all the artifacts, to see their share of the cost of a page.
+"""
+import argparse
+import random
+import re
+import time
+from typing import Any, Callable
+
+from hiddenbot.crawl.artifacts import (
+    ARTIFACT_TYPES, BASE58, PGP_BEGIN, PGP_END, TOKEN_TYPES, ArtifactExtractor
+)
+from hiddenbot.crawl.extractor import scrape_page
+
+from .corpus import WORDS, load_corpus, onion_host, sentence
+
+
+ORIGIN_URL = "http://" + "a" * 56 + ".onion/"
+
+# Valid Bitcoin addresses
+BTC_ADDRESSES = [
+    "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa",
+    "3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy",
+    "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq",
+]
+
+# Full patterns of the types, for the alternation compared with the extractor
+FULL_PATTERNS = {
+    'emails': r"[A-Za-z0-9._%+-]{1,64}@[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63})*\.[A-Za-z]{2,24}\b",
+    'btc': r"\b(?:" + TOKEN_TYPES['btc'].pattern + r")\b",
+    'xmr': r"\b" + TOKEN_TYPES['xmr'].pattern + r"\b",
+    'pgp': re.escape(PGP_BEGIN) + r".{0,65536}?" + re.escape(PGP_END),
+    'onions': r"\b" + TOKEN_TYPES['onions'].pattern + r"\b",
+}
+
+
+def add_artifacts(rnd: random.Random, page: str) -> str:
+    """
+    Add a paragraph of artifacts to the end of the body.
+    """
+    xmr = '4' + rnd.choice('123456789AB') + ''.join(rnd.choice(BASE58) for _ in range(93))
+    pgp = f"<pre>{PGP_BEGIN}\n\n" + "\n".join(
+        ''.join(rnd.choice(BASE58) for _ in range(64)) for _ in range(20)) + f"\n{PGP_END}</pre>"
+    artifacts = [
+        f"{rnd.choice(WORDS)}{rnd.randint(1, 999)}@{rnd.choice(WORDS)}.com",
+        rnd.choice(BTC_ADDRESSES),
+        xmr,
+        onion_host(rnd),
+        pgp if rnd.random() < 0.2 else "",
+    ]
+    paragraph = "<p>" + " ".join(f"{sentence(rnd, 5)} {a}" for a in artifacts) + "</p>"
+    return page.replace("</body>", paragraph + "</body>")
+
+
+def best_time(func: Callable[[str], Any], pages: list[str], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for page in pages:
+            func(page)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help="Directory of saved `.html` pages.")
+    parser.add_argument('--pages', type=int, default=200, help="Number of generated pages.")
+    parser.add_argument('--artifact-ratio', type=float, default=0.5, help="Ratio of pages with artifacts.")
+    parser.add_argument('--keywords', default='10,100,1000', help="Sizes of keyword lists, separated by commas.")
+    parser.add_argument('--plain-keywords', type=int, default=100,
+                        help="Largest keyword list matched by the plain alternation, which is very slow.")
+    parser.add_argument('--parser', default='auto')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    pages = [
+        add_artifacts(rnd, page) if rnd.random() < args.artifact_ratio else page
+        for page in load_corpus(args.corpus, args.pages)]
+    size = sum(len(p.encode('utf-8')) for p in pages)
+    print(f"Corpus: {len(pages)} pages, {size / 1e6:.1f} MB")
+
+    def report(name: str, func: Callable[[str], Any]) -> None:
+        elapsed = best_time(func, pages, args.repeat)
+        print(f"{name:>36}: {size / elapsed / 1e6:8.2f} MB/s")
+
+    all_types = ArtifactExtractor(tuple(ARTIFACT_TYPES))
+    found = [all_types.extract(p) for p in pages]
+    print("Found: " + ", ".join(f"{sum(len(f.get(t, [])) for f in found)} {t}" for t in ARTIFACT_TYPES))
+
+    for t in ARTIFACT_TYPES:
+        report(f"{t} alone", ArtifactExtractor((t,)).extract)
+    report("all types in one pass", all_types.extract)
+    singles = [ArtifactExtractor((t,)) for t in ARTIFACT_TYPES]
+    report("all types, one pass per type", lambda p: [e.extract(p) for e in singles])
+    alternation = re.compile("|".join(f"(?P<{t}>{p})" for t, p in FULL_PATTERNS.items()), re.S)
+    report("alternation of full patterns", lambda p: [m.lastgroup for m in alternation.finditer(p)])
+
+    for n in [int(n) for n in args.keywords.split(',')]:
+        keywords = list(dict.fromkeys(
+            ''.join(rnd.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rnd.randint(4, 10)))
+            for _ in range(n - 2))) + ['bitcoin', 'escrow']
+        report(f"{n} keywords, trie", ArtifactExtractor((), tuple(keywords)).extract)
+        if n <= args.plain_keywords:
+            plain = re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b")
+            report(f"{n} keywords, plain alternation", lambda p: plain.findall(p.lower()))
+
+    content = [p.encode('utf-8') for p in pages]
+    for name, types in [("scrape_page", ()), ("scrape_page + all artifacts", tuple(ARTIFACT_TYPES))]:
+        elapsed = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for c in content:
+                scrape_page(c, 'utf-8', ORIGIN_URL, 100, args.parser, types)
+            elapsed = min(elapsed, time.perf_counter() - started)
+        print(f"{name:>36}: {size / elapsed / 1e6:8.2f} MB/s")
+
+
+if __name__ == '__main__':
+    main()
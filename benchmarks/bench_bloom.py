@@ -0,0 +1,107 @@
+"""
+Compare the Bloom filter of `--seen-filter` with the in-memory set of seen URLs.
+
+    python -m benchmarks.bench_bloom
+    python -m benchmarks.bench_bloom --sizes 1M,10M
+
+For each size, the filter is filled with URL fingerprints in a temporary directory,
+and bytes per URL, adds and lookups per second and the false positive rate are reported.
+The memory of sets is measured on a sample and scaled, because sets of 100M URLs
+don't fit in the memory of most machines. 100M URLs take about half an hour.
+"""
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+
+from hiddenbot.crawl.bloom import DEFAULT_FP_RATE, ScalableBloomFilter
+from hiddenbot.crawl.canonical import fingerprint
+
+from .corpus import onion_host
+
+
+# Number of URLs to measure the memory of sets
+SET_SAMPLE_SIZE = 1_000_000
+
+
+def parse_count(text: str) -> int:
+    """
+    Parse a count such as `10M` or `500K`.
+    """
+    text = text.strip().upper()
+    unit = {'K': 10 ** 3, 'M': 10 ** 6, 'G': 10 ** 9}.get(text[-1:], 1)
+    return int(float(text.rstrip('KMG')) * unit)
+
+
+def generate_urls(rnd: random.Random, n: int) -> list[str]:
+    hosts = [onion_host(rnd) for _ in range(max(1, n // 100))]
+    return [f"http://{rnd.choice(hosts)}/page/{i}" for i in range(n)]
+
+
+def measure_sets(rnd: random.Random) -> tuple[float, float]:
+    """
+    Bytes per URL of a set of URL strings and of a set of fingerprints.
+    """
+    tracemalloc.start()
+    urls = set(generate_urls(rnd, SET_SAMPLE_SIZE))
+    string_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    fingerprints = set(fingerprint(url) for url in urls)
+    fingerprint_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return string_bytes / len(urls), fingerprint_bytes / len(fingerprints)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10M,100M', help="Numbers of URLs, separated by commas.")
+    parser.add_argument('--fp-rate', type=float, default=DEFAULT_FP_RATE)
+    parser.add_argument('--lookups', type=int, default=1_000_000, help="Number of lookups to time.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+
+    string_bytes, fingerprint_bytes = measure_sets(rnd)
+    print(f"set of URLs:         {string_bytes:8.1f} bytes/URL")
+    print(f"set of fingerprints: {fingerprint_bytes:8.1f} bytes/URL")
+
+    for size in [parse_count(s) for s in args.sizes.split(',')]:
+        with tempfile.TemporaryDirectory() as directory:
+            seen = ScalableBloomFilter(directory, fp_rate=args.fp_rate)
+
+            # Fingerprints of canonical URLs are uniform 64-bit keys.
+            started = time.perf_counter()
+            for _ in range(size):
+                seen.add(rnd.getrandbits(64))
+            add_time = time.perf_counter() - started
+
+            present = [rnd.getrandbits(64) for _ in range(args.lookups)]
+            for key in present:
+                seen.add(key)
+            absent = [rnd.getrandbits(64) for _ in range(args.lookups)]
+
+            started = time.perf_counter()
+            hits = sum(key in seen for key in present)
+            hit_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            false_positives = sum(key in seen for key in absent)
+            miss_time = time.perf_counter() - started
+
+            print(
+                f"Bloom filter {size:>11,} URLs: {seen.nbytes / size:6.2f} bytes/URL "
+                f"({seen.nbytes / 1024 ** 2:.0f} MiB in {len(seen.filters)} filters), "
+                f"{size / add_time:9.0f} adds/s, "
+                f"{args.lookups / hit_time:9.0f} hits/s, {args.lookups / miss_time:9.0f} misses/s, "
+                f"false positive rate {false_positives / args.lookups:.5f}, "
+                f"false negatives {args.lookups - hits}")
+            seen.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,194 @@
+"""
+Crawl a synthetic onion web end to end without Tor.
+
+    python -m benchmarks.bench_crawl
+    python -m benchmarks.bench_crawl --hosts 5000 --concurrency 128 --output after.json --baseline before.json
+
+The site graph of `benchmarks.onionweb` is served in another process,
+and `Crawler` crawls it through a `TorPool` pointed at the local SOCKS5 proxy.
+Pages/s, onions found per minute, distinct onion hosts found per hour, CPU time per page
+and peak RSS of the crawler process are reported. The graph is generated from a seed,
+so runs with the same options are comparable. CPU time of parse workers (`--parse-workers`)
+is not counted.
+
+With `--duration`, the crawl is stopped after that many seconds, to compare how fast
+the strategies (`--strategy bfs` or `discovery`) find new hosts before the crawl is over:
+
+    python -m benchmarks.bench_crawl --pages-per-host 50 --duration 20 --strategy bfs
+    python -m benchmarks.bench_crawl --pages-per-host 50 --duration 20 --strategy discovery
+
+With `--baseline`, the results are compared with a previous `--output`,
+and the exit code is 1 if pages/s dropped more than `--tolerance`.
+"""
+import argparse
+import asyncio
+import json
+import resource
+import sys
+import time
+from typing import Optional
+
+import httpx
+from rich.console import Console
+
+from hiddenbot.crawl.canonical import DEFAULT_STRIP_PARAMS
+from hiddenbot.crawl.crawler import Crawler
+from hiddenbot.crawl.fetch import DEFAULT_MAX_BYTES
+from hiddenbot.crawl.health import DEFAULT_RETRY_BACKOFF, HealthTracker
+from hiddenbot.crawl.metrics import Metrics
+from hiddenbot.crawl.simhash import DEFAULT_MIRROR_DISTANCE
+from hiddenbot.tor import TorPool
+
+from .onionweb import SiteGraph, add_graph_arguments, graph_options, start_server
+
+
+# Results compared with the baseline, and if higher is better
+COMPARED = {
+    'pages_per_second': True,
+    'onions_per_minute': True,
+    'hosts_per_hour': True,
+    'cpu_ms_per_page': False,
+    'peak_rss_mib': False,
+}
+
+
+def peak_rss() -> int:
+    """
+    Peak RSS of this process in bytes.
+    """
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def crawl(args: argparse.Namespace, url: str, metrics: Optional[Metrics]) -> Crawler:
+    health = HealthTracker(args.timeout, retry_backoff=args.retry_backoff, max_retries=args.max_retries)
+    pool = TorPool(
+        [('127.0.0.1', str(args.port))], circuits=args.circuits, health=health, metrics=metrics,
+        timeout=args.timeout,
+        limits=httpx.Limits(max_connections=args.concurrency),
+    )
+    crawler = Crawler(
+        console=Console(quiet=True), pool=pool, url=url,
+        depth=args.depth, delay=args.delay, robots_ttl=86400, concurrency=args.concurrency,
+        max_connections_per_host=args.max_connections_per_host,
+        max_content_length=100, max_bytes=DEFAULT_MAX_BYTES,
+        only_toppage=False, parser=args.parser, parse_workers=args.parse_workers,
+        strip_params=list(DEFAULT_STRIP_PARAMS), mirror_distance=DEFAULT_MIRROR_DISTANCE,
+        output='', verbose=False, strategy=args.strategy, host_budget=args.host_budget)
+    try:
+        await asyncio.wait_for(crawler.run(), args.duration)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        await pool.close()
+    return crawler
+
+
+def compare(results: dict[str, float], baseline: dict[str, float], tolerance: float) -> bool:
+    """
+    Print the change of each result from the baseline.
+
+    Returns
+    ---------------------------------------
+    bool
+        Pages/s did not drop more than the tolerance.
+    """
+    ok = True
+    for name, higher_is_better in COMPARED.items():
+        value = results[name]
+        before = baseline.get(name)
+        if not isinstance(before, (int, float)) or before == 0:
+            continue
+        change = (value - before) / before
+        better = change > 0 if higher_is_better else change < 0
+        print(f"{name:>20}: {before:12.2f} -> {value:12.2f} ({change:+.1%}{', better' if better else ''})")
+        if name == 'pages_per_second' and change < -tolerance:
+            ok = False
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_graph_arguments(parser)
+    parser.add_argument('--port', type=int, default=19150)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--max-connections-per-host', type=int, default=2)
+    parser.add_argument('--circuits', type=int, default=1)
+    parser.add_argument('--delay', type=float, default=0)
+    parser.add_argument('--timeout', type=float, default=60)
+    # Dead hosts are not retried by default, or the crawl would wait for their backoff.
+    parser.add_argument('--retry-backoff', type=float, default=DEFAULT_RETRY_BACKOFF)
+    parser.add_argument('--max-retries', type=int, default=0)
+    parser.add_argument('--parser', default='auto')
+    parser.add_argument('--parse-workers', type=int, default=0)
+    parser.add_argument('--strategy', default='bfs')
+    parser.add_argument('--host-budget', type=int, default=0)
+    parser.add_argument('--duration', type=float, help="Stop the crawl after this many seconds.")
+    parser.add_argument('--stats', action='store_true', help="Also print the stage timings of `--stats`.")
+    parser.add_argument('--output', help="Save the results to this JSON file.")
+    parser.add_argument('--baseline', help="Compare with the results of a previous run.")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Allowed drop of pages/s.")
+    args = parser.parse_args()
+
+    options = graph_options(args)
+    graph = SiteGraph(**options)
+    server = start_server(options, args.port)
+    metrics = Metrics() if args.stats else None
+    try:
+        cpu_started = cpu_time()
+        started = time.perf_counter()
+        crawler = asyncio.run(crawl(args, graph.start_url, metrics))
+        elapsed = time.perf_counter() - started
+        cpu = cpu_time() - cpu_started
+    finally:
+        server.terminate()
+        server.join()
+
+    pages = crawler.scraped
+    hosts = len({onion.host for onion in crawler.onions})
+    results = {
+        'pages': pages,
+        'onions': crawler.num_onions,
+        'hosts': hosts,
+        'mirrors': crawler.num_mirrors,
+        'seconds': elapsed,
+        'pages_per_second': pages / elapsed,
+        'onions_per_minute': crawler.num_onions / elapsed * 60,
+        'hosts_per_hour': hosts / elapsed * 3600,
+        'cpu_ms_per_page': cpu / max(1, pages) * 1000,
+        'peak_rss_mib': peak_rss() / 1024 ** 2,
+    }
+    print(
+        f"Graph: {len(graph.hosts)} hosts, {len(graph.dead)} dead, {len(graph.mirrors)} mirrors, "
+        f"{len(graph.robots)} with robots.txt")
+    for name, value in results.items():
+        print(f"{name:>20}: {value:12.2f}")
+    if metrics is not None:
+        metrics.print_summary(Console())
+
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        different = [
+            name for name, value in vars(args).items()
+            if name not in ('output', 'baseline') and baseline['options'].get(name) != value]
+        if len(different) > 0:
+            print(f"The baseline was run with different options: {', '.join(different)}")
+        if compare(results, baseline['results'], args.tolerance) is False:
+            print(f"pages/s dropped more than {args.tolerance:.0%}.")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
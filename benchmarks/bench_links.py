@@ -0,0 +1,96 @@
+"""
+Compare the link classifier of `extract_links` with the validators-only checks.
+
+    python -m benchmarks.bench_links
+    python -m benchmarks.bench_links --corpus saved_pages/
+
+Links of every page are classified by both, and their results are compared link by link.
+"""
+import argparse
+import time
+from typing import Optional
+from urllib.parse import urljoin
+
+from hiddenbot.crawl.parser import get_parser
+from hiddenbot.crawl.utils import (
+    classify_link, is_http, is_internal_link, is_onion_url, is_url
+)
+
+from .corpus import load_corpus
+
+
+ORIGIN_URL = "http://" + "a" * 56 + ".onion/"
+
+V3 = "b" * 56 + ".onion"
+V2 = "c" * 16 + ".onion"
+
+# Links which are not on the fast path, or are on its edges.
+EDGE_LINKS = [
+    "", "#top", "/", "index.html", "../up", "//" + V3 + "/x", "?page=2", "./a b",
+    f"http://{V3}", f"http://{V3}/", f"https://{V3}/a/b.html", f"http://{V2}/",
+    f"HTTP://{V3.upper()}/", f"http://www.{V3}/", f"http://{V3}:8080/",
+    f"http://user:pass@{V3}/", f"http://{V3}/?q", f"http://{V3}/?q=1&r=2",
+    f"http://{V3}/#frag", f"http://{V3}/a b", f"http://{V3}/\"x", f"http://{V3}/é",
+    f"http://{'d' * 55}.onion/", f"http://{'1' * 56}.onion/", f"ftp://{V3}/",
+    f"{V3}/", "mailto:admin@example.com", "javascript:void(0)", "file:foo",
+    "https://www.example.com/", "http://example.onion.com/", "data:text/html,x",
+    "http:relative", "tel:+123", ":colon", "1:2",
+]
+
+
+def classify_link_validators(origin_url: str, link: str) -> Optional[str]:
+    """
+    Classify a link with the validators for each link, as `extract_links` did.
+    """
+    if link == '' or is_internal_link(link):
+        return None
+    url = link if is_url(link) else urljoin(origin_url, link)
+    if is_http(url) is False or is_onion_url(url) is False:
+        return None
+    return url
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help="Directory of saved `.html` pages.")
+    parser.add_argument('--pages', type=int, default=200, help="Number of generated pages.")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    parse = get_parser('auto')
+    pages = [parse(p).hrefs + EDGE_LINKS for p in load_corpus(args.corpus, args.pages)]
+    num_links = sum(len(hrefs) for hrefs in pages)
+    print(f"Corpus: {len(pages)} pages, {num_links} links")
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        before = [classify_link_validators(ORIGIN_URL, link) for hrefs in pages for link in hrefs]
+        best = min(best, time.perf_counter() - started)
+    print(f"validators:     {num_links / best:12.0f} links/s")
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        classify_link.cache_clear()
+        started = time.perf_counter()
+        after = [classify_link(ORIGIN_URL, link) for hrefs in pages for link in hrefs]
+        best = min(best, time.perf_counter() - started)
+    print(f"fast path:      {num_links / best:12.0f} links/s (cold cache)")
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        [classify_link(ORIGIN_URL, link) for hrefs in pages for link in hrefs]
+        best = min(best, time.perf_counter() - started)
+    print(f"fast path:      {num_links / best:12.0f} links/s (warm cache)")
+
+    links = [link for hrefs in pages for link in hrefs]
+    different = [(link, a, b) for link, a, b in zip(links, before, after) if a != b]
+    accepted = sum(a is not None for a in before)
+    print(f"Accepted: {accepted}/{num_links}, different results: {len(different)}")
+    for link, a, b in different[:10]:
+        print(f"  {link!r}: {a!r} != {b!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+"""
+Requests and freshness of `monitor` on simulated sites, in virtual time.
+
+    python -m benchmarks.bench_monitor
+    python -m benchmarks.bench_monitor --sites 10000 --days 14 --cycle 600
+
+Every site changes at its own Poisson rate, from several times an hour to never,
+and alternates between up and outages. Some sites are dead from the start.
+Cycles run every `--cycle` seconds, and each checks the sites which are due:
+
+- `fixed` checks every site at every cycle, as recrawling from scratch does.
+- `adaptive` schedules the checks with `RevisitPolicy`.
+- `fixed N h` checks every site every N hours, with as many requests as `adaptive`.
+
+Both find changes and outages through the same policy. Reported are the requests
+per cycle, the changes and outages found, and the mean delay until they were found.
+"""
+import argparse
+import bisect
+import math
+import random
+import time
+from typing import Optional
+
+from hiddenbot.crawl.monitor import (
+    DEFAULT_DOWN_FAILURES, DEFAULT_MAX_INTERVAL, CheckResult, RevisitPolicy, Site
+)
+
+
+class SimulatedSite:
+    """
+    Times when a site changes and when it's down, generated from a seed.
+    """
+    def __init__(self, rnd: random.Random, duration: float, args: argparse.Namespace) -> None:
+        self.changes: list[float] = []
+        kind = rnd.random()
+        if kind < args.static_ratio:
+            rate = 0.0
+        else:
+            # Log-uniform between the fastest and the slowest rates
+            rate = math.exp(rnd.uniform(math.log(1 / args.slowest), math.log(1 / args.fastest)))
+        t = rnd.expovariate(rate) if rate > 0 else math.inf
+        while t < duration:
+            self.changes.append(t)
+            t += rnd.expovariate(rate)
+
+        # Starts and ends of outages
+        self.outages: list[tuple[float, float]] = []
+        if rnd.random() < args.dead_ratio:
+            self.outages.append((0.0, math.inf))
+            return
+        t = rnd.expovariate(1 / args.mean_uptime)
+        while t < duration:
+            end = t + rnd.expovariate(1 / args.mean_outage)
+            self.outages.append((t, end))
+            t = end + rnd.expovariate(1 / args.mean_uptime)
+        self.starts = [start for start, _ in self.outages]
+
+
+    def outage(self, t: float) -> Optional[tuple[float, float]]:
+        """
+        The outage at the time, or None if the site is up.
+        """
+        if len(self.outages) == 1 and self.outages[0][1] == math.inf:
+            return self.outages[0]
+        i = bisect.bisect_right(self.starts, t) - 1
+        if i >= 0 and self.outages[i][1] > t:
+            return self.outages[i]
+        return None
+
+
+    def version(self, t: float) -> int:
+        return bisect.bisect_right(self.changes, t)
+
+
+def simulate(
+    sites: list[SimulatedSite],
+    policy: RevisitPolicy,
+    duration: float,
+    cycle: float,
+) -> dict[str, float]:
+    """
+    Run the cycles, and measure requests and how late changes and outages are found.
+    """
+    states = [Site(str(i), 0.0, 0.0) for i in range(len(sites))]
+    # Version of each site when it was up last time, and the last outage found
+    seen_versions = [0] * len(sites)
+    outages: list[Optional[tuple[float, float]]] = [None] * len(sites)
+
+    fetches = 0
+    changes = change_delay = 0.0
+    events = event_delay = 0.0
+    cycles = int(duration // cycle)
+    for k in range(cycles):
+        now = k * cycle
+        for i, (site, state) in enumerate(zip(sites, states)):
+            if state.next_check > now:
+                continue
+            fetches += 1
+            outage = site.outage(now)
+            if outage is not None:
+                outages[i] = outage
+                event = policy.record(state, CheckResult(False), now)
+                if event == 'down':
+                    events += 1
+                    event_delay += now - outage[0]
+                continue
+
+            version = site.version(now)
+            event = policy.record(state, CheckResult(True, 200, digest=str(version)), now)
+            if event == 'changed' or (event == 'up' and version != seen_versions[i]):
+                changes += 1
+                # The first change since the site was seen
+                change_delay += now - site.changes[seen_versions[i]]
+            if event == 'up' and outages[i] is not None:
+                events += 1
+                event_delay += now - outages[i][1]  # type: ignore[index]
+            seen_versions[i] = version
+
+    return {
+        'fetches': fetches,
+        'fetches_per_cycle': fetches / cycles,
+        'changes': changes,
+        'change_delay': change_delay / changes / 3600 if changes > 0 else 0.0,
+        'events': events,
+        'event_delay': event_delay / events / 3600 if events > 0 else 0.0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sites', type=int, default=2000)
+    parser.add_argument('--days', type=float, default=7)
+    parser.add_argument('--cycle', type=float, default=900, help="Seconds between cycles.")
+    parser.add_argument('--max-interval', type=float, default=DEFAULT_MAX_INTERVAL)
+    parser.add_argument('--static-ratio', type=float, default=0.4, help="Ratio of sites which never change.")
+    parser.add_argument('--fastest', type=float, default=1800, help="Mean seconds between changes of the fastest sites.")
+    parser.add_argument('--slowest', type=float, default=30 * 86400)
+    parser.add_argument('--dead-ratio', type=float, default=0.2)
+    parser.add_argument('--mean-uptime', type=float, default=3 * 86400, help="Mean seconds between outages.")
+    parser.add_argument('--mean-outage', type=float, default=6 * 3600)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    duration = args.days * 86400
+    rnd = random.Random(args.seed)
+    sites = [SimulatedSite(rnd, duration, args) for _ in range(args.sites)]
+    print(f"Sites: {args.sites}, {args.days} days, a cycle every {args.cycle:.0f} s, "
+          f"{sum(len(s.changes) for s in sites)} changes, {sum(len(s.outages) for s in sites)} outages")
+
+    policies = [
+        ("fixed", RevisitPolicy(args.cycle, args.cycle, DEFAULT_DOWN_FAILURES)),
+        ("adaptive", RevisitPolicy(args.cycle, args.max_interval, DEFAULT_DOWN_FAILURES)),
+    ]
+    results = {}
+    for name, policy in policies:
+        started = time.perf_counter()
+        r = results[name] = simulate(sites, policy, duration, args.cycle)
+        if name == 'adaptive':
+            # Checking every site less often with as many requests as the adaptive policy
+            interval = args.cycle * math.ceil(results['fixed']['fetches'] / r['fetches'])
+            policies.append((
+                f"fixed {interval / 3600:.1f} h", RevisitPolicy(interval, interval, DEFAULT_DOWN_FAILURES)))
+        print(
+            f"{name:>12}: {r['fetches']:9d} requests, {r['fetches_per_cycle']:8.1f}/cycle, "
+            f"{r['changes']:7.0f} changes found {r['change_delay']:6.2f} h late, "
+            f"{r['events']:6.0f} down/up found {r['event_delay']:6.2f} h late "
+            f"({time.perf_counter() - started:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
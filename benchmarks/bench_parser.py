@@ -0,0 +1,72 @@
+"""
+Compare the HTML parser backends on a fixed corpus.
+
+    python -m benchmarks.bench_parser
+    python -m benchmarks.bench_parser --corpus saved_pages/
+
+Each backend parses every page and runs the extractors used by `Crawler.scrape`.
+The results of the backends are compared page by page.
+"""
+import argparse
+import time
+
+from hiddenbot.crawl.extractor import extract_links, extract_meta_refresh, extract_site_info
+from hiddenbot.crawl.parser import ParsedPage, get_parser
+
+from .corpus import load_corpus
+
+
+ORIGIN_URL = "http://" + "a" * 56 + ".onion/"
+
+
+def scrape(parse, html: str, max_content_length: int) -> tuple:
+    page: ParsedPage = parse(html)
+    return (
+        extract_meta_refresh(page),
+        extract_site_info(page, ORIGIN_URL, max_content_length),
+        extract_links(page, ORIGIN_URL, None),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help="Directory of saved `.html` pages.")
+    parser.add_argument('--pages', type=int, default=200, help="Number of generated pages.")
+    parser.add_argument('--max-content-length', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_corpus(args.corpus, args.pages)
+    size = sum(len(p.encode('utf-8')) for p in pages)
+    print(f"Corpus: {len(pages)} pages, {size / 1e6:.1f} MB")
+
+    results = {}
+    for name in ['bs4', 'lxml']:
+        try:
+            parse = get_parser(name)
+        except Exception as e:
+            print(f"{name:>5}: skipped ({e})")
+            continue
+
+        best_parse = float('inf')
+        best = float('inf')
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            for p in pages:
+                parse(p)
+            best_parse = min(best_parse, time.perf_counter() - started)
+
+            started = time.perf_counter()
+            results[name] = [scrape(parse, p, args.max_content_length) for p in pages]
+            best = min(best, time.perf_counter() - started)
+        print(
+            f"{name:>5}: parse {size / best_parse / 1e6:8.2f} MB/s, "
+            f"parse + extract {len(pages) / best:8.1f} pages/s {size / best / 1e6:8.2f} MB/s")
+
+    if 'bs4' in results and 'lxml' in results:
+        different = sum(a != b for a, b in zip(results['bs4'], results['lxml']))
+        print(f"Pages with different results: {different}/{len(pages)}")
+
+
+if __name__ == '__main__':
+    main()
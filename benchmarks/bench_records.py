@@ -0,0 +1,138 @@
+"""
+Memory per record and serialization speed of `OnionSite`.
+
+    python -m benchmarks.bench_records
+    python -m benchmarks.bench_records --records 1000000 --pages-per-host 20
+
+Records are built as the crawler builds them: every page has its own title, description,
+content and URL strings as the parser returns them, and pages of a site share its title.
+The memory held by the records and their strings is measured with tracemalloc,
+for `OnionSite` with and without the optional fields, and for the plain `__dict__` record
+which it replaced. Serialization compares `to_jsonl` with `json.dumps` of `to_dict`.
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+
+from hiddenbot.crawl.result import OnionSite
+
+from .corpus import onion_host, sentence
+
+
+class DictOnionSite:
+    """
+    The record before it was slotted: attributes in `__dict__` and no interning.
+    """
+    def __init__(
+        self,
+        title: str,
+        description: str,
+        content: str,
+        url: str,
+        mirror_of: Optional[str] = None,
+    ) -> None:
+        self.title = title
+        self.description = description
+        self.content = content
+        self.url = url
+        self.mirror_of = mirror_of
+
+
+    def to_dict(self) -> dict[str, str]:
+        data = {
+            'content': self.content,
+            'description': self.description,
+        }
+        if self.mirror_of is not None:
+            data['mirror_of'] = self.mirror_of
+        data['title'] = self.title
+        data['url'] = self.url
+        return data
+
+
+def generate(records: int, pages_per_host: int, content_length: int, seed: int) -> list[tuple[Any, ...]]:
+    """
+    Fields of the records: title, description, content, URL, depth and parent.
+    Strings are rebuilt for every record when they are used, as a parser would return them.
+    """
+    rnd = random.Random(seed)
+    fields = []
+    for _ in range(0, records, pages_per_host):
+        host = onion_host(rnd)
+        title = sentence(rnd, 5)
+        description = sentence(rnd, 15)
+        top = f"http://{host}/"
+        for i in range(pages_per_host):
+            content = sentence(rnd, content_length // 5)[:content_length]
+            fields.append((title, description, content, f"{top}p{i}.html", min(i, 3), top))
+    return fields[:records]
+
+
+def measure(build: Callable[[tuple[Any, ...]], Any], fields: list[tuple[Any, ...]]) -> tuple[float, list[Any]]:
+    """
+    Bytes allocated per record, including the strings which are not shared with the input.
+    """
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = [build(f) for f in fields]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / len(fields), records
+
+
+def copy(s: str) -> str:
+    # A new string object with the same value, like the parser returns for every page.
+    return (s + '.')[:-1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--records', type=int, default=1_000_000)
+    parser.add_argument('--pages-per-host', type=int, default=10)
+    parser.add_argument('--content-length', type=int, default=100)
+    parser.add_argument('--serialize', type=int, default=200_000, help="Number of records to serialize.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fields = generate(args.records, args.pages_per_host, args.content_length, args.seed)
+    print(f"Records: {len(fields)}, {args.pages_per_host} per host, content of {args.content_length} characters")
+
+    now = time.time()
+    builds: list[tuple[str, Callable[[tuple[Any, ...]], Any]]] = [
+        ("dict record", lambda f: DictOnionSite(copy(f[0]), copy(f[1]), f[2], copy(f[3]))),
+        ("OnionSite", lambda f: OnionSite(copy(f[0]), copy(f[1]), f[2], copy(f[3]))),
+        ("OnionSite + fields", lambda f: OnionSite(
+            copy(f[0]), copy(f[1]), f[2], copy(f[3]), depth=f[4], parent=f[5], fetched_at=now, status=200)),
+    ]
+    serialized: dict[str, list[Any]] = {}
+    for name, build in builds:
+        started = time.perf_counter()
+        per_record, records = measure(build, fields)
+        elapsed = time.perf_counter() - started
+        print(f"{name:>20}: {per_record:8.1f} bytes/record, "
+              f"{per_record * len(fields) / 1024 ** 2:8.1f} MiB in all, built in {elapsed:6.2f} s (traced)")
+        serialized[name] = records[:args.serialize]
+        del records
+
+    print(f"Serialize {args.serialize} records:")
+    dict_records = serialized["dict record"]
+    records = serialized["OnionSite + fields"]
+    cases: list[tuple[str, Callable[[], Any]]] = [
+        ("dict record, json.dumps", lambda: [json.dumps(o.to_dict(), ensure_ascii=False) for o in dict_records]),
+        ("OnionSite, json.dumps", lambda: [json.dumps(o.to_dict(), ensure_ascii=False) for o in records]),
+        ("OnionSite, to_jsonl", lambda: [o.to_jsonl() for o in records]),
+    ]
+    for name, func in cases:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        print(f"{name:>24}: {elapsed / len(records) * 1e6:6.2f} us/record")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Crawl the synthetic onion web with `coordinator` and 1, 2, 4... workers.
+
+    python -m benchmarks.bench_shards
+    python -m benchmarks.bench_shards --hosts 5000 --workers 1,2,4,8 --concurrency 32
+
+Every worker is a `hiddenbot worker` process with `--concurrency` requests in flight,
+started by the coordinator on this machine. Onion sites found per second are reported
+with the speedup over one worker. Throughput scales with the workers until the CPU cores
+or the onion web server, which runs in one process, are saturated.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .onionweb import SiteGraph, add_graph_arguments, graph_options, start_server
+
+
+def crawl(args: argparse.Namespace, url: str, workers: int, directory: str) -> tuple[float, int]:
+    """
+    Crawl with the workers, and return the seconds and the number of onion sites found.
+    """
+    queue = os.path.join(directory, f"queue-{workers}.db")
+    output = os.path.join(directory, f"onions-{workers}.json")
+    started = time.perf_counter()
+    subprocess.run([
+        sys.executable, '-m', 'hiddenbot', 'coordinator', '-q',
+        '--queue', queue, '--url', url, '--shards', str(workers), '--depth', str(args.depth),
+        '--output', output, '--',
+        '--proxy', f"127.0.0.1:{args.port}", '--tor-check', 'skip', '-q',
+        '--concurrency', str(args.concurrency), '--delay', str(args.delay),
+        '--timeout', str(args.timeout), '--max-retries', '0', '--parser', args.parser,
+    ], check=True)
+    elapsed = time.perf_counter() - started
+    with open(output, encoding='utf-8') as f:
+        return elapsed, len(json.load(f))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_graph_arguments(parser)
+    parser.add_argument('--port', type=int, default=19150)
+    parser.add_argument('--workers', default='1,2,4', help="Numbers of workers, separated by commas.")
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=32, help="Requests in flight per worker.")
+    parser.add_argument('--delay', type=float, default=0)
+    parser.add_argument('--timeout', type=float, default=60)
+    parser.add_argument('--parser', default='auto')
+    args = parser.parse_args()
+
+    options = graph_options(args)
+    graph = SiteGraph(**options)
+    server = start_server(options, args.port)
+    print(f"Graph: {len(graph.hosts)} hosts, {len(graph.dead)} dead, CPU cores: {os.cpu_count()}")
+    base = None
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            for workers in [int(n) for n in args.workers.split(',')]:
+                elapsed, onions = crawl(args, graph.start_url, workers, directory)
+                rate = onions / elapsed
+                base = base or rate
+                print(
+                    f"{workers:3d} workers: {onions:6d} onions in {elapsed:7.2f} s, "
+                    f"{rate:8.2f} onions/s, {rate / base:5.2f}x")
+    finally:
+        server.terminate()
+        server.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""
+Measure the startup time of the CLI.
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 50
+
+Each command runs in a new interpreter, and the median wall time is reported
+with the time over an interpreter which does nothing. `version` and `--help`
+should not load httpx, rich, stem, tld, validators or the HTML parsers.
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+
+COMMANDS = [
+    ('python', None),
+    ('import hiddenbot.main', []),
+    ('hiddenbot version', ['version']),
+    ('hiddenbot --help', ['--help']),
+    ('hiddenbot run --help', ['run', '--help']),
+]
+
+# Modules which must not be loaded by `version`
+HEAVY_MODULES = ['httpx', 'rich', 'stem', 'tld', 'validators', 'bs4', 'lxml', 'asyncio']
+
+
+def command_line(args: Optional[list[str]]) -> list[str]:
+    if args is None:
+        return [sys.executable, '-c', 'pass']
+    if len(args) == 0:
+        return [sys.executable, '-c', 'import hiddenbot.main']
+    return [sys.executable, '-c', 'from hiddenbot.main import app; app()', *args]
+
+
+def measure(cmd: list[str], runs: int) -> float:
+    """
+    Median seconds of running the command.
+    """
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def loaded_modules() -> list[str]:
+    """
+    Heavy modules loaded by `version`.
+    """
+    code = (
+        "import sys\n"
+        "from hiddenbot.main import app\n"
+        "try:\n"
+        "    app(['version'])\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print('loaded:', *(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    for line in output.splitlines():
+        if line.startswith('loaded:'):
+            return line.split()[1:]
+    return []
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    baseline = 0.0
+    for name, command in COMMANDS:
+        elapsed = measure(command_line(command), args.runs)
+        if command is None:
+            baseline = elapsed
+            print(f"{name:>22}: {elapsed * 1000:7.1f} ms")
+        else:
+            print(f"{name:>22}: {elapsed * 1000:7.1f} ms ({(elapsed - baseline) * 1000:+7.1f} ms over python)")
+
+    heavy = loaded_modules()
+    print(f"Heavy modules loaded by `version`: {', '.join(heavy) if heavy else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Fixed corpus of onion pages for benchmarks.
+
+Pages are generated from a seed so that every run uses the same corpus.
+Saved pages can also be loaded from a directory of `.html` files.
+"""
+import os
+import random
+from typing import Optional
+
+
+BASE32 = 'abcdefghijklmnopqrstuvwxyz234567'
+
+WORDS = (
+    "market forum wiki search index onion hidden service link directory "
+    "vendor escrow bitcoin monero privacy tor mirror login register about "
+    "contact news archive library email chat hosting paste drop shop"
+).split()
+
+
+def onion_host(rnd: random.Random, v2: bool = False) -> str:
+    """
+    Generate a random v3 (or v2) onion hostname.
+    """
+    return ''.join(rnd.choice(BASE32) for _ in range(16 if v2 else 56)) + '.onion'
+
+
+def sentence(rnd: random.Random, n: int) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(n))
+
+
+def generate_page(rnd: random.Random, num_links: int, num_paragraphs: int) -> str:
+    """
+    Generate an HTML page with the given number of links and paragraphs.
+    """
+    host = onion_host(rnd)
+    links = []
+    for i in range(num_links):
+        r = rnd.random()
+        if r < 0.5:
+            href = f"http://{onion_host(rnd, v2=rnd.random() < 0.1)}/"
+        elif r < 0.7:
+            href = f"/{sentence(rnd, 1)}/{i}.html"
+        elif r < 0.8:
+            href = f"#{sentence(rnd, 1)}"
+        elif r < 0.9:
+            href = f"https://www.example{i % 50}.com/{sentence(rnd, 1)}"
+        else:
+            href = f"http://{host}/{sentence(rnd, 1)}?page={i}"
+        links.append(f'<li><a href="{href}">{sentence(rnd, 3)}</a></li>')
+
+    paragraphs = [f"<p>{sentence(rnd, rnd.randint(20, 80))}</p>" for _ in range(num_paragraphs)]
+
+    return (
+        "<!DOCTYPE html>\n<html>\n<head>\n"
+        f"<title>{sentence(rnd, 4)}</title>\n"
+        f'<meta name="description" content="{sentence(rnd, 12)}">\n'
+        '<meta charset="utf-8">\n'
+        "<script>var x = 1; function f() { return x + 1; }</script>\n"
+        "<style>body { color: #333; }</style>\n"
+        "</head>\n<body>\n"
+        f"<div class=\"header\"><h1>{sentence(rnd, 3)}</h1></div>\n"
+        + "\n".join(paragraphs) +
+        "\n<ul>\n" + "\n".join(links) + "\n</ul>\n"
+        "<!-- footer -->\n<div class=\"footer\">© onion</div>\n"
+        "</body>\n</html>\n"
+    )
+
+
+def generate_corpus(num_pages: int = 200, seed: int = 0) -> list[str]:
+    """
+    Generate the corpus: mostly small pages and some large index pages.
+    """
+    rnd = random.Random(seed)
+    pages = []
+    for i in range(num_pages):
+        if i % 20 == 0:
+            # Link directory with thousands of links
+            pages.append(generate_page(rnd, num_links=rnd.randint(2000, 10000), num_paragraphs=5))
+        else:
+            pages.append(generate_page(rnd, num_links=rnd.randint(10, 200), num_paragraphs=rnd.randint(3, 30)))
+    return pages
+
+
+def load_corpus(directory: Optional[str] = None, num_pages: int = 200, seed: int = 0) -> list[str]:
+    """
+    Load saved pages from a directory, or generate the corpus if it's not given.
+    """
+    if directory is None:
+        return generate_corpus(num_pages, seed)
+
+    pages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.html') or name.endswith('.htm'):
+            with open(os.path.join(directory, name), encoding='utf-8', errors='replace') as f:
+                pages.append(f.read())
+    return pages
@@ -0,0 +1,292 @@
+"""
+Synthetic onion web served locally, to crawl without Tor.
+
+    python -m benchmarks.onionweb --port 19150 --hosts 2000
+
+The graph is generated from a seed: thousands of onion hosts with pages of a given size
+and link fan-out, latencies drawn from a log-normal distribution, dead hosts,
+mirrors serving the pages of another host and robots.txt files.
+It's served by a SOCKS5 proxy which answers HTTP itself, so `hiddenbot run -x 127.0.0.1:PORT`
+crawls it as if it were Tor. Dead hosts fail at the SOCKS handshake like unreachable onion services.
+"""
+import argparse
+import asyncio
+import math
+import multiprocessing
+import random
+from typing import Any, Optional
+
+from .corpus import onion_host, sentence
+
+
+# SOCKS5 replies
+SOCKS_SUCCEEDED = 0x00
+SOCKS_HOST_UNREACHABLE = 0x04
+
+
+class SiteGraph:
+    """
+    Onion hosts and their pages, generated from a seed.
+
+    Every host has a top page and `pages_per_host - 1` pages at `/p{i}.html`.
+    Pages link to other hosts and to pages of their own host.
+
+    Parameters
+    ---------------------------------------
+    hosts: int
+        Number of onion hosts.
+    pages_per_host: int
+        Number of pages of each host.
+    fan_out: int
+        Number of links in each page.
+    page_bytes: int
+        Average size of a page. Sizes vary from half to one and a half of it.
+    latency: float
+        Median seconds to the response headers.
+    latency_sigma: float
+        Sigma of the log-normal distribution of latencies.
+    dead_ratio: float
+        Ratio of hosts which are unreachable.
+    mirror_ratio: float
+        Ratio of hosts which serve the pages of another host.
+    robots_ratio: float
+        Ratio of hosts which have robots.txt.
+    seed: int
+        Seed of the graph.
+    """
+    def __init__(
+        self,
+        hosts: int = 2000,
+        pages_per_host: int = 10,
+        fan_out: int = 8,
+        page_bytes: int = 8 * 1024,
+        latency: float = 0.05,
+        latency_sigma: float = 0.5,
+        dead_ratio: float = 0.1,
+        mirror_ratio: float = 0.05,
+        robots_ratio: float = 0.3,
+        seed: int = 0,
+    ) -> None:
+        self.pages_per_host = pages_per_host
+        self.fan_out = fan_out
+        self.page_bytes = page_bytes
+        self.latency_sigma = latency_sigma
+        self.seed = seed
+
+        rnd = random.Random(seed)
+        self.hosts = [onion_host(rnd) for _ in range(hosts)]
+        self.latencies = {h: latency * rnd.lognormvariate(0, latency_sigma) for h in self.hosts}
+        # The first host is the start of the crawl, so it's always alive and original.
+        others = self.hosts[1:]
+        self.dead = set(rnd.sample(others, int(len(others) * dead_ratio)))
+        alive = [h for h in others if h not in self.dead]
+        self.mirrors = {
+            h: rnd.choice(self.hosts[:1] + [o for o in alive[:len(alive) // 2] if o != h])
+            for h in rnd.sample(alive, int(len(alive) * mirror_ratio))}
+        self.robots = set(rnd.sample(self.hosts, int(len(self.hosts) * robots_ratio)))
+
+
+    @property
+    def start_url(self) -> str:
+        return f"http://{self.hosts[0]}/"
+
+
+    def page(self, host: str, path: str) -> Optional[str]:
+        """
+        Generate the page at the path, or None if it doesn't exist.
+        """
+        if path != '/' and not (path.startswith('/p') and path.endswith('.html')
+                                and path[2:-5].isdigit() and int(path[2:-5]) < self.pages_per_host):
+            return None
+        # Mirrors serve the same text and links as their original host.
+        source = self.mirrors.get(host, host)
+        rnd = random.Random(f"{self.seed}|{source}|{path}")
+
+        links = []
+        for i in range(self.fan_out):
+            r = rnd.random()
+            if r < 0.5:
+                href = f"http://{rnd.choice(self.hosts)}/"
+            elif r < 0.7:
+                href = f"http://{rnd.choice(self.hosts)}/p{rnd.randrange(self.pages_per_host)}.html"
+            else:
+                href = f"/p{rnd.randrange(self.pages_per_host)}.html"
+            links.append(f'<li><a href="{href}">{sentence(rnd, 3)}</a></li>')
+
+        paragraphs = []
+        size = int(self.page_bytes * rnd.uniform(0.5, 1.5))
+        while size > 0:
+            paragraph = f"<p>{sentence(rnd, rnd.randint(20, 80))}</p>"
+            paragraphs.append(paragraph)
+            size -= len(paragraph)
+
+        return (
+            "<!DOCTYPE html>\n<html>\n<head>\n"
+            f"<title>{sentence(rnd, 4)}</title>\n"
+            f'<meta name="description" content="{sentence(rnd, 12)}">\n'
+            "</head>\n<body>\n"
+            + "\n".join(paragraphs) +
+            "\n<ul>\n" + "\n".join(links) + "\n</ul>\n"
+            "</body>\n</html>\n"
+        )
+
+
+    def robots_txt(self, host: str) -> Optional[str]:
+        if host not in self.robots:
+            return None
+        return "User-agent: *\nDisallow: /p1.html\nDisallow: /p2.html\n"
+
+
+class OnionWebServer:
+    """
+    SOCKS5 proxy which serves the pages of a site graph over HTTP/1.1.
+    """
+    def __init__(self, graph: SiteGraph) -> None:
+        self.graph = graph
+        self.rnd = random.Random(graph.seed)
+        self.requests = 0
+
+
+    def delay(self, host: str) -> float:
+        return self.rnd.lognormvariate(math.log(self.graph.latencies[host]), self.graph.latency_sigma / 2)
+
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            host = await self.handshake(reader, writer)
+            if host is not None:
+                await self.serve(host, reader, writer)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def handshake(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[str]:
+        """
+        Accept a SOCKS5 CONNECT, with or without credentials, and return the host.
+        """
+        _, num_methods = await reader.readexactly(2)
+        methods = await reader.readexactly(num_methods)
+        if 2 in methods:
+            # Username and password, which Tor uses for stream isolation
+            writer.write(b"\x05\x02")
+            await reader.readexactly(1)
+            await reader.readexactly((await reader.readexactly(1))[0])
+            await reader.readexactly((await reader.readexactly(1))[0])
+            writer.write(b"\x01\x00")
+        else:
+            writer.write(b"\x05\x00")
+
+        _, _, _, address_type = await reader.readexactly(4)
+        if address_type != 3:
+            return None
+        host = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+        await reader.readexactly(2)
+
+        if host not in self.graph.latencies or host in self.graph.dead:
+            # Unreachable onion services take a while to fail.
+            await asyncio.sleep(self.delay(self.graph.hosts[0]) * 4)
+            writer.write(bytes([5, SOCKS_HOST_UNREACHABLE, 0, 1]) + b"\0" * 6)
+            await writer.drain()
+            return None
+        writer.write(bytes([5, SOCKS_SUCCEEDED, 0, 1]) + b"\0" * 6)
+        await writer.drain()
+        return host
+
+
+    async def serve(self, host: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer HTTP/1.1 requests on a kept-alive connection.
+        """
+        while True:
+            line = await reader.readline()
+            if line == b'':
+                return
+            path = line.split()[1].decode().split('?')[0]
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+
+            self.requests += 1
+            await asyncio.sleep(self.delay(host))
+
+            content_type = 'text/html; charset=utf-8'
+            body = self.graph.robots_txt(host) if path == '/robots.txt' else self.graph.page(host, path)
+            if path == '/robots.txt':
+                content_type = 'text/plain'
+            status = '200 OK' if body is not None else '404 Not Found'
+            data = (body or "<html><body>Not Found</body></html>").encode('utf-8')
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+            await writer.drain()
+
+
+async def serve(graph: SiteGraph, port: int, ready: Optional[Any] = None) -> None:
+    server = OnionWebServer(graph)
+    s = await asyncio.start_server(server.handle, '127.0.0.1', port, backlog=1024)
+    if ready is not None:
+        ready.set()
+    async with s:
+        await s.serve_forever()
+
+
+def run_server(options: dict[str, Any], port: int, ready: Optional[Any] = None) -> None:
+    asyncio.run(serve(SiteGraph(**options), port, ready))
+
+
+def start_server(options: dict[str, Any], port: int) -> multiprocessing.Process:
+    """
+    Serve the graph in another process, so that its CPU time is not counted as the crawler's.
+    """
+    ready = multiprocessing.Event()
+    process = multiprocessing.Process(target=run_server, args=(options, port, ready), daemon=True)
+    process.start()
+    while ready.wait(0.1) is False:
+        if process.is_alive() is False:
+            raise Exception(f"The onion web server could not listen on port {port}.")
+    return process
+
+
+def add_graph_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--hosts', type=int, default=2000)
+    parser.add_argument('--pages-per-host', type=int, default=10)
+    parser.add_argument('--fan-out', type=int, default=8)
+    parser.add_argument('--page-bytes', type=int, default=8 * 1024)
+    parser.add_argument('--latency', type=float, default=0.05, help="Median seconds to the response headers.")
+    parser.add_argument('--latency-sigma', type=float, default=0.5)
+    parser.add_argument('--dead-ratio', type=float, default=0.1)
+    parser.add_argument('--mirror-ratio', type=float, default=0.05)
+    parser.add_argument('--robots-ratio', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def graph_options(args: argparse.Namespace) -> dict[str, Any]:
+    """
+    Parameters of the graph in the arguments, to generate the same graph in the server process.
+    """
+    return {
+        'hosts': args.hosts, 'pages_per_host': args.pages_per_host, 'fan_out': args.fan_out,
+        'page_bytes': args.page_bytes, 'latency': args.latency, 'latency_sigma': args.latency_sigma,
+        'dead_ratio': args.dead_ratio, 'mirror_ratio': args.mirror_ratio,
+        'robots_ratio': args.robots_ratio, 'seed': args.seed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=19150)
+    add_graph_arguments(parser)
+    args = parser.parse_args()
+
+    graph = SiteGraph(**graph_options(args))
+    print(f"Serving {len(graph.hosts)} onion hosts on socks5://127.0.0.1:{args.port}")
+    print(f"Start URL: {graph.start_url}")
+    try:
+        asyncio.run(serve(graph, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+from .main import app
+
+
+app(prog_name="hiddenbot")
@@ -1,7 +1,11 @@
-from bs4 import BeautifulSoup
-import httpx
-from typing import Optional
+import json
+import os
 import re
+import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import httpx
 
 # Default SOCKS5 proxy
 DEFAULT_SOCKS5_HOST = '127.0.0.1'
@@ -9,6 +13,18 @@ DEFAULT_SOCKS5_PORT = '9050'
 
 # Regular expressions
 REGEX_IPV4_ADDRESS = '((25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])\.){3}(25[0-5]|2[0-4][0-9]|1[0-9][0-9]|[1-9]?[0-9])'
+# Parts of the page of check.torproject.org
+REGEX_TOR_CHECK_CONTENT = re.compile(r'<div[^>]*class=["\']?[^"\'>]*\bcontent\b[^>]*>(.*)', re.S)
+REGEX_TOR_CHECK_H1 = re.compile(r'<h1[^>]*>(.*?)</h1>', re.S)
+REGEX_TOR_CHECK_IP = re.compile(r'Your IP address[^<]*(?:<[^>]*>\s*)*(' + REGEX_IPV4_ADDRESS + ')')
+
+# How to check the Tor connection before crawling:
+# `full` requests check.torproject.org, `probe` only does a SOCKS5 handshake with the proxy.
+TOR_CHECK_MODES = ['full', 'probe', 'skip']
+# Seconds in which a successful full check of a proxy is reused
+DEFAULT_TOR_CHECK_TTL = 60 * 60
+# Seconds to wait for the SOCKS5 handshake of the probe
+TOR_PROBE_TIMEOUT = 5.0
 
 
 def get_proxy(proxy: str) -> Optional[tuple[str, str]]:
@@ -22,13 +38,28 @@ def get_proxy(proxy: str) -> Optional[tuple[str, str]]:
         return None
 
 
-def check_tor(client: httpx.Client) -> tuple[bool, str]:
+def parse_size(size: str) -> Optional[int]:
+    """
+    Parse a size such as `2MB`, `512KB` or `1024` into bytes.
+    Units are binary (1KB = 1024 bytes). A negative size means unlimited and returns `-1`.
+    """
+    matched = re.fullmatch(r'\s*(-?\d+(?:\.\d+)?)\s*([KMG]?)B?\s*', size, re.I)
+    if matched is None:
+        return None
+    number = float(matched.group(1))
+    if number < 0:
+        return -1
+    unit = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}[matched.group(2).upper()]
+    return int(number * unit)
+
+
+async def check_tor(client: 'httpx.AsyncClient') -> tuple[bool, str]:
     """
     Check if user is using Tor proxy by accessing `check.torproject.org`.
 
     Parameters
     ---------------------------------------
-    client: httpx.Client
+    client: httpx.AsyncClient
         A httpx client to request
 
     Returns
@@ -41,31 +72,108 @@ def check_tor(client: httpx.Client) -> tuple[bool, str]:
     url = "https://check.torproject.org/"
 
     try:
-        resp = client.get(url)
+        resp = await client.get(url)
     except Exception as e:
         raise Exception(f"Could not access to {url}. Check proxy setting.")
 
-    soup = BeautifulSoup(resp.text, 'html.parser')
-    content = soup.find("div", {"class": "content"})
+    # The page is small and fixed, so it's read with regular expressions
+    # instead of loading an HTML parser at every start.
+    content = REGEX_TOR_CHECK_CONTENT.search(resp.text)
     if not content:
         raise Exception("could not find content.")
-    
-    h1_tag = content.find('h1')
+
+    h1_tag = REGEX_TOR_CHECK_H1.search(content.group(1))
     if not h1_tag:
         raise Exception("could not find `h1` tag.")
 
     connected: bool = False
-    if "Congratulations" in h1_tag.text:
+    if "Congratulations" in h1_tag.group(1):
         connected = True
 
     # Get Tor IP address
     ip: str = ""
-    p_tags = content.find_all('p')
-    for p_tag in p_tags:
-        if "Your IP address" in p_tag.text:
-            re_ipv4 = re.compile(REGEX_IPV4_ADDRESS)
-            results = re.search(re_ipv4, p_tag.text)
-            if results:
-                ip = results.group()
-
-    return connected, ip
\ No newline at end of file
+    results = REGEX_TOR_CHECK_IP.search(content.group(1))
+    if results:
+        ip = results.group(1)
+
+    return connected, ip
+
+
+def get_cache_dir() -> str:
+    """
+    Get the directory of files cached between runs, e.g. `~/.cache/hiddenbot`.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'hiddenbot')
+
+
+def load_tor_check(proxy: str, ttl: float) -> Optional[str]:
+    """
+    Get the Tor IP address of a successful check of the proxy within the TTL.
+
+    Parameters
+    ---------------------------------------
+    proxy: str
+        Proxy URL e.g. `socks5://127.0.0.1:9050`.
+    ttl: float
+        Seconds in which the check is reused.
+
+    Returns
+    ---------------------------------------
+    Optional[str]
+        Tor IP address, or None if the proxy has to be checked.
+    """
+    try:
+        with open(os.path.join(get_cache_dir(), 'tor-check.json'), encoding='utf-8') as f:
+            entry = json.load(f).get(proxy)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(entry, dict) or time.time() - entry.get('checked_at', 0) >= ttl:
+        return None
+    return entry.get('ip')
+
+
+def save_tor_check(proxy: str, ip: str) -> None:
+    """
+    Save a successful check of the proxy.
+    """
+    path = os.path.join(get_cache_dir(), 'tor-check.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        entries = {}
+    if not isinstance(entries, dict):
+        entries = {}
+    entries[proxy] = {'checked_at': time.time(), 'ip': ip}
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(entries, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        # The check is only done again next time.
+        pass
+
+
+async def probe_socks(host: str, port: str, timeout: float = TOR_PROBE_TIMEOUT) -> bool:
+    """
+    Check that a SOCKS5 proxy accepts connections, with a handshake and no request through it.
+    It doesn't prove that the proxy is Tor.
+    """
+    import asyncio
+
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, int(port)), timeout)
+    except (OSError, ValueError, asyncio.TimeoutError):
+        return False
+    try:
+        # Version 5, one method: no authentication
+        writer.write(b"\x05\x01\x00")
+        reply = await asyncio.wait_for(reader.readexactly(2), timeout)
+        return reply == b"\x05\x00"
+    except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+        return False
+    finally:
+        writer.close()
\ No newline at end of file
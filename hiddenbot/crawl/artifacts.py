@@ -0,0 +1,282 @@
+from functools import lru_cache
+import hashlib
+import html
+import re
+from typing import Callable, Optional
+
+
+# Types of artifacts extracted from pages
+ARTIFACT_TYPES = ['emails', 'btc', 'xmr', 'pgp', 'onions']
+
+# Tokens shorter than this are not addresses. The shortest is a v2 onion address.
+MIN_TOKEN_LENGTH = 16
+# Maximum characters of a PGP key block
+MAX_PGP_BLOCK_LENGTH = 64 * 1024
+
+BASE58 = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+BECH32 = 'qpzry9x8gf2tvdw0s3jn54khce6mua7l'
+
+PGP_BEGIN = "-----BEGIN PGP PUBLIC KEY BLOCK-----"
+PGP_END = "-----END PGP PUBLIC KEY BLOCK-----"
+
+REGEX_EMAIL_LOCAL = re.compile(r"[A-Za-z0-9._%+-]{1,64}\Z")
+REGEX_EMAIL_DOMAIN = re.compile(r"[A-Za-z0-9-]{1,63}(?:\.[A-Za-z0-9-]{1,63})*\.[A-Za-z]{2,24}\b")
+REGEX_LINE_BREAK = re.compile(r"<br\s*/?>\r?\n?", re.I)
+REGEX_TAG = re.compile(r"<[^>]*>")
+
+# Domains of emails which are file names in HTML, e.g. `logo@2x.png`
+EMAIL_FILE_SUFFIXES = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.css', '.js')
+
+
+def is_base58check(address: str) -> bool:
+    """
+    Check the checksum of a legacy Bitcoin address.
+    """
+    n = 0
+    for c in address:
+        n = n * 58 + BASE58.index(c)
+    # Leading '1's are zero bytes.
+    data = b'\x00' * (len(address) - len(address.lstrip('1'))) + n.to_bytes((n.bit_length() + 7) // 8, 'big')
+    if len(data) != 25:
+        return False
+    return hashlib.sha256(hashlib.sha256(data[:-4]).digest()).digest()[:4] == data[-4:]
+
+
+def is_bech32(address: str) -> bool:
+    """
+    Check the checksum of a SegWit Bitcoin address, in Bech32 or Bech32m.
+    """
+    hrp, _, data = address.rpartition('1')
+    values = [ord(c) >> 5 for c in hrp] + [0] + [ord(c) & 31 for c in hrp] + [BECH32.index(c) for c in data]
+    checksum = 1
+    for value in values:
+        top = checksum >> 25
+        checksum = (checksum & 0x1ffffff) << 5 ^ value
+        for i, generator in enumerate((0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3)):
+            if top >> i & 1:
+                checksum ^= generator
+    return checksum in (1, 0x2bc830a3)
+
+
+def is_btc_address(token: str) -> bool:
+    """
+    Check the checksum of a Bitcoin address. Bech32 is checked in lowercase.
+    """
+    if token[:3].lower() == 'bc1':
+        return is_bech32(token.lower())
+    return is_base58check(token)
+
+
+def normalize_btc_address(token: str) -> str:
+    """
+    Lowercase an uppercase Bech32 address, e.g. from a QR code, which is the same address.
+    """
+    return token.lower() if token.startswith('BC1') else token
+
+
+class TokenType:
+    """
+    An artifact which is a long alphanumeric token, e.g. an address.
+
+    Tokens are found in one pass whatever their types are, then classified
+    by a pattern of all the types. A new type of address only adds a pattern to match tokens with,
+    and doesn't make the scan slower.
+
+    Parameters
+    ---------------------------------------
+    name: str
+        Name of the artifacts in the results.
+    pattern: str
+        Regular expression which a token fully matches. Tokens are runs of ASCII letters and digits,
+        followed by `.onion` for onion addresses.
+    validate: Optional[Callable[[str], bool]]
+        Check a matched token e.g. by its checksum.
+    normalize: Optional[Callable[[str], str]]
+        Form of the token in the results.
+    """
+    def __init__(
+        self,
+        name: str,
+        pattern: str,
+        validate: Optional[Callable[[str], bool]] = None,
+        normalize: Optional[Callable[[str], str]] = None,
+    ) -> None:
+        self.name = name
+        self.pattern = pattern
+        self.validate = validate
+        self.normalize = normalize
+
+
+TOKEN_TYPES = {
+    t.name: t for t in [
+        # Bech32 is either all lowercase or all uppercase. Mixed case is invalid.
+        TokenType(
+            'btc', f"[13][{BASE58}]{{25,33}}|bc1[{BECH32}]{{11,71}}|BC1[{BECH32.upper()}]{{11,71}}",
+            validate=is_btc_address, normalize=normalize_btc_address),
+        # Standard addresses and subaddresses, and integrated addresses with a payment ID.
+        # Monero checksums are Keccak, which hashlib doesn't have.
+        TokenType('xmr', f"[48][1-9AB][{BASE58}]{{93}}(?:[{BASE58}]{{11}})?"),
+        TokenType('onions', r"(?i:[a-z2-7]{56}|[a-z2-7]{16})\.onion", normalize=str.lower),
+    ]
+}
+
+
+def trie_pattern(words: list[str]) -> str:
+    """
+    Regular expression which matches any of the words, with their common prefixes merged,
+    e.g. `(?:bitcoin|bit)` becomes `bit(?:coin)?`.
+    The regex engine walks it like a trie, so it doesn't try every word at every position.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for c in word:
+            node = node.setdefault(c, {})
+        # The end of a word
+        node[''] = None
+
+    def build(node: dict) -> str:
+        # Spaces in phrases match any whitespace.
+        branches = [
+            (r"\s+" if c == ' ' else re.escape(c)) + build(child)
+            for c, child in sorted(node.items()) if c != '']
+        if len(branches) == 0:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            pattern = pattern + '?' if len(branches) == 1 and len(branches[0]) == 1 \
+                else '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+class ArtifactExtractor:
+    """
+    Extract emails, cryptocurrency addresses, PGP public keys, onion addresses
+    and keywords from the decoded body of a page.
+
+    The body is scanned once by a pattern which only finds what every artifact starts with:
+    alphanumeric tokens long enough to be addresses, `@` of emails and the header of PGP key blocks.
+    Tokens are classified by one pattern of all the token types, and emails are extended
+    around `@`, so the cost of the scan hardly grows with the number of types.
+    Keywords are matched by one trie-shaped pattern in the lowercased body.
+
+    Parameters
+    ---------------------------------------
+    types: tuple[str, ...]
+        Types of artifacts in `ARTIFACT_TYPES`.
+    keywords: tuple[str, ...]
+        Words and phrases to find, case-insensitively and as whole words.
+    """
+    def __init__(self, types: tuple[str, ...], keywords: tuple[str, ...] = ()) -> None:
+        for name in types:
+            if name not in ARTIFACT_TYPES:
+                raise Exception(f"Unknown artifact type: {name}")
+        self.types = types
+        self.token_types = [TOKEN_TYPES[name] for name in types if name in TOKEN_TYPES]
+
+        anchors = []
+        if len(self.token_types) > 0:
+            anchors.append(f"[0-9A-Za-z]{{{MIN_TOKEN_LENGTH},}}+(?:\\.onion\\b)?")
+            self.classify = re.compile("|".join(f"(?P<{t.name}>{t.pattern})" for t in self.token_types))
+        if 'emails' in types:
+            anchors.append("@")
+        if 'pgp' in types:
+            anchors.append(re.escape(PGP_BEGIN))
+        self.scan = re.compile("|".join(anchors)) if len(anchors) > 0 else None
+
+        words = sorted(set(' '.join(k.lower().split()) for k in keywords if k.strip() != ''))
+        self.keywords = re.compile(r"\b(?:" + trie_pattern(words) + r")\b") if len(words) > 0 else None
+
+
+    def extract(self, text: str) -> dict[str, list[str]]:
+        """
+        Extract the artifacts from the text.
+
+        Returns
+        ---------------------------------------
+        dict[str, list[str]]
+            Artifacts of each type which is found, without duplicates, in the order they appear.
+        """
+        found: dict[str, dict[str, None]] = {}
+
+        pos = 0
+        while self.scan is not None:
+            matched = self.scan.search(text, pos)
+            if matched is None:
+                break
+            token = matched.group()
+            pos = matched.end()
+
+            if token == '@':
+                email = self.extract_email(text, matched.start())
+                if email is not None:
+                    found.setdefault('emails', {})[email] = None
+            elif token == PGP_BEGIN:
+                block, pos = self.extract_pgp(text, matched.start())
+                if block is not None:
+                    found.setdefault('pgp', {})[block] = None
+            else:
+                name, value = self.classify_token(token)
+                if name is not None:
+                    found.setdefault(name, {})[value] = None
+
+        if self.keywords is not None:
+            for keyword in self.keywords.findall(text.lower()):
+                found.setdefault('keywords', {})[' '.join(keyword.split())] = None
+
+        return {name: list(values) for name, values in found.items()}
+
+
+    def classify_token(self, token: str) -> tuple[Optional[str], str]:
+        """
+        Type of a token and its normalized form. The type is None if it's not an artifact.
+        """
+        matched = self.classify.fullmatch(token)
+        if matched is None or matched.lastgroup is None:
+            return None, token
+        token_type = TOKEN_TYPES[matched.lastgroup]
+        if token_type.validate is not None and token_type.validate(token) is False:
+            return None, token
+        return token_type.name, token_type.normalize(token) if token_type.normalize is not None else token
+
+
+    def extract_email(self, text: str, at: int) -> Optional[str]:
+        """
+        Extract an email around `@` at the position.
+        """
+        local = REGEX_EMAIL_LOCAL.search(text, max(0, at - 64), at)
+        domain = REGEX_EMAIL_DOMAIN.match(text, at + 1)
+        if local is None or domain is None:
+            return None
+        local_part = local.group().lstrip('.')
+        domain_part = domain.group().lower()
+        if local_part == '' or domain_part.endswith(EMAIL_FILE_SUFFIXES):
+            return None
+        return f"{local_part}@{domain_part}"
+
+
+    def extract_pgp(self, text: str, start: int) -> tuple[Optional[str], int]:
+        """
+        Extract a PGP public key block starting at the position, without HTML tags in it.
+
+        Returns
+        ---------------------------------------
+        tuple[Optional[str], int]
+            The key block, or None if it's not closed, and the position to scan from.
+        """
+        end = text.find(PGP_END, start, start + MAX_PGP_BLOCK_LENGTH)
+        if end < 0:
+            return None, start + len(PGP_BEGIN)
+        end += len(PGP_END)
+        block = html.unescape(REGEX_TAG.sub('', REGEX_LINE_BREAK.sub('\n', text[start:end])))
+        return "\n".join(line.strip() for line in block.splitlines()), end
+
+
+@lru_cache(maxsize=None)
+def get_extractor(types: tuple[str, ...], keywords: tuple[str, ...] = ()) -> ArtifactExtractor:
+    """
+    Get an artifact extractor. It's built once per process, as patterns take time to compile.
+    """
+    return ArtifactExtractor(types, keywords)
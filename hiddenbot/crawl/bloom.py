@@ -0,0 +1,315 @@
+import math
+import mmap
+import os
+import struct
+from typing import Optional
+
+
+# Default false positive rate of the whole filter
+DEFAULT_FP_RATE = 0.001
+# Number of keys in the first filter. Each next filter has twice as many.
+BLOOM_INITIAL_CAPACITY = 1 << 20
+# The false positive rate of each next filter is multiplied by this ratio,
+# so that the total rate converges to `fp_rate`.
+BLOOM_TIGHTENING_RATIO = 0.5
+
+# File header: magic, capacity, number of hashes, number of bits, number of keys
+BLOOM_MAGIC = b'HBBLOOM1'
+BLOOM_HEADER = struct.Struct('<8sQQQQ')
+BLOOM_COUNT_OFFSET = 32
+
+MASK64 = (1 << 64) - 1
+
+
+def mix64(x: int) -> int:
+    """
+    SplitMix64 finalizer, to derive a second hash from a 64-bit key.
+    """
+    x = (x ^ (x >> 30)) * 0xbf58476d1ce4e5b9 & MASK64
+    x = (x ^ (x >> 27)) * 0x94d049bb133111eb & MASK64
+    return x ^ (x >> 31)
+
+
+class BloomFilter:
+    """
+    Bloom filter of 64-bit keys whose bits are in a memory-mapped file.
+
+    The bits are written to the page cache as they are set,
+    so the filter survives a crash of the process.
+
+    Parameters
+    ---------------------------------------
+    path: Optional[str]
+        File of the filter. It's opened if it exists. The filter is in memory if None.
+    capacity: int
+        Number of keys to add.
+    fp_rate: float
+        False positive rate when `capacity` keys are added.
+    """
+    def __init__(self, path: Optional[str], capacity: int, fp_rate: float) -> None:
+        self.path = path
+
+        if path is not None and os.path.exists(path):
+            # The size and the hashes are read from the header.
+            self.fd = os.open(path, os.O_RDWR)
+            self.mm = mmap.mmap(self.fd, 0)
+            magic, capacity, num_hashes, num_bits, _ = BLOOM_HEADER.unpack_from(self.mm)
+            if magic != BLOOM_MAGIC:
+                raise Exception(f"{path} is not a Bloom filter.")
+        else:
+            num_bits = self.num_bits(capacity, fp_rate)
+            num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+            size = BLOOM_HEADER.size + (num_bits + 7) // 8
+            if path is not None:
+                self.fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                os.ftruncate(self.fd, size)
+                self.mm = mmap.mmap(self.fd, size)
+            else:
+                self.fd = -1
+                self.mm = mmap.mmap(-1, size)
+            BLOOM_HEADER.pack_into(self.mm, 0, BLOOM_MAGIC, capacity, num_hashes, num_bits, 0)
+
+        self.capacity = capacity
+        self.num_hashes = num_hashes
+        self.bits = num_bits
+        self.count = BLOOM_HEADER.unpack_from(self.mm)[4]
+
+
+    @staticmethod
+    def num_bits(capacity: int, fp_rate: float) -> int:
+        """
+        Number of bits for the capacity and the false positive rate.
+        """
+        return max(64, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+
+
+    @classmethod
+    def size_of(cls, capacity: int, fp_rate: float) -> int:
+        """
+        Bytes of a filter file.
+        """
+        return BLOOM_HEADER.size + (cls.num_bits(capacity, fp_rate) + 7) // 8
+
+
+    def add(self, key: int) -> bool:
+        """
+        Add a 64-bit key.
+
+        Returns
+        ---------------------------------------
+        bool
+            The key is new, i.e. it was not in the filter.
+        """
+        mm = self.mm
+        h1 = key & MASK64
+        h2 = mix64(h1) | 1
+        new = False
+        for i in range(self.num_hashes):
+            bit = (h1 + i * h2) % self.bits
+            index = BLOOM_HEADER.size + (bit >> 3)
+            mask = 1 << (bit & 7)
+            byte = mm[index]
+            if byte & mask == 0:
+                mm[index] = byte | mask
+                new = True
+        if new:
+            self.count += 1
+            struct.pack_into('<Q', mm, BLOOM_COUNT_OFFSET, self.count)
+        return new
+
+
+    def __contains__(self, key: int) -> bool:
+        mm = self.mm
+        h1 = key & MASK64
+        h2 = mix64(h1) | 1
+        for i in range(self.num_hashes):
+            bit = (h1 + i * h2) % self.bits
+            if mm[BLOOM_HEADER.size + (bit >> 3)] & (1 << (bit & 7)) == 0:
+                return False
+        return True
+
+
+    def __len__(self) -> int:
+        return self.count
+
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.mm)
+
+
+    def sync(self) -> None:
+        """
+        Flush the bits to the file.
+        """
+        if self.fd >= 0:
+            self.mm.flush()
+
+
+    def close(self) -> None:
+        if self.mm.closed:
+            return
+        self.sync()
+        self.mm.close()
+        if self.fd >= 0:
+            os.close(self.fd)
+
+
+class ScalableBloomFilter:
+    """
+    Seen-URL filter which grows as keys are added, within a memory budget.
+
+    It's a series of Bloom filters. When a filter reaches its capacity,
+    a new filter twice as large with a lower false positive rate is added,
+    so the total false positive rate stays under `fp_rate`.
+    When the next filter doesn't fit in `max_bytes`, keys keep being added to
+    the last filter and the false positive rate goes up instead of the memory.
+
+    With a crawl state, new keys are kept in memory until the state is committed,
+    and written to the filters after it by `commit()`. So the filter on disk never has
+    a URL which the state doesn't, and a URL lost with the state in a crash is crawled again.
+
+    Parameters
+    ---------------------------------------
+    path: Optional[str]
+        Directory of the filter files. They are opened if they exist.
+        The filters are in memory if None.
+    fp_rate: float
+        Maximum false positive rate.
+    max_bytes: int
+        Maximum bytes of the filters. `0` or less is unlimited.
+    initial_capacity: int
+        Number of keys in the first filter.
+    """
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        fp_rate: float = DEFAULT_FP_RATE,
+        max_bytes: int = 0,
+        initial_capacity: int = BLOOM_INITIAL_CAPACITY,
+    ) -> None:
+        self.path = path
+        self.fp_rate = fp_rate
+        self.max_bytes = max_bytes
+        self.initial_capacity = initial_capacity
+        self.full = False
+
+        # Keys added since the last commit, or None if keys are written as they are added
+        self.pending: Optional[set[int]] = None
+
+        self.filters: list[BloomFilter] = []
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+            while self.exists(len(self.filters)):
+                self.filters.append(BloomFilter(self.filter_path(len(self.filters)), 1, fp_rate))
+        if len(self.filters) == 0:
+            self.grow()
+        else:
+            # Next filters are sized from the first one, which may differ from `max_bytes` now.
+            self.initial_capacity = self.filters[0].capacity
+
+
+    def filter_path(self, i: int) -> Optional[str]:
+        return os.path.join(self.path, f"bloom-{i}.bin") if self.path is not None else None
+
+
+    def exists(self, i: int) -> bool:
+        path = self.filter_path(i)
+        return path is not None and os.path.exists(path)
+
+
+    def grow(self) -> bool:
+        """
+        Add the next filter if it fits in the memory budget.
+        """
+        i = len(self.filters)
+        capacity = self.initial_capacity * 2 ** i
+        fp_rate = self.fp_rate * (1 - BLOOM_TIGHTENING_RATIO) * BLOOM_TIGHTENING_RATIO ** i
+        if self.max_bytes > 0:
+            if i == 0:
+                # The first filter is made small enough.
+                while capacity > 1 and BloomFilter.size_of(capacity, fp_rate) > self.max_bytes:
+                    capacity //= 2
+                self.initial_capacity = capacity
+            elif self.nbytes + BloomFilter.size_of(capacity, fp_rate) > self.max_bytes:
+                self.full = True
+                return False
+        self.filters.append(BloomFilter(self.filter_path(i), capacity, fp_rate))
+        return True
+
+
+    def add(self, key: int) -> bool:
+        """
+        Add a 64-bit key.
+
+        Returns
+        ---------------------------------------
+        bool
+            The key is new, i.e. it was not in the filter.
+        """
+        if key in self:
+            return False
+        if self.pending is not None:
+            self.pending.add(key)
+        else:
+            self.insert(key)
+        return True
+
+
+    def insert(self, key: int) -> None:
+        last = self.filters[-1]
+        if len(last) >= last.capacity and self.full is False and self.grow():
+            last = self.filters[-1]
+        last.add(key)
+
+
+    def defer(self) -> None:
+        """
+        Keep new keys in memory until `commit()`.
+        """
+        if self.pending is None:
+            self.pending = set()
+
+
+    def commit(self) -> None:
+        """
+        Write the keys added since the last commit to the filters.
+        """
+        if self.pending is None:
+            return
+        for key in self.pending:
+            self.insert(key)
+        self.pending = set()
+
+
+    def __contains__(self, key: int) -> bool:
+        if self.pending is not None and key in self.pending:
+            return True
+        # The newest filter has the most keys.
+        for f in reversed(self.filters):
+            if key in f:
+                return True
+        return False
+
+
+    def __len__(self) -> int:
+        return sum(len(f) for f in self.filters) + (len(self.pending) if self.pending is not None else 0)
+
+
+    @property
+    def nbytes(self) -> int:
+        return sum(f.nbytes for f in self.filters)
+
+
+    def is_empty(self) -> bool:
+        return len(self) == 0
+
+
+    def sync(self) -> None:
+        for f in self.filters:
+            f.sync()
+
+
+    def close(self) -> None:
+        for f in self.filters:
+            f.close()
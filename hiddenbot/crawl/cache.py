@@ -0,0 +1,304 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+import zlib
+
+from .fetch import DEFAULT_MAX_BYTES, FetchedResponse, is_accepted
+
+
+# Maximum bytes of compressed bodies in the cache
+DEFAULT_CACHE_MAX_BYTES = 1024 ** 3
+# Seconds in which a cached response is used without revalidation
+DEFAULT_CACHE_TTL = 60 * 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    final_url TEXT NOT NULL,
+    status_code INTEGER NOT NULL,
+    content_type TEXT NOT NULL,
+    encoding TEXT,
+    truncated INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    digest TEXT,
+    fetched_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS bodies (
+    digest TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refs INTEGER NOT NULL
+);
+"""
+
+
+class ResponseCache:
+    """
+    HTTP response cache on the disk, to recrawl without downloading unchanged pages again.
+
+    The index is a SQLite database, and bodies are compressed files named by the hash
+    of their content, so the same body served at many URLs is stored once.
+    A response younger than `ttl` is used as it is. An older one is revalidated
+    with `If-None-Match` and `If-Modified-Since`, and a `304` keeps it.
+    The least recently used responses are evicted beyond `max_bytes`.
+    A body truncated at a smaller byte limit than the one asked for is fetched again.
+    Bodies are compressed, read and written in threads, so that they don't block the event loop.
+
+    Parameters
+    ---------------------------------------
+    path: str
+        Directory of the cache.
+    max_bytes: int
+        Maximum bytes of compressed bodies. `0` or less is unlimited.
+    ttl: float
+        Seconds in which a cached response is used without revalidation.
+    offline: bool
+        Replay only the cached responses without the network.
+    """
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        ttl: float = DEFAULT_CACHE_TTL,
+        offline: bool = False,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.offline = offline
+
+        os.makedirs(os.path.join(path, 'bodies'), exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(path, 'index.db'), isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        self.size: int = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+
+        # Statistics
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+
+    def body_path(self, digest: str) -> str:
+        return os.path.join(self.path, 'bodies', digest[:2], f"{digest}.z")
+
+
+    async def get(self, url: str) -> Optional[tuple[FetchedResponse, float]]:
+        """
+        Get a cached response.
+
+        Returns
+        ---------------------------------------
+        Optional[tuple[FetchedResponse, float]]
+            The response and the UNIX time when it was fetched or revalidated.
+        """
+        import asyncio
+
+        row = self.conn.execute(
+            "SELECT final_url, status_code, content_type, encoding, truncated, etag, last_modified, " \
+            "digest, fetched_at FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        final_url, status_code, content_type, encoding, truncated, etag, last_modified, digest, fetched_at = row
+
+        content: Optional[bytes] = None
+        if digest is not None:
+            try:
+                content = await asyncio.to_thread(self.read_body, digest)
+            except (OSError, zlib.error):
+                # The body is lost. The entry is fetched again.
+                self.delete(url)
+                return None
+
+        self.conn.execute("UPDATE entries SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        resp = FetchedResponse(
+            final_url, status_code, content_type, encoding, content, bool(truncated), etag, last_modified,
+            fetched_at=fetched_at)
+        return resp, fetched_at
+
+
+    async def put(self, url: str, resp: FetchedResponse) -> None:
+        """
+        Save a response, replacing the cached one.
+        """
+        digest: Optional[str] = None
+        if resp.content is not None:
+            digest = hashlib.blake2b(resp.content, digest_size=16).hexdigest()
+            await self.add_body(digest, resp.content)
+
+        self.delete(url)
+        now = time.time()
+        self.conn.execute(
+            "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, resp.url, resp.status_code, resp.content_type, resp.encoding, int(resp.truncated),
+             resp.etag, resp.last_modified, digest, now, now))
+
+        if self.max_bytes > 0 and self.size > self.max_bytes:
+            self.evict()
+
+
+    def read_body(self, digest: str) -> bytes:
+        with open(self.body_path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+
+    def write_body(self, digest: str, content: bytes) -> int:
+        """
+        Compress and write a body.
+
+        Returns
+        ---------------------------------------
+        int
+            Size of the compressed body.
+        """
+        path = self.body_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        compressed = zlib.compress(content)
+        # Write to a temporary file first so that a crash never leaves a broken body.
+        # Threads writing the same body use their own temporary files.
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp, path)
+        return len(compressed)
+
+
+    async def add_body(self, digest: str, content: bytes) -> None:
+        """
+        Write a body, or add a reference if the same body is already stored.
+        """
+        import asyncio
+
+        if self.conn.execute("UPDATE bodies SET refs = refs + 1 WHERE digest = ?", (digest,)).rowcount > 0:
+            return
+
+        size = await asyncio.to_thread(self.write_body, digest, content)
+        # The same body may have been added while it was written.
+        if self.conn.execute("INSERT OR IGNORE INTO bodies VALUES (?, ?, 1)", (digest, size)).rowcount == 0:
+            self.conn.execute("UPDATE bodies SET refs = refs + 1 WHERE digest = ?", (digest,))
+            return
+        self.size += size
+
+
+    def refresh(self, url: str) -> None:
+        """
+        Mark a cached response as fresh after a `304 Not Modified`.
+        """
+        self.conn.execute("UPDATE entries SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+
+    def delete(self, url: str) -> None:
+        """
+        Delete a cached response, and its body if no other response has it.
+        """
+        row = self.conn.execute("SELECT digest FROM entries WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return
+        self.conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+
+        digest = row[0]
+        if digest is None:
+            return
+        self.conn.execute("UPDATE bodies SET refs = refs - 1 WHERE digest = ?", (digest,))
+        body = self.conn.execute(
+            "SELECT size FROM bodies WHERE digest = ? AND refs <= 0", (digest,)).fetchone()
+        if body is not None:
+            self.conn.execute("DELETE FROM bodies WHERE digest = ?", (digest,))
+            self.size -= body[0]
+            try:
+                os.remove(self.body_path(digest))
+            except OSError:
+                pass
+
+
+    def evict(self) -> None:
+        """
+        Delete the least recently used responses until the bodies fit in `max_bytes`.
+        """
+        while self.size > self.max_bytes:
+            urls = [r[0] for r in self.conn.execute(
+                "SELECT url FROM entries ORDER BY accessed_at LIMIT 100")]
+            if len(urls) == 0:
+                return
+            for url in urls:
+                self.delete(url)
+                if self.size <= self.max_bytes:
+                    return
+
+
+    async def fetch(
+        self,
+        url: str,
+        fetch: Callable[..., Awaitable[FetchedResponse]],
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        status_codes: Optional[list[int]] = None,
+        content_types: Optional[tuple[str, ...]] = None,
+        **kwargs: Any,
+    ) -> FetchedResponse:
+        """
+        Fetch the URL through the cache.
+
+        Parameters
+        ---------------------------------------
+        url: str
+            URL to fetch.
+        fetch: Callable[..., Awaitable[FetchedResponse]]
+            Function to fetch from the network, which takes the arguments of `fetch` in `crawl.fetch`.
+        max_bytes: int
+            Maximum bytes of the body. `0` or less is unlimited.
+        """
+        cached = await self.get(url)
+        if cached is not None:
+            resp, fetched_at = cached
+            # A response whose body was not read can only be used if the body is still not wanted.
+            if resp.content is None \
+                    and is_accepted(resp.status_code, resp.content_type, status_codes, content_types):
+                cached = None
+            # A body truncated at a smaller limit is missing bytes which are wanted now.
+            # It's fetched again, unless replaying offline, where it's all there is.
+            elif resp.truncated and resp.content is not None \
+                    and (max_bytes <= 0 or max_bytes > len(resp.content)) and self.offline is False:
+                cached = None
+
+        if self.offline:
+            if cached is None:
+                self.misses += 1
+                raise Exception(f"{url} is not in the cache.")
+            self.hits += 1
+            return cached[0]
+
+        headers: Optional[dict[str, str]] = None
+        if cached is not None:
+            resp, fetched_at = cached
+            if time.time() - fetched_at < self.ttl:
+                self.hits += 1
+                return resp
+            headers = {}
+            if resp.etag is not None:
+                headers['If-None-Match'] = resp.etag
+            if resp.last_modified is not None:
+                headers['If-Modified-Since'] = resp.last_modified
+
+        fetched = await fetch(
+            url, max_bytes=max_bytes, status_codes=status_codes, content_types=content_types,
+            headers=headers, **kwargs)
+
+        if fetched.status_code == 304 and cached is not None:
+            self.refresh(url)
+            self.revalidated += 1
+            return cached[0]
+
+        self.misses += 1
+        await self.put(url, fetched)
+        return fetched
+
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,158 @@
+import hashlib
+import re
+from typing import Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+
+# Query parameters for tracking and sessions, removed from URLs by default.
+# A name ending with `*` is a prefix. `sid` is not removed unless it's given,
+# because many sites use it for the ID of the content rather than of the session.
+DEFAULT_STRIP_PARAMS = [
+    'utm_*', 'fbclid', 'gclid', 'msclkid', 'mc_cid', 'mc_eid', 'ref_src',
+    'sessionid', 'session_id', 'phpsessid', 'jsessionid', 'aspsessionid',
+]
+
+# Static documents served for a directory. `/dir/index.html` is the same as `/dir/`.
+# Scripts such as `index.php` are not, since the site may route them differently.
+INDEX_PAGES = ('index.html', 'index.htm')
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# Percent-encoded octet
+REGEX_PERCENT = re.compile(r'%([0-9a-fA-F]{2})')
+# Session ID in a path parameter e.g. `/page;jsessionid=XXXX`
+REGEX_PATH_SESSION = re.compile(r';(?:jsessionid|phpsessid)=[^/]*', re.I)
+
+# Characters which never need to be percent-encoded
+UNRESERVED = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-._~')
+
+
+def normalize_percent(text: str) -> str:
+    """
+    Decode percent-encoded unreserved characters, and uppercase the other escapes.
+    """
+    def replace(m: re.Match) -> str:
+        c = chr(int(m.group(1), 16))
+        return c if c in UNRESERVED else f"%{m.group(1).upper()}"
+    return REGEX_PERCENT.sub(replace, text)
+
+
+def remove_dot_segments(path: str) -> str:
+    """
+    Resolve `.` and `..` in the path as RFC 3986 section 5.2.4.
+    """
+    if '.' not in path:
+        return path
+
+    segments = path.split('/')
+    output: list[str] = []
+    for segment in segments:
+        if segment == '.':
+            continue
+        if segment == '..':
+            if len(output) > 1:
+                output.pop()
+            continue
+        output.append(segment)
+    # `/a/.` and `/a/..` are directories.
+    if segments[-1] in ('.', '..'):
+        output.append('')
+    return '/'.join(output)
+
+
+def parse_hostname(url: str) -> Optional[str]:
+    """
+    Get the lowercased hostname of a URL, without credentials and port, or None if it has none.
+    It's the same as `urlsplit(url).hostname` for hostnames without `%`,
+    and several times faster for absolute URLs, which are parsed for every request and every link.
+    """
+    if '://' not in url:
+        return urlsplit(url).hostname
+    netloc = url.split('/', 3)[2].split('?', 1)[0].split('#', 1)[0].rpartition('@')[2]
+    if netloc.startswith('['):
+        netloc = netloc[1:].partition(']')[0]
+    else:
+        netloc = netloc.partition(':')[0]
+    return netloc.lower() or None
+
+
+def fingerprint(url: str) -> int:
+    """
+    64-bit hash of the URL, used as the key to find URLs already seen.
+    URLs must be canonicalized first.
+    """
+    return int.from_bytes(hashlib.blake2b(url.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class Canonicalizer:
+    """
+    Turn the spellings of a URL into one canonical URL.
+
+    - The scheme and the host are lowercased, and the default port is removed.
+    - `.` and `..` in the path are resolved, and `/index.html` and `/index.htm` are removed.
+    - An empty path becomes `/`.
+    - Query parameters are sorted, and tracking and session parameters are removed.
+    - The fragment is removed.
+
+    Parameters
+    ---------------------------------------
+    strip_params: Iterable[str]
+        Names of query parameters to remove, case-insensitive.
+        A name ending with `*` removes parameters starting with it.
+    """
+    def __init__(self, strip_params: Iterable[str] = DEFAULT_STRIP_PARAMS) -> None:
+        self.strip_names: set[str] = set()
+        self.strip_prefixes: list[str] = []
+        for name in strip_params:
+            name = name.strip().lower()
+            if name.endswith('*'):
+                self.strip_prefixes.append(name[:-1])
+            elif name != '':
+                self.strip_names.add(name)
+
+
+    def is_stripped(self, name: str) -> bool:
+        """
+        Check if the query parameter is removed.
+        """
+        name = name.lower()
+        return name in self.strip_names or any(name.startswith(p) for p in self.strip_prefixes)
+
+
+    def canonicalize(self, url: str) -> str:
+        """
+        Get the canonical URL.
+
+        Parameters
+        ---------------------------------------
+        url: str
+            An absolute URL.
+        """
+        u = urlsplit(url)
+        scheme = u.scheme.lower()
+
+        netloc = (u.hostname or '').rstrip('.')
+        try:
+            port = u.port
+        except ValueError:
+            port = None
+        if port is not None and port != DEFAULT_PORTS.get(scheme):
+            netloc = f"{netloc}:{port}"
+        if u.username is not None:
+            userinfo = u.username if u.password is None else f"{u.username}:{u.password}"
+            netloc = f"{userinfo}@{netloc}"
+
+        path = remove_dot_segments(normalize_percent(REGEX_PATH_SESSION.sub('', u.path))) or '/'
+        head, _, last = path.rpartition('/')
+        if last.lower() in INDEX_PAGES:
+            path = f"{head}/"
+
+        query = ''
+        if u.query != '':
+            params = [
+                normalize_percent(p) for p in u.query.split('&')
+                if p != '' and self.is_stripped(p.split('=', 1)[0]) is False]
+            query = '&'.join(sorted(params))
+
+        return urlunsplit((scheme, netloc, path, query, ''))
+
@@ -1,19 +1,40 @@
-from bs4 import BeautifulSoup
-import httpx
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
 from rich.console import Console
-from rich.prompt import Confirm
+from rich.table import Table
 import time
-import sys
-from typing import Optional
-
-from ..save import save_onions
+from typing import Iterable, Optional
+
+from ..save import JsonlWriter
+from ..tor import TorPool
+from .bloom import ScalableBloomFilter
+from .canonical import Canonicalizer
+from .fetch import FetchedResponse, HTML_CONTENT_TYPES
+from .frontier import Frontier
+from .parser import get_parser
 from .result import OnionSite
-from .extractor import extract_links, extract_meta_refresh, extract_site_info
-from .utils import get_robots_urls, is_toppage, parse_hostname
+from .robots import RobotsCache, RobotsRules
+from .scheduler import HostScheduler
+from .shard import DEFAULT_EXCHANGE_INTERVAL, Shard
+from .simhash import SimHashIndex, simhash
+from .state import CrawlState
+from .extractor import ScrapedPage, apply_robots, scrape_page
+from .utils import is_toppage, parse_hostname
 
 
 ALLOWED_RESPONSE_STATUS_CODE = [200, 301, 302]
 
+# Number of tasks which can be started per concurrency slot.
+# Extra tasks wait for their hosts in the scheduler.
+PENDING_TASKS_PER_SLOT = 4
+
+# Number of fetched pages which can wait per parse worker.
+# Fetching goes on until the queue is full.
+PARSE_QUEUE_PER_WORKER = 4
+
+# Seconds between checks for URLs of dead hosts to retry
+RETRY_CHECK_INTERVAL = 1.0
+
 
 class Crawler:
     """
@@ -23,96 +44,414 @@ class Crawler:
     def __init__(
         self,
         console: Console,
-        client: httpx.Client,
-        url: str,
+        pool: TorPool,
+        url: Optional[str],
         depth: int,
-        delay: int,
+        delay: float,
+        robots_ttl: float,
+        concurrency: int,
+        max_connections_per_host: int,
         max_content_length: int,
+        max_bytes: int,
         only_toppage: bool,
+        parser: str,
+        parse_workers: int,
+        strip_params: list[str],
+        mirror_distance: int,
         output: str,
         verbose: bool,
+        stream: Optional[JsonlWriter] = None,
+        state: Optional[CrawlState] = None,
+        seen: Optional[ScalableBloomFilter] = None,
+        shard: Optional[Shard] = None,
+        exchange_interval: float = DEFAULT_EXCHANGE_INTERVAL,
+        seeds: Optional[list[str]] = None,
+        strategy: str = 'bfs',
+        host_budget: int = 0,
+        artifacts: Optional[list[str]] = None,
+        keywords: Optional[list[str]] = None,
     ) -> None:
         self.console = console
 
-        self.client = client
+        self.pool = pool
+        self.health = pool.health
+        self.metrics = pool.metrics
         self.url = url
+        # More URLs to start from, e.g. harvested from search engines
+        self.seeds = seeds if seeds is not None else []
         self.depth = depth
+        # Order of URLs in the frontier, and maximum number of URLs per host
+        self.strategy = strategy
+        self.host_budget = host_budget
         self.delay = delay
+        self.robots = RobotsCache(pool, ttl=robots_ttl, state=state)
+        self.concurrency = concurrency
+        self.max_connections_per_host = max_connections_per_host
         self.max_content_length = max_content_length
+        self.max_bytes = max_bytes
         self.only_toppage = only_toppage
+        # The parser is looked up by name in the parse workers.
+        # Check here that it's available.
+        get_parser(parser)
+        self.parser = parser
+        self.parse_workers = parse_workers
+        # Types of artifacts and keywords extracted from the whole body of pages.
+        # Tuples are sent to the parse workers, which build the extractor once.
+        self.artifacts = tuple(artifacts) if artifacts is not None else ()
+        self.keywords = tuple(keywords) if keywords is not None else ()
+        self.canonicalizer = Canonicalizer(strip_params)
+        # SimHashes of top pages to find mirror sites. Negative distance disables it.
+        self.mirrors = SimHashIndex(mirror_distance) if mirror_distance >= 0 else None
 
         self.output = output
+        self.stream = stream
+        self.state = state
+        self.seen = seen
+        # Only hosts of this shard are crawled when crawling with other workers.
+        self.shard = shard
+        self.exchange_interval = exchange_interval
         self.verbose = verbose
 
+        # Pages which linked to the URLs in the frontier, to record where onion sites were found
+        self.parents: dict[str, str] = {}
+
         self.onions: list[OnionSite] = []
+        self.num_onions = 0
+        self.num_mirrors = 0
+        self.scraped = 0
 
 
-    def run(self) -> list[OnionSite]:
+    async def run(self) -> list[OnionSite]:
         """
         The main function to crawl.
         """
-        self.console.print(f"Start crawling from {self.url}.")
 
-        # Initial onion URL
-        onion_urls = set([self.url])
+        # Limit the number of requests in flight and the request rate per host.
+        # They are created here because they must belong to the running event loop.
+        self.scheduler = HostScheduler(
+            concurrency=self.concurrency,
+            delay=self.delay,
+            max_connections_per_host=self.max_connections_per_host)
+        self.pending = asyncio.Semaphore(self.concurrency * PENDING_TASKS_PER_SLOT)
+
+        self.frontier = Frontier(
+            self.depth, seen=self.seen, strategy=self.strategy, host_budget=self.host_budget,
+            health=self.health)
+        self.tasks: set[asyncio.Task] = set()
+
+        # Fetched pages are parsed in worker processes through a bounded queue.
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.parse_queue: Optional[asyncio.Queue[
+            tuple[str, int, Optional[RobotsRules], FetchedResponse]]] = None
+        if self.parse_workers > 0:
+            self.executor = ProcessPoolExecutor(self.parse_workers)
+            self.parse_queue = asyncio.Queue(self.parse_workers * PARSE_QUEUE_PER_WORKER)
+
+        resuming = self.state is not None and self.state.is_empty() is False
+        if resuming:
+            self.restore()
+        # URLs restored from the state are already committed, so only the URLs seen from now on
+        # wait for the state to be committed before they are written to the Bloom filter.
+        if self.state is not None and self.seen is not None:
+            self.state.attach(self.seen)
+        if self.state is not None and self.stream is not None:
+            self.state.attach_stream(self.stream)
+
+        if self.shard is not None:
+            # The initial URL is in the shared queue of its shard.
+            self.console.print(
+                f"Start crawling shard {self.shard.index} of {self.shard.shards} from {self.shard.queue.path}.")
+        elif resuming is False:
+            # Initial onion URLs
+            urls = ([self.url] if self.url is not None else []) + self.seeds
+            if len(self.seeds) == 0:
+                self.console.print(f"Start crawling from {self.url}.")
+            else:
+                self.console.print(f"Start crawling from {len(urls)} URLs.")
+            self.add_urls(urls, 0)
 
-        # Crawl each URL
         try:
-            for i in range(self.depth):
-                self.console.print(f"\nCrawl No.{i+1}\n")
-                if len(onion_urls) == 0:
-                    self.console.print("There are no more URLs to crawl.")
-                    break
-                onion_urls = self.crawl(onion_urls)
-        except KeyboardInterrupt as e:
-            stop = Confirm.ask("Stop crawling?")
-            if stop:
-                save_onions(console=self.console, data=self.onions, output=self.output)
-                sys.exit(0)
-            pass
+            await self.crawl()
+        finally:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False, cancel_futures=True)
+
+        if self.state is not None:
+            self.state.commit()
+
+        self.console.print("There are no more URLs to crawl.")
+        self.console.print(f"Links of {self.num_mirrors} mirror sites were not crawled.")\
+            if self.num_mirrors > 0 else None
+        self.console.print(f"{self.frontier.over_budget} URLs over the page budget of their hosts were not crawled.")\
+            if self.frontier.over_budget > 0 else None
+        self.print_host_report() if self.verbose else None
+        self.print_circuit_report() if self.verbose else None
+        self.print_cache_report() if self.verbose and self.pool.cache is not None else None
+        self.print_health_report() if self.verbose and self.health is not None else None
 
         return self.onions
 
 
-    def crawl(self, urls: set[str]) -> set[str]:
+    def restore(self) -> None:
         """
-        Crawl onion URLs.
+        Restore the frontier, robots.txt, cooldowns and results from the crawl state.
+        """
+        assert self.state is not None
 
-        Parameters
-        ---------------------------------------
-        urls: set[str]
-            List of onion URLs.
+        for url, depth, visited in self.state.load_urls():
+            self.frontier.restore(url, depth, visited)
+        self.robots.restore(self.state.load_robots())
+        for host, last_request in self.state.load_hosts():
+            self.scheduler.restore(host, last_request)
+
+        for onion in self.state.load_results():
+            self.index_mirror(onion)
+            # Results are already in the output when streaming.
+            if self.stream is None:
+                self.onions.append(onion)
+        self.num_onions = self.state.count_results()
+
+        self.console.print(
+            f"Resume crawling from {self.state.path}: {self.frontier.qsize()} URLs to crawl, " \
+            f"{self.num_onions} onion sites found.")
+
+
+    def add_url(self, url: str, depth: int, parent: Optional[str] = None) -> None:
+        """
+        Add a URL to the frontier in its canonical form, and save it to the crawl state.
+        """
+        url = self.canonicalizer.canonicalize(url)
+        # URLs of hosts of other shards are forwarded to their workers once.
+        if self.shard is not None and self.shard.owns(url) is False:
+            if self.frontier.see(url, depth, parent):
+                self.shard.forward(url, depth)
+            return
+        if self.frontier.add(url, depth, parent) is False:
+            return
+        if parent is not None:
+            self.parents[url] = parent
+        if self.state is not None:
+            self.state.add_url(url, depth)
+        if self.shard is not None:
+            self.shard.keep(url, depth)
+
+
+    def add_urls(self, urls: Iterable[str], depth: int, parent: Optional[str] = None) -> None:
+        """
+        Add URLs of the same depth to the frontier.
+        """
+        for url in urls:
+            self.add_url(url, depth, parent)
+
+
+    async def crawl(self) -> None:
+        """
+        Crawl URLs in the frontier until it's empty.
+
+        URLs are taken from the frontier as soon as there is room for them,
+        so newly found URLs are crawled without waiting for the other URLs of the same depth.
+        """
+        workers = [asyncio.create_task(self.dispatch())]
+        # Twice as many consumers as processes, so that a process is never idle
+        # while the results of another page are being handled.
+        for _ in range(self.parse_workers * 2):
+            workers.append(asyncio.create_task(self.parse_pages()))
+        if self.health is not None:
+            workers.append(asyncio.create_task(self.retry_parked()))
+        if self.shard is not None:
+            workers.append(asyncio.create_task(self.exchange()))
+        try:
+            while True:
+                await self.frontier.join()
+                # URLs of dead hosts may be waiting for their retries.
+                wait = self.health.next_retry() if self.health is not None else None
+                if wait is not None:
+                    await asyncio.sleep(wait)
+                    self.release_parked()
+                    continue
+                if self.shard is None:
+                    break
+                # URLs forwarded from other shards may have been added meanwhile.
+                if self.frontier.is_finished() is False:
+                    continue
+                # Other workers may still forward URLs to this shard until the coordinator ends the crawl.
+                self.shard.flush()
+                if self.shard.is_done():
+                    break
+                await asyncio.sleep(self.exchange_interval)
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+
+    async def dispatch(self) -> None:
+        """
+        Take URLs from the frontier and start crawling them.
+
+        The number of started tasks is bounded, so that the frontier decides the order.
+        Tasks for hosts cooling down wait in the scheduler without blocking other hosts.
+        """
+        while True:
+            url, depth = await self.frontier.get()
+            await self.pending.acquire()
+            # Keep a reference to the task so that it's not garbage collected.
+            task = asyncio.create_task(self.crawl_one(url, depth))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+
+    async def retry_parked(self) -> None:
+        """
+        Put URLs of dead hosts back to the frontier when their backoff is over.
+        """
+        while True:
+            await asyncio.sleep(RETRY_CHECK_INTERVAL)
+            self.release_parked()
+
+
+    async def exchange(self) -> None:
+        """
+        Forward URLs of other shards and results in batches,
+        and add URLs forwarded to this shard to the frontier.
+        """
+        assert self.shard is not None
+        while True:
+            await asyncio.sleep(self.exchange_interval)
+            self.shard.flush()
+            # Claimed URLs are canonical and of this shard, and they are already in the queue.
+            # The coordinator canonicalizes the start URL like the workers do the URLs they find.
+            for url, depth in self.shard.claim():
+                if self.frontier.add(url, depth):
+                    self.shard.hold(url)
+                else:
+                    self.shard.drop(url)
+
+
+    def release_parked(self) -> None:
+        assert self.health is not None
+        for url, depth in self.health.release():
+            # They have been added once, so they are put without being checked.
+            self.frontier.put_nowait((url, depth))
+
+
+    def park(self, url: str, depth: int) -> bool:
+        """
+        Park a URL if the circuit breaker of its host is open.
 
         Returns
         ---------------------------------------
-        set[str]
-            List of newly found onion URLs.
+        bool
+            The URL is parked or dropped, so it must not be fetched now.
         """
-        onion_urls = set()
-        try:
-            self.console.print(f"Total URLs to crawl: {len(urls)}")\
+        if self.health is None:
+            return False
+        host = parse_hostname(url) or ""
+        if self.health.is_open(host) is False:
+            return False
+        if self.health.park(host, url, depth) is False:
+            self.console.print(f"Skip: {host} seems to be dead.", style="yellow")\
                 if self.verbose else None
+            self.finish(url, depth, None)
+        return True
+
+
+    async def crawl_one(self, url: str, depth: int) -> None:
+        """
+        Scrape a URL when its host is ready to be requested,
+        and add found URLs to the frontier.
+
+        With parse workers, the fetched page is handed over to them
+        and this task ends without waiting for the page to be parsed.
 
-            for i, url in enumerate(urls):
-                self.console.print(f"Scraping No.{i+1}: {url}")\
+        Parameters
+        ---------------------------------------
+        url: str
+            URL to be scraped.
+        depth: int
+            Depth of the URL.
+        """
+        handed_over = False
+        try:
+            # URLs of dead hosts wait for their retries without taking a slot.
+            if self.park(url, depth):
+                return
+            async with self.scheduler.slot(url):
+                # The host may have died while this URL was waiting for it.
+                if self.park(url, depth):
+                    return
+                self.scraped += 1
+                self.console.print(f"Scraping No.{self.scraped} (depth {depth}): {url}")\
                     if self.verbose else None
 
-                found_urls = self.scrape(url)
-                if found_urls is None or len(found_urls) == 0:
-                    continue
-                onion_urls.update(found_urls)
-                time.sleep(self.delay)
-        except KeyboardInterrupt as e:
-            stop = Confirm.ask("Stop crawling?")
-            if stop:
-                save_onions(console=self.console, data=self.onions, output=self.output)
-                sys.exit(0)
-            return onion_urls
+                fetched = await self.fetch_page(url)
+                # The host has died at this request or at robots.txt. It's retried later.
+                if fetched is None and self.park(url, depth):
+                    return
+
+            found_urls: Optional[set[str]] = None
+            if fetched is not None:
+                resp, robots = fetched
+                if self.parse_queue is not None:
+                    # Wait here while the queue is full, so that fetching slows down
+                    # to the pace of the parse workers.
+                    await self.parse_queue.put((url, depth, robots, resp))
+                    handed_over = True
+                    return
+                found_urls = self.handle_page(url, depth, robots, resp, self.scrape_page(url, resp))
+
+            self.finish(url, depth, found_urls)
+        finally:
+            self.pending.release()
+            if handed_over is False:
+                self.frontier.task_done()
+
+
+    async def parse_pages(self) -> None:
+        """
+        Take fetched pages from the queue and parse them in the worker processes.
+        Only the body and the URL are sent to the workers.
+        """
+        assert self.parse_queue is not None
+        loop = asyncio.get_running_loop()
+
+        while True:
+            url, depth, robots, resp = await self.parse_queue.get()
+            assert resp.content is not None
+            try:
+                found_urls: Optional[set[str]] = None
+                try:
+                    scraped = await loop.run_in_executor(
+                        self.executor, scrape_page, resp.content, resp.encoding,
+                        url, self.max_content_length, self.parser, self.artifacts, self.keywords)
+                except Exception as e:
+                    self.console.print(f"could not parse {url}.")
+                    self.metrics.inc(f"errors.{type(e).__name__}") if self.metrics is not None else None
+                else:
+                    found_urls = self.handle_page(url, depth, robots, resp, scraped)
+
+                self.finish(url, depth, found_urls)
+            finally:
+                self.frontier.task_done()
+
+
+    def finish(self, url: str, depth: int, found_urls: Optional[set[str]]) -> None:
+        """
+        Add URLs found in the page to the frontier, and mark the URL as crawled.
+        """
+        if found_urls is not None:
+            self.add_urls(found_urls, depth + 1, parent=url)
+        self.parents.pop(url, None)
 
-        return onion_urls
+        if self.state is not None:
+            self.state.set_host(parse_hostname(url) or "", time.time())
+            self.state.visit(url)
+            self.state.checkpoint()
+        # The URL leaves the shared queue with the URLs and results found in it.
+        if self.shard is not None:
+            self.shard.ack(url)
 
 
-    def scrape(self, url: str) -> Optional[set[str]]:
+    async def scrape(self, url: str) -> Optional[set[str]]:
         """
         Scrape contents of specified URL.
 
@@ -126,8 +465,28 @@ class Crawler:
         set[str]
             List of onion URLs.
         """
-        flag_same_host = False
+        fetched = await self.fetch_page(url)
+        if fetched is None:
+            return None
+        resp, robots = fetched
+        return self.handle_page(url, None, robots, resp, self.scrape_page(url, resp))
+
+
+    async def fetch_page(self, url: str) -> Optional[tuple[FetchedResponse, Optional[RobotsRules]]]:
+        """
+        Fetch the HTML of specified URL if it's allowed.
+
+        Parameters
+        ----------------------------------------
+        url: str
+            URL to be fetched.
 
+        Returns
+        ----------------------------------------
+        Optional[tuple[FetchedResponse, Optional[RobotsRules]]]
+            The response with the body, and rules in robots.txt of the host.
+            None if the page is skipped.
+        """
         # When `--top` option (crawl only the top page) is set,
         # skip this url if it's not the top page.
         if self.only_toppage and is_toppage(url) is False:
@@ -135,60 +494,194 @@ class Crawler:
                 if self.verbose else None
             return None
 
-        # Check if the onion site has been already scraped.
-        for o in self.onions:
-            if o.url == url:
-                return None
-            # If the same host exists, add the flag_same_host.
-            # This flag is used for determining
-            # if it's required to get robots.txt or not.
-            if parse_hostname(o.url) == parse_hostname(url):
-                flag_same_host = True
-
-        # Get robots.txt URLs.
-        robots_urls: Optional[tuple[set[str], set[str]]] = None
-        if flag_same_host is False:
-            robots_urls = get_robots_urls(self.client, url)
+        # Get rules in robots.txt. It's fetched once per host.
+        # The page isn't fetched when robots.txt couldn't be, since it may disallow the page.
+        # A failure of the host counts toward its health, so the URL is parked if the host is dead.
+        try:
+            robots = await self.robots.get(url)
+        except Exception:
+            self.console.print(f"could not access to robots.txt of {url}.")
+            return None
+        if robots is not None and robots.can_fetch(url) is False:
+            self.console.print("Skip: This URL is disallowed by robots.txt.", style="yellow")\
+                if self.verbose else None
+            return None
 
         # Scrape
+        # Only HTML is read, up to `max_bytes`.
         try:
-            resp = self.client.get(url)
-            if resp.status_code not in ALLOWED_RESPONSE_STATUS_CODE:
-                return None
-        except KeyboardInterrupt as e:
-            stop = Confirm.ask("Stop crawling?")
-            if stop:
-                save_onions(console=self.console, data=self.onions, output=self.output)
-                sys.exit(0)
-            return None
-        except:
+            resp = await self.pool.fetch(
+                url, max_bytes=self.max_bytes,
+                status_codes=ALLOWED_RESPONSE_STATUS_CODE,
+                content_types=HTML_CONTENT_TYPES)
+        except Exception:
             self.console.print(f"could not access to {url}.")
             return None
-                
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        
-        # Extract redirect URL in meta refresh
-        # such as <meta http-equiv="Refresh" content="0; url=http://xxxx.onion">
-        # If found, return this URL without extracting this page.
-        redirect_url = extract_meta_refresh(soup)
-        if redirect_url is not None:
-            return set([redirect_url])
-        
-        # Extract the site title and description.
-        info = extract_site_info(soup, url, self.max_content_length)
-        if info is None:
+        if resp.content is None:
+            if resp.status_code in ALLOWED_RESPONSE_STATUS_CODE:
+                self.console.print(f"Skip: {resp.content_type} is not HTML.", style="yellow")\
+                    if self.verbose else None
+            return None
+        if resp.truncated:
+            self.console.print(f"The page is truncated to {self.max_bytes} bytes.", style="yellow")\
+                if self.verbose else None
+
+        return resp, robots
+
+
+    def scrape_page(self, url: str, resp: FetchedResponse) -> ScrapedPage:
+        """
+        Parse and extract the fetched page in this process.
+        """
+        assert resp.content is not None
+        return scrape_page(
+            resp.content, resp.encoding, url, self.max_content_length, self.parser,
+            self.artifacts, self.keywords)
+
+
+    def handle_page(
+        self,
+        url: str,
+        depth: Optional[int],
+        robots: Optional[RobotsRules],
+        resp: FetchedResponse,
+        scraped: ScrapedPage,
+    ) -> Optional[set[str]]:
+        """
+        Record the onion site extracted from the page,
+        with its depth, the page linking to it, and when and how it was fetched.
+
+        Returns
+        ----------------------------------------
+        set[str]
+            List of onion URLs to crawl next.
+        """
+        if self.metrics is not None:
+            self.metrics.inc('pages')
+            self.metrics.observe('parse', scraped.parse_time)
+            self.metrics.observe('extract', scraped.extract_time)
+
+        # The page only redirects to another URL.
+        if scraped.redirect_url is not None:
+            return set([scraped.redirect_url])
+
+        if scraped.info is None:
             return None
-        title, description, content = info
+        title, description, content = scraped.info
 
-        onion_site = OnionSite(title, description, content, url)
+        onion_site = OnionSite(
+            title, description, content, url, depth=depth, parent=self.parents.get(url),
+            fetched_at=resp.fetched_at, status=resp.status_code, artifacts=scraped.artifacts)
+        onion_site.mirror_of = self.find_mirror(url, scraped.simhash)
         onion_site.print_info(self.console)
         self.add_onion(onion_site)
 
-        # Extract onion URLs from the content.
-        onion_urls = extract_links(soup, url, robots_urls)   
-   
-        return onion_urls  
-        
+        # Mirrors have the same links as the original site.
+        if onion_site.mirror_of is not None:
+            self.num_mirrors += 1
+            self.metrics.inc('mirrors') if self.metrics is not None else None
+            return None
+
+        # Onion URLs of the same host are filtered by robots.txt.
+        if robots is None:
+            return scraped.links
+        return apply_robots(scraped.links, url, robots)
+
+
+    def find_mirror(self, url: str, h: Optional[int]) -> Optional[str]:
+        """
+        Find the site which the top page of a new host is a near-duplicate of.
+        If it's not found, the page is indexed as an original site.
+
+        Parameters
+        ----------------------------------------
+        url: str
+            URL of the page.
+        h: Optional[int]
+            SimHash of the page.
+
+        Returns
+        ----------------------------------------
+        Optional[str]
+            URL of the original site, or None.
+        """
+        if self.mirrors is None or h is None or is_toppage(url) is False:
+            return None
+
+        found = self.mirrors.find(h)
+        if found is not None and parse_hostname(found) != parse_hostname(url):
+            return found
+        if found is None:
+            self.mirrors.add(h, url)
+        return None
+
+
+    def index_mirror(self, onion: OnionSite) -> None:
+        """
+        Index the top page of a site found before resuming.
+        """
+        if self.mirrors is None or onion.mirror_of is not None or is_toppage(onion.url) is False:
+            return
+        h = simhash(" ".join((onion.title, onion.description, onion.content)))
+        if h is not None:
+            self.mirrors.add(h, onion.url)
+
+
+    def print_host_report(self, limit: int = 20) -> None:
+        """
+        Print how long hosts spent waiting versus being fetched.
+
+        Parameters
+        ------------------------------------
+        limit: int
+            Maximum number of hosts to print.
+        """
+        table = Table(title="Hosts")
+        table.add_column("Host")
+        table.add_column("Requests", justify="right")
+        table.add_column("Waiting (s)", justify="right")
+        table.add_column("Fetching (s)", justify="right")
+        for host, requests, wait_time, fetch_time in self.scheduler.report(limit):
+            table.add_row(host, str(requests), f"{wait_time:.2f}", f"{fetch_time:.2f}")
+        self.console.print(table)
+
+
+    def print_circuit_report(self) -> None:
+        """
+        Print statistics of Tor circuits.
+        """
+        table = Table(title="Circuits")
+        table.add_column("Proxy")
+        table.add_column("Isolation")
+        table.add_column("Requests", justify="right")
+        table.add_column("Errors", justify="right")
+        table.add_column("Latency (s)", justify="right")
+        for proxy, isolation, requests, errors, latency in self.pool.report():
+            table.add_row(
+                proxy, isolation or "-", str(requests), str(errors),
+                f"{latency:.2f}" if latency is not None else "-")
+        self.console.print(table)
+
+
+    def print_cache_report(self) -> None:
+        """
+        Print how many responses came from the cache.
+        """
+        cache = self.pool.cache
+        assert cache is not None
+        self.console.print(
+            f"Cache: {cache.hits} hits, {cache.revalidated} revalidated, {cache.misses} misses, " \
+            f"{cache.size / 1024 ** 2:.1f} MiB")
+
+
+    def print_health_report(self) -> None:
+        """
+        Print how many hosts seem to be dead.
+        """
+        assert self.health is not None
+        dead, parked, dropped = self.health.report()
+        self.console.print(f"Dead hosts: {dead}, parked URLs: {parked}, dropped URLs: {dropped}")
+
 
     def add_onion(self, onion: OnionSite) -> None:
         """
@@ -199,10 +692,20 @@ class Crawler:
         onion: OnionSite
             An onion site new found.
         """
-        # Check if the new onion URL already exists in the list.
-        # If exists, the new onion site is rejected.
-        for o in self.onions:
-            if o.url == onion.url:
-                return
-
+        # The frontier hands out each URL once, and a resumed crawl only crawls again
+        # the URLs whose results were not committed, so the onion site is new.
+        self.num_onions += 1
+        self.metrics.inc('onions') if self.metrics is not None else None
+        if self.state is not None:
+            self.state.add_result(onion)
+
+        # Results of shards are merged by the coordinator.
+        if self.shard is not None:
+            self.shard.add_result(onion)
+            return
+
+        # When streaming, the onion site is written immediately instead of being kept.
+        if self.stream is not None:
+            self.stream.write(onion)
+            return
         self.onions.append(onion)
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import os
+from typing import Optional
+
+from .metrics import DEFAULT_STATS_INTERVAL, Metrics
+
+
+class MetricsExporter:
+    """
+    Export metrics while crawling: a JSON file rewritten at an interval,
+    and a Prometheus text endpoint on localhost.
+
+    Parameters
+    ---------------------------------------
+    metrics: Metrics
+        Metrics to export.
+    stats_file: Optional[str]
+        JSON file to write the metrics to.
+    interval: float
+        Seconds between writes of the JSON file.
+    port: Optional[int]
+        Port of the Prometheus endpoint on 127.0.0.1.
+    """
+    def __init__(
+        self,
+        metrics: Metrics,
+        stats_file: Optional[str] = None,
+        interval: float = DEFAULT_STATS_INTERVAL,
+        port: Optional[int] = None,
+    ) -> None:
+        self.metrics = metrics
+        self.stats_file = stats_file
+        self.interval = interval
+        self.port = port
+
+        self.writer: Optional[asyncio.Task] = None
+        self.server: Optional[asyncio.AbstractServer] = None
+
+
+    async def start(self) -> None:
+        if self.stats_file is not None:
+            self.writer = asyncio.create_task(self.write_periodically())
+        if self.port is not None:
+            self.server = await asyncio.start_server(self.handle, '127.0.0.1', self.port)
+
+
+    async def stop(self) -> None:
+        if self.writer is not None:
+            self.writer.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        # The last metrics are written at the end.
+        self.write_stats()
+
+
+    def write_stats(self) -> None:
+        """
+        Write the metrics to the JSON file, replacing it atomically.
+        """
+        if self.stats_file is None:
+            return
+        with open(f"{self.stats_file}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(self.metrics.snapshot(), f, indent=2)
+        os.replace(f"{self.stats_file}.tmp", self.stats_file)
+
+
+    async def write_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self.write_stats()
+
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """
+        Answer any request with the metrics in the Prometheus text format.
+        """
+        try:
+            # Read the request line and headers.
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            body = self.metrics.to_prometheus().encode('utf-8')
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
@@ -1,27 +1,27 @@
-from bs4 import BeautifulSoup
 import re
+import time
 from typing import Optional
-from .utils import (
-    adjust_text, parse_hostname, parse_link_url,
-    is_http, is_internal_link, is_onion_url, is_url
-)
+from .artifacts import get_extractor
+from .fetch import detect_encoding
+from .parser import ParsedPage, get_parser
+from .robots import RobotsRules
+from .simhash import simhash
+from .utils import adjust_text, classify_link, parse_hostname
 
 
-def extract_meta_refresh(s: BeautifulSoup) -> Optional[str]:
+def extract_meta_refresh(page: ParsedPage) -> Optional[str]:
     """
     Extract redirect URL in the meta 'http-equiv=refresh'.
 
     Parameters
     ----------------------------------
-    s: BeautifulSoup
+    page: ParsedPage
         Used for scraping.
     """
-    # meta_refresh = s.find('meta', attrs={'http-equiv': 'Refresh'})
-    meta_refresh = s.find('meta', attrs={'http-equiv': re.compile('^refresh$', re.I)})
-    if meta_refresh is None:
+    content = page.refresh
+    if content is None:
         return None
-    
-    content = meta_refresh.get('content')
+
     matched = re.search('url=(.+\.onion.*)', content)
     if matched is None:
         return None
@@ -30,7 +30,7 @@ def extract_meta_refresh(s: BeautifulSoup) -> Optional[str]:
 
 
 def extract_site_info(
-    s: BeautifulSoup,
+    page: ParsedPage,
     url: str,
     max_content_length: int,
 ) -> Optional[tuple[str, str, str]]:
@@ -39,7 +39,7 @@ def extract_site_info(
 
     Parameters
     ---------------------------------
-    s: BeautifulSoup
+    page: ParsedPage
         Used for scraping.
     url: str
         URL which is scraped.
@@ -52,26 +52,16 @@ def extract_site_info(
         Title, description and content of the site.
     """
     # Extract title
-    title = s.title.text.strip() if s.title is not None else parse_hostname(url)
+    title = page.title.strip() if page.title is not None else parse_hostname(url) or ""
     title = adjust_text(title)
 
     # Extract description
-    description = s.find('meta', attrs={'name': 'description'})
-    if description is None:
-        description = ""
-    else:
-        description = description.get('content')
-        if description is None:
-            description = ""
-        else:
-            description = adjust_text(description)
+    description = ""
+    if page.description is not None:
+        description = adjust_text(page.description)
 
     # Extract contents
-    body = s.find('body')
-    if body is None:
-        content = ""
-    else:
-        content = adjust_text(body.text)
+    content = adjust_text(page.text)
     # Also, extract the first N words (N: max_content_words)
     words = content.split()
     if len(words) > max_content_length:
@@ -81,19 +71,22 @@ def extract_site_info(
 
 
 def extract_links(
-    s: BeautifulSoup,
+    page: ParsedPage,
     origin_url: str,
-    robots_urls: Optional[tuple[set[str], set[str]]]
-) -> Optional[set[str]]:
+    robots: Optional[RobotsRules] = None,
+) -> set[str]:
     """
     Extract onion URLs from the site content.
 
     Parameters
     -------------------------------
-    s: BeautifulSoup
+    page: ParsedPage
         Used for scraping.
     origin_url: str
         Original URL which is scraped.
+    robots: Optional[RobotsRules]
+        Rules in robots.txt of the original host.
+        Links to the host which are disallowed are skipped.
 
     Returns
     -------------------------------
@@ -102,27 +95,161 @@ def extract_links(
     """
     urls = set()
 
-    allowed_urls: set[str] = set()
-    disallowed_urls: set[str] = set()
+    for link in page.hrefs:
+        if link == origin_url:
+            continue
+        url = classify_link(origin_url, link)
+        if url is not None:
+            urls.add(url)
 
-    if robots_urls is not None:
-        allowed_urls, disallowed_urls = robots_urls
+    if robots is not None:
+        urls = apply_robots(urls, origin_url, robots)
 
-    for link in s.find_all('a'):
-        url = link.get('href')
-        if url is None or url == '' or url == origin_url or url in disallowed_urls:
-            continue
-        if is_internal_link(url):
-            continue
-        if is_url(url) is False:
-            url = parse_link_url(origin_url, url)
-        if is_http(url) is False:
-            continue
-        if is_onion_url(url) is False:
-            continue
-        urls.add(url)
+    return urls
+
+
+def apply_robots(urls: set[str], origin_url: str, robots: RobotsRules) -> set[str]:
+    """
+    Remove URLs of the original host disallowed by robots.txt, and add allowed URLs.
+
+    Parameters
+    -------------------------------
+    urls: set[str]
+        Onion URLs extracted from the original URL.
+    origin_url: str
+        Original URL which is scraped.
+    robots: RobotsRules
+        Rules in robots.txt of the original host.
+    """
+    origin_hostname = parse_hostname(origin_url)
+    urls = set(
+        url for url in urls
+        if parse_hostname(url) != origin_hostname or robots.can_fetch(url))
 
     # Also add allowed urls
-    urls |= allowed_urls
+    urls |= robots.allowed_urls
+
+    return urls
+
+
+def extract_artifacts(
+    text: str,
+    url: str,
+    links: set[str],
+    types: tuple[str, ...],
+    keywords: tuple[str, ...],
+) -> Optional[dict[str, list[str]]]:
+    """
+    Extract artifacts from the decoded body of a page.
+    Onion addresses of the page and of its links are not artifacts, as they are crawled.
 
-    return urls
\ No newline at end of file
+    Returns
+    -------------------------------
+    Optional[dict[str, list[str]]]
+        Artifacts of each type which is found, or None if nothing is found.
+    """
+    if len(types) == 0 and len(keywords) == 0:
+        return None
+    found = get_extractor(types, keywords).extract(text)
+    if 'onions' in found:
+        linked = {parse_hostname(link) for link in links} | {parse_hostname(url)}
+        found['onions'] = [host for host in found['onions'] if host not in linked]
+        if len(found['onions']) == 0:
+            del found['onions']
+    return found if len(found) > 0 else None
+
+
+class ScrapedPage:
+    """
+    Compact results of scraping a page, small enough to send between processes.
+
+    Parameters
+    -------------------------------
+    redirect_url: Optional[str]
+        URL in the meta refresh. Nothing else is extracted if it's found.
+    info: Optional[tuple[str, str, str]]
+        Title, description and content of the site.
+    links: set[str]
+        Onion URLs found in the page.
+    simhash: Optional[int]
+        SimHash of the title, description and content, to find mirror sites.
+    artifacts: Optional[dict[str, list[str]]]
+        Emails, addresses, PGP keys, onion addresses in plain text and keywords found in the page.
+    parse_time: float
+        Seconds to decode and parse the page.
+    extract_time: float
+        Seconds to extract the site info and links.
+    """
+    def __init__(
+        self,
+        redirect_url: Optional[str],
+        info: Optional[tuple[str, str, str]],
+        links: set[str],
+        simhash: Optional[int] = None,
+        artifacts: Optional[dict[str, list[str]]] = None,
+        parse_time: float = 0.0,
+        extract_time: float = 0.0,
+    ) -> None:
+        self.redirect_url = redirect_url
+        self.info = info
+        self.links = links
+        self.simhash = simhash
+        self.artifacts = artifacts
+        self.parse_time = parse_time
+        self.extract_time = extract_time
+
+
+def scrape_page(
+    content: bytes,
+    encoding: Optional[str],
+    url: str,
+    max_content_length: int,
+    parser: str,
+    artifacts: tuple[str, ...] = (),
+    keywords: tuple[str, ...] = (),
+) -> ScrapedPage:
+    """
+    Decode, parse and extract a page.
+    It can run in a worker process, so it only takes the raw bytes and the URL.
+
+    Parameters
+    -------------------------------
+    content: bytes
+        Body of the page.
+    encoding: Optional[str]
+        Charset in the Content-Type header.
+    url: str
+        URL of the page.
+    max_content_length: int
+        Maximum number of words in content to extract.
+    parser: str
+        Name of the HTML parser.
+    artifacts: tuple[str, ...]
+        Types of artifacts to extract from the whole body, in `artifacts.ARTIFACT_TYPES`.
+    keywords: tuple[str, ...]
+        Keywords to find in the whole body.
+    """
+    started = time.perf_counter()
+    text = content.decode(detect_encoding(content, encoding), errors='replace')
+    page = get_parser(parser)(text)
+    parsed = time.perf_counter()
+
+    # Extract redirect URL in meta refresh
+    # such as <meta http-equiv="Refresh" content="0; url=http://xxxx.onion">
+    # If found, return this URL without extracting this page.
+    redirect_url = extract_meta_refresh(page)
+    if redirect_url is not None:
+        return ScrapedPage(
+            redirect_url, None, set(),
+            parse_time=parsed - started, extract_time=time.perf_counter() - parsed)
+
+    info = extract_site_info(page, url, max_content_length)
+    links = extract_links(page, url)
+    return ScrapedPage(
+        None,
+        info,
+        links,
+        simhash(" ".join(info)) if info is not None else None,
+        extract_artifacts(text, url, links, artifacts, keywords),
+        parse_time=parsed - started,
+        extract_time=time.perf_counter() - parsed)
\ No newline at end of file
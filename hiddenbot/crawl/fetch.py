@@ -0,0 +1,216 @@
+import codecs
+import re
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Optional
+
+if TYPE_CHECKING:
+    import httpx
+
+
+# Content types of pages to scrape
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+# Maximum bytes of a page to read
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+
+# Charset declared in the first bytes of HTML
+REGEX_META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.I)
+
+
+class FetchedResponse:
+    """
+    A response read up to the byte limit.
+
+    Parameters
+    ---------------------------------------
+    url: str
+        URL of the response after redirects.
+    status_code: int
+        HTTP status code.
+    content_type: str
+        Media type without parameters, e.g. `text/html`. Empty if it's not given.
+    encoding: Optional[str]
+        Charset in the Content-Type header.
+    content: Optional[bytes]
+        Body of the response. None if the body was not read
+        because the status code or the content type is not accepted.
+    truncated: bool
+        The body was cut at the byte limit.
+    etag: Optional[str]
+        ETag header, to revalidate the cached response.
+    last_modified: Optional[str]
+        Last-Modified header, to revalidate the cached response.
+    ttfb: float
+        Seconds until the response headers were received.
+    timings: dict[str, float]
+        Seconds of the connection steps traced by httpcore and of the body download.
+        Empty unless the request is traced.
+    fetched_at: Optional[float]
+        UNIX time when the response was received. Now if None.
+    """
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        content_type: str,
+        encoding: Optional[str],
+        content: Optional[bytes],
+        truncated: bool,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+        ttfb: float = 0.0,
+        timings: Optional[dict[str, float]] = None,
+        fetched_at: Optional[float] = None,
+    ) -> None:
+        self.url = url
+        self.status_code = status_code
+        self.content_type = content_type
+        self.encoding = encoding
+        self.content = content
+        self.truncated = truncated
+        self.etag = etag
+        self.last_modified = last_modified
+        self.ttfb = ttfb
+        self.timings = timings if timings is not None else {}
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+
+
+    @property
+    def text(self) -> str:
+        """
+        Decode the body with the charset in the header or in `<meta>`, or UTF-8.
+        """
+        if self.content is None:
+            return ""
+        return self.content.decode(detect_encoding(self.content, self.encoding), errors='replace')
+
+
+def detect_encoding(content: bytes, encoding: Optional[str]) -> str:
+    """
+    Get a valid encoding of the body.
+    """
+    if encoding is None:
+        matched = REGEX_META_CHARSET.search(content[:1024])
+        if matched is not None:
+            encoding = matched.group(1).decode('ascii')
+    if encoding is not None:
+        try:
+            return codecs.lookup(encoding).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def is_accepted(
+    status_code: int,
+    content_type: str,
+    status_codes: Optional[list[int]],
+    content_types: Optional[tuple[str, ...]],
+) -> bool:
+    """
+    Check if the body of a response with the status code and the content type is read.
+    """
+    if status_codes is not None and status_code not in status_codes:
+        return False
+    if content_types is not None and content_type != '' and content_type not in content_types:
+        return False
+    return True
+
+
+def trace_timings(timings: dict[str, float]) -> Callable[[str, dict], Awaitable[None]]:
+    """
+    Make a httpcore trace callback which records how long each step takes.
+
+    httpcore calls it with events such as `socks_proxy.setup_socks5_connection.started`
+    and `.complete`. The durations are recorded by the step name, e.g. `setup_socks5_connection`.
+    """
+    started: dict[str, float] = {}
+
+    async def callback(event: str, info: dict) -> None:
+        name, _, phase = event.rpartition('.')
+        step = name.rpartition('.')[2]
+        if phase == 'started':
+            started[step] = time.monotonic()
+        elif phase == 'complete' and step in started:
+            timings[step] = time.monotonic() - started.pop(step)
+
+    return callback
+
+
+async def fetch(
+    client: 'httpx.AsyncClient',
+    url: str,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    status_codes: Optional[list[int]] = None,
+    content_types: Optional[tuple[str, ...]] = None,
+    headers: Optional[dict[str, str]] = None,
+    timeout: Optional[float] = None,
+    trace: bool = False,
+) -> FetchedResponse:
+    """
+    Stream a response and read its body up to the byte limit.
+
+    The body is not read at all when the status code or the content type is not accepted,
+    so large files are not downloaded for nothing.
+
+    Parameters
+    ---------------------------------------
+    client: httpx.AsyncClient
+        A httpx client to request.
+    url: str
+        URL to fetch.
+    max_bytes: int
+        Maximum bytes of the body to read. `0` or less is unlimited.
+    status_codes: Optional[list[int]]
+        Status codes whose body is read. All status codes if None.
+    content_types: Optional[tuple[str, ...]]
+        Media types whose body is read. All types if None.
+        A response without Content-Type is always read.
+    headers: Optional[dict[str, str]]
+        Request headers e.g. `If-None-Match`.
+    timeout: Optional[float]
+        Timeout of this request. The timeout of the client if None.
+    trace: bool
+        Record how long the connection steps and the body take, e.g. the SOCKS handshake.
+
+    Returns
+    ---------------------------------------
+    FetchedResponse
+        The response.
+    """
+    # httpx is loaded by the client already. It's not imported with this module
+    # so that the CLI starts without it.
+    import httpx
+
+    timings: dict[str, float] = {}
+    extensions: Optional[dict[str, Any]] = None
+    if trace:
+        extensions = {'trace': trace_timings(timings)}
+
+    started = time.monotonic()
+    async with client.stream(
+            'GET', url, headers=headers, extensions=extensions,
+            timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT) as resp:
+        received = time.monotonic()
+        content_type = resp.headers.get('content-type', '').split(';')[0].strip().lower()
+        fetched = FetchedResponse(
+            str(resp.url), resp.status_code, content_type, resp.charset_encoding, None, False,
+            resp.headers.get('etag'), resp.headers.get('last-modified'), received - started, timings)
+
+        if is_accepted(resp.status_code, content_type, status_codes, content_types) is False:
+            return fetched
+
+        chunks = []
+        size = 0
+        async for chunk in resp.aiter_bytes():
+            chunks.append(chunk)
+            size += len(chunk)
+            if max_bytes > 0 and size > max_bytes:
+                fetched.truncated = True
+                break
+
+        content = b''.join(chunks)
+        if trace:
+            timings['body'] = time.monotonic() - received
+        fetched.content = content[:max_bytes] if max_bytes > 0 else content
+        return fetched
@@ -0,0 +1,223 @@
+import asyncio
+from collections import deque
+import heapq
+from typing import TYPE_CHECKING, Any, Optional, Union
+
+from .bloom import ScalableBloomFilter
+from .canonical import fingerprint
+from .utils import is_toppage, parse_hostname
+
+if TYPE_CHECKING:
+    from .health import HealthTracker
+
+
+# Orders of URLs taken from the frontier
+STRATEGIES = ['bfs', 'discovery']
+
+# Priority classes of the discovery strategy. Lower is crawled first.
+PRIORITY_NEW_HOST = 0
+PRIORITY_TOP_PAGE = 1
+PRIORITY_PAGE = 2
+# Score added per page already taken from the same host, to spread pages across hosts
+HOST_PAGE_WEIGHT = 0.5
+# Score subtracted per new host found per page of the same host
+HOST_YIELD_WEIGHT = 4.0
+# Score added by the ratio of failed requests to the host
+HOST_ERROR_WEIGHT = 8.0
+
+
+class Frontier(asyncio.Queue):
+    """
+    Crawl frontier.
+
+    A queue of URLs to crawl with their depth, indexed by a visited-URL set
+    and by host, so that adding and taking a URL cost O(1)
+    however many URLs have been discovered.
+
+    URLs must be canonicalized before they are added.
+    They are remembered by their 64-bit fingerprints, in a set,
+    or in a Bloom filter whose memory is bounded but which rejects a few new URLs.
+
+    The `bfs` strategy takes URLs in the order they were added.
+    The `discovery` strategy takes URLs from a heap in order to find new hosts sooner:
+    a URL of a host which has no page taken yet, then top pages, then other pages
+    by their depth and the depth of their path. Pages of hosts which have been crawled more,
+    which led to fewer new hosts, or which fail more, come later.
+    Scores change as hosts are crawled, so a URL is scored again when it's taken,
+    and put back if another URL is better now.
+
+    Parameters
+    ---------------------------------------
+    max_depth: int
+        URLs at this depth or deeper are not added.
+    seen: Optional[ScalableBloomFilter]
+        Bloom filter to remember URLs instead of a set.
+    strategy: str
+        `bfs` or `discovery`.
+    host_budget: int
+        Maximum number of URLs added per host. `0` is unlimited.
+    health: Optional[HealthTracker]
+        Health of the hosts, to crawl failing hosts later.
+    """
+    def __init__(
+        self,
+        max_depth: int,
+        seen: Optional[ScalableBloomFilter] = None,
+        strategy: str = 'bfs',
+        host_budget: int = 0,
+        health: Optional['HealthTracker'] = None,
+    ) -> None:
+        if strategy not in STRATEGIES:
+            raise Exception(f"Unknown strategy: {strategy}")
+        self.strategy = strategy
+        super().__init__()
+        self.max_depth = max_depth
+        self.host_budget = host_budget
+        self.health = health
+
+        # Fingerprints of URLs which have been added once. They are never added again.
+        self.seen: Union[set[int], ScalableBloomFilter] = seen if seen is not None else set()
+        # Number of URLs taken from the frontier per host.
+        self.hosts: dict[str, int] = {}
+        # Number of URLs seen per host
+        self.added: dict[str, int] = {}
+        # Number of new hosts found in the pages of each host
+        self.yields: dict[str, int] = {}
+        # Number of URLs not added because their hosts are over the budget
+        self.over_budget = 0
+
+
+    def _init(self, maxsize: int) -> None:
+        self._queue: Union[deque[tuple[str, int]], list[tuple[tuple[int, float], int, str, int]]]
+        self._queue = deque() if self.strategy == 'bfs' else []
+        # Order of URLs with the same score
+        self.counter = 0
+
+
+    def _put(self, item: tuple[str, int]) -> None:
+        if isinstance(self._queue, deque):
+            self._queue.append(item)
+            return
+        url, depth = item
+        self.counter += 1
+        heapq.heappush(self._queue, (self.score(url, depth), self.counter, url, depth))
+
+
+    def _get(self) -> tuple[str, int]:
+        if isinstance(self._queue, deque):
+            url, depth = self._queue.popleft()
+        else:
+            while True:
+                score, counter, url, depth = heapq.heappop(self._queue)
+                current = self.score(url, depth)
+                if current <= score or len(self._queue) == 0 or current <= self._queue[0][0]:
+                    break
+                heapq.heappush(self._queue, (current, counter, url, depth))
+
+        # Counted when taken rather than when fetched, so that URLs taken together
+        # are not all scored as URLs of a new host.
+        host = parse_hostname(url) or ""
+        self.hosts[host] = self.hosts.get(host, 0) + 1
+        return url, depth
+
+
+    def score(self, url: str, depth: int) -> tuple[int, float]:
+        """
+        Priority of a URL in the discovery strategy. Lower is crawled first.
+        """
+        host = parse_hostname(url) or ""
+        taken = self.hosts.get(host, 0)
+        if taken == 0:
+            return PRIORITY_NEW_HOST, depth
+
+        if is_toppage(url):
+            priority, score = PRIORITY_TOP_PAGE, float(depth)
+        else:
+            path = url.split('/', 3)[3] if url.count('/') >= 3 else ""
+            priority, score = PRIORITY_PAGE, float(depth + path.split('?')[0].count('/') + 1)
+
+        score += taken * HOST_PAGE_WEIGHT
+        score -= self.yields.get(host, 0) / taken * HOST_YIELD_WEIGHT
+        health = self.health.hosts.get(host) if self.health is not None else None
+        if health is not None and health.requests > 0:
+            score += health.errors / health.requests * HOST_ERROR_WEIGHT
+        return priority, score
+
+
+    def add(self, url: str, depth: int, parent: Optional[str] = None) -> bool:
+        """
+        Add a URL to crawl.
+
+        Parameters
+        ---------------------------------------
+        url: str
+            URL to be crawled.
+        depth: int
+            Depth of the URL. The initial URL is 0.
+        parent: Optional[str]
+            URL of the page where the URL was found.
+
+        Returns
+        ---------------------------------------
+        bool
+            The URL is added or not.
+        """
+        if self.see(url, depth, parent) is False:
+            return False
+        if self.host_budget > 0 and self.added[parse_hostname(url) or ""] > self.host_budget:
+            self.over_budget += 1
+            return False
+        self.put_nowait((url, depth))
+        return True
+
+
+    def see(self, url: str, depth: int, parent: Optional[str] = None) -> bool:
+        """
+        Mark a URL as seen without queueing it, e.g. when it's crawled by another worker.
+        The host of the parent is credited if the URL is on a new host.
+
+        Returns
+        ---------------------------------------
+        bool
+            The URL is new and within the maximum depth.
+        """
+        if depth >= self.max_depth:
+            return False
+        key = fingerprint(url)
+        if key in self.seen:
+            return False
+        self.seen.add(key)
+
+        host = parse_hostname(url) or ""
+        count = self.added.get(host, 0)
+        self.added[host] = count + 1
+        if count == 0 and parent is not None:
+            parent_host = parse_hostname(parent) or ""
+            self.yields[parent_host] = self.yields.get(parent_host, 0) + 1
+        return True
+
+
+    def restore(self, url: str, depth: int, visited: bool) -> None:
+        """
+        Restore a URL saved in the crawl state.
+        URLs which have been crawled are only marked as seen.
+        """
+        self.seen.add(fingerprint(url))
+        host = parse_hostname(url) or ""
+        self.added[host] = self.added.get(host, 0) + 1
+        if visited:
+            self.hosts[host] = self.hosts.get(host, 0) + 1
+        else:
+            self.put_nowait((url, depth))
+
+
+    def is_finished(self) -> bool:
+        """
+        Check if every URL taken from the frontier has been crawled.
+        """
+        # asyncio.Queue counts them for `join()` but doesn't expose the count.
+        return self._unfinished_tasks == 0  # type: ignore[attr-defined]
+
+
+    def __contains__(self, url: Any) -> bool:
+        return isinstance(url, str) and fingerprint(url) in self.seen
@@ -0,0 +1,227 @@
+from collections import deque
+import time
+from typing import Optional
+
+
+# Number of latency samples kept per host
+HEALTH_SAMPLES = 20
+# Number of samples in all hosts kept for hosts without their own samples
+HEALTH_GLOBAL_SAMPLES = 1000
+# Minimum samples to derive a timeout from
+HEALTH_MIN_SAMPLES = 5
+# The timeout is this times the latency percentile...
+HEALTH_TIMEOUT_FACTOR = 3.0
+# ...but not shorter than this, because onion circuits are slow to build.
+HEALTH_MIN_TIMEOUT = 10.0
+
+# Consecutive failures which open the circuit breaker of a host
+DEFAULT_HOST_FAILURES = 3
+# Seconds before the first retry of a dead host. It doubles at every retry.
+DEFAULT_RETRY_BACKOFF = 60.0
+# Number of retries before URLs of a dead host are dropped
+DEFAULT_MAX_RETRIES = 3
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """
+    Nearest-rank percentile of sorted samples.
+    """
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+class HostHealth:
+    """
+    Health of a host.
+    """
+    def __init__(self) -> None:
+        # Seconds to the response headers of successful requests
+        self.latencies: deque[float] = deque(maxlen=HEALTH_SAMPLES)
+        self.failures = 0
+        self.retries = 0
+        # Monotonic time until which the circuit breaker is open
+        self.open_until: Optional[float] = None
+        self.parked: list[tuple[str, int]] = []
+
+        self.requests = 0
+        self.errors = 0
+
+
+class HealthTracker:
+    """
+    Track the health of hosts to stop wasting time on dead ones.
+
+    The timeout of a host is derived from the 95th percentile of its latency,
+    or of all hosts until it has enough samples, and is never longer than `timeout`.
+    After `max_failures` consecutive failures, the circuit breaker of the host opens:
+    its URLs are parked instead of being fetched, and retried after an exponential backoff.
+    After `max_retries` retries which fail again, its URLs are dropped.
+
+    Parameters
+    ---------------------------------------
+    timeout: float
+        Maximum timeout in seconds.
+    adaptive_timeout: bool
+        Derive timeouts from the latency.
+    max_failures: int
+        Consecutive failures to open the circuit breaker. `0` disables it.
+    retry_backoff: float
+        Seconds before the first retry.
+    max_retries: int
+        Number of retries before URLs are dropped.
+    """
+    def __init__(
+        self,
+        timeout: float,
+        adaptive_timeout: bool = True,
+        max_failures: int = DEFAULT_HOST_FAILURES,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+    ) -> None:
+        self.timeout = timeout
+        self.adaptive_timeout = adaptive_timeout
+        self.max_failures = max_failures
+        self.retry_backoff = retry_backoff
+        self.max_retries = max_retries
+
+        self.hosts: dict[str, HostHealth] = {}
+        # Hosts which have parked URLs
+        self.parked_hosts: set[str] = set()
+        self.latencies: deque[float] = deque(maxlen=HEALTH_GLOBAL_SAMPLES)
+        # Timeout for hosts without enough samples, updated as samples are added
+        self.default_timeout = timeout
+
+        self.dropped = 0
+
+
+    def get_host(self, host: str) -> HostHealth:
+        health = self.hosts.get(host)
+        if health is None:
+            health = HostHealth()
+            self.hosts[host] = health
+        return health
+
+
+    def derive_timeout(self, samples: list[float]) -> float:
+        return min(self.timeout, max(
+            HEALTH_MIN_TIMEOUT, HEALTH_TIMEOUT_FACTOR * percentile(sorted(samples), 0.95)))
+
+
+    def timeout_for(self, host: str) -> float:
+        """
+        Get the timeout of a request to the host.
+        """
+        if self.adaptive_timeout is False:
+            return self.timeout
+        health = self.hosts.get(host)
+        if health is None or len(health.latencies) < HEALTH_MIN_SAMPLES:
+            return self.default_timeout
+        return self.derive_timeout(list(health.latencies))
+
+
+    def record_success(self, host: str, latency: float) -> None:
+        """
+        Record a response from the host. The circuit breaker closes.
+        """
+        health = self.get_host(host)
+        health.requests += 1
+        health.latencies.append(latency)
+        health.failures = 0
+        health.retries = 0
+        health.open_until = None
+
+        self.latencies.append(latency)
+        # Sorting the global samples at every request is not needed.
+        if len(self.latencies) >= HEALTH_MIN_SAMPLES and len(self.latencies) % HEALTH_MIN_SAMPLES == 0:
+            self.default_timeout = self.derive_timeout(list(self.latencies))
+
+
+    def record_failure(self, host: str) -> None:
+        """
+        Record a connection failure or a timeout. The circuit breaker opens
+        after `max_failures` consecutive failures, or at the first failure after a retry.
+        """
+        health = self.get_host(host)
+        health.requests += 1
+        health.errors += 1
+        health.failures += 1
+        if self.max_failures <= 0 or health.failures < self.max_failures:
+            return
+
+        now = time.monotonic()
+        if health.open_until is not None:
+            if health.open_until > now:
+                return
+            # A request after the backoff failed.
+            health.retries += 1
+        health.open_until = now + self.retry_backoff * 2 ** health.retries
+
+
+    def is_open(self, host: str) -> bool:
+        """
+        Check if the circuit breaker of the host is open, i.e. its URLs must not be fetched.
+        """
+        health = self.hosts.get(host)
+        return health is not None and health.open_until is not None and health.open_until > time.monotonic()
+
+
+    def park(self, host: str, url: str, depth: int) -> bool:
+        """
+        Park a URL of a host whose circuit breaker is open, until it's retried.
+
+        Returns
+        ---------------------------------------
+        bool
+            The URL is parked. False if the host has been retried too many times and it's dropped.
+        """
+        health = self.get_host(host)
+        if health.retries >= self.max_retries:
+            self.dropped += 1
+            return False
+        health.parked.append((url, depth))
+        self.parked_hosts.add(host)
+        return True
+
+
+    def next_retry(self) -> Optional[float]:
+        """
+        Seconds until the next parked URLs are retried, or None if no URL is parked.
+        """
+        times = [
+            h.open_until for h in (self.hosts[host] for host in self.parked_hosts)
+            if h.open_until is not None]
+        if len(times) == 0:
+            return None
+        return max(0.0, min(times) - time.monotonic())
+
+
+    def release(self) -> list[tuple[str, int]]:
+        """
+        Take the parked URLs of hosts whose backoff is over, to retry them.
+        The circuit breaker of the host is half-open: it opens again at the next failure.
+        """
+        now = time.monotonic()
+        urls: list[tuple[str, int]] = []
+        for host in list(self.parked_hosts):
+            health = self.hosts[host]
+            if health.open_until is None or health.open_until <= now:
+                self.parked_hosts.discard(host)
+                urls += health.parked
+                health.parked = []
+                health.open_until = None
+                health.retries += 1
+                health.failures = self.max_failures - 1
+        return urls
+
+
+    def report(self) -> tuple[int, int, int]:
+        """
+        Report the health of hosts.
+
+        Returns
+        ---------------------------------------
+        tuple[int, int, int]
+            Number of dead hosts, parked URLs and dropped URLs.
+        """
+        dead = sum(1 for h in self.hosts.values() if h.open_until is not None)
+        parked = sum(len(self.hosts[host].parked) for host in self.parked_hosts)
+        return dead, parked, self.dropped
@@ -0,0 +1,174 @@
+from collections import deque
+import time
+from typing import TYPE_CHECKING, Any
+
+from .health import percentile
+
+if TYPE_CHECKING:
+    from rich.console import Console
+
+
+# Stages of a request in the order they happen
+STAGES = ['robots', 'connect', 'circuit', 'tls', 'ttfb', 'body', 'parse', 'extract']
+
+# httpcore trace events and their stages
+TRACE_STAGES = {
+    'connect_tcp': 'connect',
+    'setup_socks5_connection': 'circuit',
+    'start_tls': 'tls',
+}
+
+# Number of the latest samples per stage kept for percentiles
+METRICS_SAMPLES = 100_000
+
+PERCENTILES = [0.5, 0.9, 0.99]
+
+# Seconds between writes of the stats file
+DEFAULT_STATS_INTERVAL = 10.0
+
+
+class StageStats:
+    """
+    Durations of a stage.
+    """
+    def __init__(self) -> None:
+        self.samples: deque[float] = deque(maxlen=METRICS_SAMPLES)
+        self.count = 0
+        self.total = 0.0
+
+
+    def observe(self, seconds: float) -> None:
+        self.samples.append(seconds)
+        self.count += 1
+        self.total += seconds
+
+
+    def percentiles(self) -> dict[str, float]:
+        """
+        Percentiles of the latest samples, and the maximum.
+        """
+        samples = sorted(self.samples)
+        if len(samples) == 0:
+            return {}
+        result = {f"p{int(p * 100)}": percentile(samples, p) for p in PERCENTILES}
+        result['max'] = samples[-1]
+        return result
+
+
+class Metrics:
+    """
+    Timings of the stages of requests and counters of a crawl.
+
+    Stages are `robots` (fetching robots.txt), `connect` (TCP to the SOCKS proxy),
+    `circuit` (SOCKS handshake, in which Tor builds the circuit to the onion service),
+    `tls`, `ttfb` (to the response headers), `body`, `parse` and `extract`.
+    Counters include `requests`, `pages`, `bytes`, `onions` and `errors.<type>`.
+    """
+    def __init__(self) -> None:
+        self.started = time.monotonic()
+        self.stages: dict[str, StageStats] = {stage: StageStats() for stage in STAGES}
+        self.counters: dict[str, int] = {}
+
+
+    def observe(self, stage: str, seconds: float) -> None:
+        """
+        Record the duration of a stage.
+        """
+        stats = self.stages.get(stage)
+        if stats is None:
+            stats = StageStats()
+            self.stages[stage] = stats
+        stats.observe(seconds)
+
+
+    def inc(self, name: str, value: int = 1) -> None:
+        """
+        Increase a counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def observe_trace(self, timings: dict[str, float]) -> None:
+        """
+        Record the stages in the timings of a response. Other traced steps are ignored.
+        """
+        for name, seconds in timings.items():
+            stage = TRACE_STAGES.get(name, name)
+            if stage in self.stages:
+                self.stages[stage].observe(seconds)
+
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Get all metrics as a JSON object.
+        """
+        elapsed = time.monotonic() - self.started
+        return {
+            'elapsed': elapsed,
+            'counters': dict(self.counters),
+            'pages_per_second': self.counters.get('pages', 0) / elapsed if elapsed > 0 else 0.0,
+            'onions_per_minute': self.counters.get('onions', 0) / elapsed * 60 if elapsed > 0 else 0.0,
+            'stages': {
+                stage: {'count': s.count, 'sum': s.total, **s.percentiles()}
+                for stage, s in self.stages.items() if s.count > 0},
+        }
+
+
+    def to_prometheus(self) -> str:
+        """
+        Get all metrics in the Prometheus text format.
+        """
+        lines = []
+        errors = []
+        for name, value in sorted(self.counters.items()):
+            if name.startswith('errors.'):
+                errors.append(f'hiddenbot_errors_total{{type="{name[7:]}"}} {value}')
+            else:
+                lines.append(f"# TYPE hiddenbot_{name}_total counter")
+                lines.append(f"hiddenbot_{name}_total {value}")
+        if errors:
+            lines.append("# TYPE hiddenbot_errors_total counter")
+            lines += errors
+
+        lines.append("# TYPE hiddenbot_stage_seconds summary")
+        for stage, s in self.stages.items():
+            if s.count == 0:
+                continue
+            samples = sorted(s.samples)
+            for p in PERCENTILES:
+                lines.append(
+                    f'hiddenbot_stage_seconds{{stage="{stage}",quantile="{p}"}} {percentile(samples, p)}')
+            lines.append(f'hiddenbot_stage_seconds_sum{{stage="{stage}"}} {s.total}')
+            lines.append(f'hiddenbot_stage_seconds_count{{stage="{stage}"}} {s.count}')
+        return "\n".join(lines) + "\n"
+
+
+    def print_summary(self, console: 'Console') -> None:
+        """
+        Print percentiles of the stages and the counters.
+        """
+        # rich is only loaded when the summary is printed, so that the CLI starts fast.
+        from rich.table import Table
+
+        snapshot = self.snapshot()
+
+        table = Table(title="Stages")
+        table.add_column("Stage")
+        table.add_column("Count", justify="right")
+        for name in ["p50", "p90", "p99", "max"]:
+            table.add_column(f"{name} (ms)", justify="right")
+        table.add_column("Total (s)", justify="right")
+        for stage, s in snapshot['stages'].items():
+            table.add_row(
+                stage, str(s['count']), *(f"{s[name] * 1000:.1f}" for name in ["p50", "p90", "p99", "max"]),
+                f"{s['sum']:.1f}")
+        console.print(table)
+
+        table = Table(title="Counters")
+        table.add_column("Name")
+        table.add_column("Value", justify="right")
+        for name, value in sorted(snapshot['counters'].items()):
+            table.add_row(name, str(value))
+        table.add_row("pages/s", f"{snapshot['pages_per_second']:.2f}")
+        table.add_row("onions/min", f"{snapshot['onions_per_minute']:.2f}")
+        console.print(table)
@@ -0,0 +1,630 @@
+import asyncio
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from typing import IO, TYPE_CHECKING, Iterable, Optional
+from urllib.parse import urlsplit
+
+from .canonical import Canonicalizer
+from .extractor import scrape_page
+from .fetch import HTML_CONTENT_TYPES
+from .robots import DEFAULT_ROBOTS_TTL, RobotsCache
+from .scheduler import HostScheduler
+from .utils import parse_hostname
+
+if TYPE_CHECKING:
+    from rich.console import Console
+    from ..tor import TorPool
+
+
+# Changes of the monitored sites
+EVENTS = ['new', 'changed', 'down', 'up']
+
+# Seconds between checks of a site which changes at every check, and first checks
+DEFAULT_MIN_INTERVAL = 600.0
+# Seconds between checks of a site which never changes or is dead
+DEFAULT_MAX_INTERVAL = 7 * 86400.0
+# Consecutive failed checks before a site is reported down
+DEFAULT_DOWN_FAILURES = 2
+# Maximum Hamming distance between SimHashes of a page which has not changed,
+# so that counters and dates in the page are not changes
+DEFAULT_CHANGE_DISTANCE = 3
+# Minimum seconds between cycles
+DEFAULT_CYCLE_INTERVAL = 60.0
+
+# Status codes from this are failures, e.g. 502 of a proxy whose backend is down
+DOWN_STATUS_CODE = 500
+# Number of words of a page compared for changes
+CHANGE_CONTENT_WORDS = 2000
+# Weight of past checks in the change rate at every check,
+# so that it follows sites which change more or less often than before
+CHANGE_HISTORY_DECAY = 0.9
+# Weight of the latest latency in its moving average
+LATENCY_EWMA_ALPHA = 0.3
+# Number of checked sites which are saved at once
+STORE_BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sites (
+    url TEXT PRIMARY KEY,
+    added_at REAL NOT NULL,
+    next_check REAL NOT NULL,
+    interval REAL NOT NULL DEFAULT 0,
+    checked_at REAL,
+    seen_at REAL,
+    checks INTEGER NOT NULL DEFAULT 0,
+    up_checks INTEGER NOT NULL DEFAULT 0,
+    compared REAL NOT NULL DEFAULT 0,
+    changes REAL NOT NULL DEFAULT 0,
+    observed REAL NOT NULL DEFAULT 0,
+    failures INTEGER NOT NULL DEFAULT 0,
+    alive INTEGER,
+    status INTEGER,
+    latency REAL,
+    digest TEXT,
+    simhash TEXT,
+    title TEXT
+);
+CREATE INDEX IF NOT EXISTS sites_next_check ON sites (next_check);
+"""
+
+# Columns of `sites` in the order of `Site.__slots__`
+SITE_COLUMNS = (
+    'url', 'added_at', 'next_check', 'interval', 'checked_at', 'seen_at', 'checks', 'up_checks',
+    'compared', 'changes', 'observed', 'failures', 'alive', 'status', 'latency', 'digest', 'simhash', 'title')
+
+
+class Site:
+    """
+    A monitored site and the history of its checks.
+
+    The change rate is estimated from the checks which found the site up twice in a row,
+    whether its content changed in between (`changes`) or not, and the seconds between them
+    (`observed`). Past checks weigh less and less, so that the estimate follows the site.
+    """
+    __slots__ = SITE_COLUMNS
+
+    def __init__(
+        self,
+        url: str,
+        added_at: float,
+        next_check: float,
+        interval: float = 0.0,
+        checked_at: Optional[float] = None,
+        seen_at: Optional[float] = None,
+        checks: int = 0,
+        up_checks: int = 0,
+        compared: float = 0.0,
+        changes: float = 0.0,
+        observed: float = 0.0,
+        failures: int = 0,
+        alive: Optional[bool] = None,
+        status: Optional[int] = None,
+        latency: Optional[float] = None,
+        digest: Optional[str] = None,
+        simhash: Optional[int] = None,
+        title: Optional[str] = None,
+    ) -> None:
+        self.url = url
+        self.added_at = added_at
+        self.next_check = next_check
+        self.interval = interval
+        # UNIX times of the last check, and of the last check which found the site up
+        self.checked_at = checked_at
+        self.seen_at = seen_at
+        self.checks = checks
+        self.up_checks = up_checks
+        self.compared = compared
+        self.changes = changes
+        self.observed = observed
+        # Consecutive failed checks
+        self.failures = failures
+        # None until the site has been found up or down
+        self.alive = alive
+        self.status = status
+        self.latency = latency
+        self.digest = digest
+        self.simhash = simhash
+        self.title = title
+
+
+    @property
+    def uptime(self) -> Optional[float]:
+        """
+        Ratio of the checks which found the site up.
+        """
+        return self.up_checks / self.checks if self.checks > 0 else None
+
+
+    @property
+    def change_rate(self) -> Optional[float]:
+        """
+        Estimated changes per second, or None until the site has been compared.
+
+        A check finds at most one change however many happened since the last check,
+        so the ratio of changes is corrected as `-log((n - X + 0.5) / (n + 0.5))`
+        per mean interval, for X changes found in n comparisons (Cho & Garcia-Molina).
+        """
+        if self.compared == 0 or self.observed <= 0:
+            return None
+        ratio = (self.compared - self.changes + 0.5) / (self.compared + 0.5)
+        return -math.log(ratio) / (self.observed / self.compared)
+
+
+    def to_row(self) -> tuple:
+        row = [getattr(self, column) for column in SITE_COLUMNS]
+        # SQLite integers are signed 64-bit, and SimHashes are unsigned.
+        row[SITE_COLUMNS.index('simhash')] = f"{self.simhash:016x}" if self.simhash is not None else None
+        return tuple(row)
+
+
+    @classmethod
+    def from_row(cls, row: tuple) -> 'Site':
+        site = cls(*row)
+        site.alive = bool(site.alive) if site.alive is not None else None
+        site.simhash = int(row[SITE_COLUMNS.index('simhash')], 16) if site.simhash is not None else None
+        return site
+
+
+    def to_event(self, event: str) -> dict:
+        """
+        A change of the site as a JSON object of the delta output.
+        """
+        rate = self.change_rate
+        return {
+            'event': event,
+            'url': self.url,
+            'title': self.title,
+            'status': self.status,
+            'checked_at': self.checked_at,
+            'uptime': round(self.uptime, 3) if self.uptime is not None else None,
+            'changes_per_day': round(rate * 86400, 3) if rate is not None else None,
+        }
+
+
+class CheckResult:
+    """
+    Result of a check.
+
+    Parameters
+    ---------------------------------------
+    alive: bool
+        The site responded with a status code below 500.
+    status: Optional[int]
+        HTTP status code. None if there was no response.
+    latency: Optional[float]
+        Seconds to the response headers.
+    digest: Optional[str]
+        Hash of the status code and of the title, description and text of the page.
+    simhash: Optional[int]
+        SimHash of the title, description and text of the page, to ignore small changes.
+    title: Optional[str]
+        Title of the page.
+    links: Optional[set[str]]
+        Onion URLs found in the page.
+    """
+    def __init__(
+        self,
+        alive: bool,
+        status: Optional[int] = None,
+        latency: Optional[float] = None,
+        digest: Optional[str] = None,
+        simhash: Optional[int] = None,
+        title: Optional[str] = None,
+        links: Optional[set[str]] = None,
+    ) -> None:
+        self.alive = alive
+        self.status = status
+        self.latency = latency
+        self.digest = digest
+        self.simhash = simhash
+        self.title = title
+        self.links = links
+
+
+class RevisitPolicy:
+    """
+    Record checks of sites, find their changes, and schedule their next checks.
+
+    A site which is up is checked again after the mean time between its changes,
+    i.e. `1 / change_rate`. Until it has been compared once, it's checked after `min_interval`,
+    and while no change has been found, the interval doubles at every check.
+    It's shortened for sites which have failed some checks, to `min_interval / (1 - uptime)`.
+    A site which fails is checked again after `min_interval`, to confirm that it's down,
+    and the interval doubles at every failure after that.
+    Intervals are always between `min_interval` and `max_interval`.
+
+    Parameters
+    ---------------------------------------
+    min_interval: float
+        Minimum seconds between checks.
+    max_interval: float
+        Maximum seconds between checks.
+    down_failures: int
+        Consecutive failed checks before a site is reported down.
+    change_distance: int
+        Maximum Hamming distance between SimHashes of a page which has not changed.
+        `0` counts every change of the text.
+    """
+    def __init__(
+        self,
+        min_interval: float = DEFAULT_MIN_INTERVAL,
+        max_interval: float = DEFAULT_MAX_INTERVAL,
+        down_failures: int = DEFAULT_DOWN_FAILURES,
+        change_distance: int = DEFAULT_CHANGE_DISTANCE,
+    ) -> None:
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.down_failures = max(1, down_failures)
+        self.change_distance = change_distance
+
+
+    def record(self, site: Site, result: CheckResult, now: float) -> Optional[str]:
+        """
+        Record a check of the site and schedule the next one.
+
+        Returns
+        ---------------------------------------
+        Optional[str]
+            Change of the site in `EVENTS`, or None.
+        """
+        site.checks += 1
+        site.checked_at = now
+        site.status = result.status
+
+        if result.alive is False:
+            site.failures += 1
+            event: Optional[str] = None
+            if site.alive is not False and site.failures >= self.down_failures:
+                # A site which has never been up is not reported.
+                event = 'down' if site.alive is True else None
+                site.alive = False
+            site.interval = self.clamp(self.min_interval * 2 ** (site.failures - 1))
+            site.next_check = now + site.interval
+            return event
+
+        site.up_checks += 1
+        site.failures = 0
+        if result.latency is not None:
+            site.latency = result.latency if site.latency is None \
+                else (1 - LATENCY_EWMA_ALPHA) * site.latency + LATENCY_EWMA_ALPHA * result.latency
+
+        event = 'new' if site.seen_at is None else 'up' if site.alive is False else None
+        if site.digest is not None and site.seen_at is not None:
+            changed = self.is_changed(site, result)
+            site.compared = site.compared * CHANGE_HISTORY_DECAY + 1
+            site.changes = site.changes * CHANGE_HISTORY_DECAY + (1 if changed else 0)
+            site.observed = site.observed * CHANGE_HISTORY_DECAY + (now - site.seen_at)
+            if changed and event is None:
+                event = 'changed'
+
+        site.alive = True
+        site.seen_at = now
+        site.digest = result.digest
+        site.simhash = result.simhash
+        site.title = result.title
+
+        rate = site.change_rate
+        if rate is None:
+            interval = self.min_interval
+        elif rate == 0:
+            interval = site.interval * 2
+        else:
+            interval = 1 / rate
+        # Sites which fail now and then are checked often enough to find their outages.
+        uptime = site.uptime
+        if uptime is not None and uptime < 1:
+            interval = min(interval, self.min_interval / (1 - uptime))
+        site.interval = self.clamp(interval)
+        site.next_check = now + site.interval
+        return event
+
+
+    def is_changed(self, site: Site, result: CheckResult) -> bool:
+        """
+        Check if the page has changed since the site was up last time.
+        """
+        if result.digest == site.digest:
+            return False
+        if self.change_distance > 0 and result.simhash is not None and site.simhash is not None:
+            return (result.simhash ^ site.simhash).bit_count() > self.change_distance
+        return True
+
+
+    def clamp(self, interval: float) -> float:
+        return min(self.max_interval, max(self.min_interval, interval))
+
+
+class MonitorStore:
+    """
+    Sites to monitor and the history of their checks, saved to a SQLite database.
+
+    Sites are indexed by the time of their next check, so a cycle reads only the sites
+    which are due, however many sites are monitored.
+    URLs are canonicalized as in the crawl, so that spellings of a URL are one site.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.canonicalizer = Canonicalizer()
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+
+    def add(self, urls: Iterable[str], now: float) -> int:
+        """
+        Add sites which are not monitored yet. They are checked at the next cycle.
+
+        Returns
+        ---------------------------------------
+        int
+            Number of sites added.
+        """
+        before = self.conn.total_changes
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO sites (url, added_at, next_check) VALUES (?, ?, ?)",
+                ((self.canonicalizer.canonicalize(url), now, now) for url in urls))
+        return self.conn.total_changes - before
+
+
+    def due(self, now: float) -> list[Site]:
+        """
+        Sites whose next check is due, the most overdue first.
+        """
+        return [Site.from_row(row) for row in self.conn.execute(
+            f"SELECT {', '.join(SITE_COLUMNS)} FROM sites WHERE next_check <= ? ORDER BY next_check",
+            (now,))]
+
+
+    def save(self, sites: list[Site]) -> None:
+        """
+        Save checked sites in a transaction.
+        """
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT OR REPLACE INTO sites ({', '.join(SITE_COLUMNS)}) " \
+                f"VALUES ({', '.join('?' for _ in SITE_COLUMNS)})",
+                (site.to_row() for site in sites))
+
+
+    def next_check(self) -> Optional[float]:
+        """
+        UNIX time of the earliest next check.
+        """
+        return self.conn.execute("SELECT MIN(next_check) FROM sites").fetchone()[0]
+
+
+    def count(self) -> tuple[int, int, int]:
+        """
+        Number of sites, of sites which are up, and of sites which are down.
+        """
+        return self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(alive = 1), 0), COALESCE(SUM(alive = 0), 0) FROM sites").fetchone()
+
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def read_urls(path: str) -> list[str]:
+    """
+    URLs in a file: one per line, or the onion sites of a crawl output in JSON or JSON Lines.
+    """
+    with open(path, encoding='utf-8') as f:
+        if path.endswith('.json'):
+            return [data['url'] for data in json.load(f)]
+        if path.endswith('.jsonl'):
+            return [json.loads(line)['url'] for line in f if line.strip() != '']
+        return [line.strip() for line in f if line.strip() != '' and line.startswith('#') is False]
+
+
+def top_page(url: str) -> str:
+    """
+    Top page of the site of a URL.
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}/"
+
+
+class Monitor:
+    """
+    Check the monitored sites repeatedly, and report only what has changed.
+
+    Each cycle checks only the sites which are due by `RevisitPolicy`,
+    so the number of requests per cycle follows how often the sites change and fail,
+    not how many sites are monitored. New sites, changes, sites which went down
+    and sites which came back are printed and written to the delta output.
+    Sites are checked only if their robots.txt allows it, as in the crawl.
+
+    Parameters
+    ---------------------------------------
+    console: Console
+        Console for outputs.
+    pool: TorPool
+        Pool to request the sites.
+    store: MonitorStore
+        Sites to monitor.
+    policy: RevisitPolicy
+        When sites are checked, and what is a change.
+    concurrency: int
+        Maximum number of requests in flight.
+    delay: float
+        Delay between requests to the same host.
+    max_bytes: int
+        Maximum bytes of a page.
+    parser: str
+        HTML parser.
+    discover: bool
+        Monitor the top pages of onion sites linked from the monitored pages.
+    robots_ttl: float
+        Seconds to keep robots.txt of a host.
+    output: Optional[IO[str]]
+        File to write the changes to, one JSON object per line.
+    verbose: bool
+        Print every check.
+    """
+    def __init__(
+        self,
+        console: 'Console',
+        pool: 'TorPool',
+        store: MonitorStore,
+        policy: RevisitPolicy,
+        concurrency: int,
+        delay: float,
+        max_bytes: int,
+        parser: str,
+        discover: bool = False,
+        robots_ttl: float = DEFAULT_ROBOTS_TTL,
+        output: Optional[IO[str]] = None,
+        verbose: bool = False,
+    ) -> None:
+        self.console = console
+        self.pool = pool
+        self.store = store
+        self.policy = policy
+        self.concurrency = concurrency
+        self.delay = delay
+        self.max_bytes = max_bytes
+        self.parser = parser
+        self.discover = discover
+        self.robots = RobotsCache(pool, ttl=robots_ttl)
+        self.output = output
+        self.verbose = verbose
+
+        # Number of changes per event in the current cycle
+        self.events: dict[str, int] = {}
+
+
+    async def run(self, cycles: int, cycle_interval: float) -> None:
+        """
+        Run cycles until `cycles` have run, or forever if it's `0`.
+        Between cycles, it sleeps until the next check is due, or for `cycle_interval` at least.
+        """
+        # Created here because it must belong to the running event loop.
+        self.scheduler = HostScheduler(concurrency=self.concurrency, delay=self.delay, max_connections_per_host=1)
+
+        cycle = 0
+        while True:
+            cycle += 1
+            started = time.time()
+            await self.cycle(cycle)
+            if cycles > 0 and cycle >= cycles:
+                return
+
+            next_check = self.store.next_check()
+            wait = max(cycle_interval - (time.time() - started), 0.0)
+            if next_check is not None:
+                wait = max(wait, next_check - time.time())
+            self.console.print(f"Next cycle in {wait:.0f} seconds.")
+            await asyncio.sleep(wait)
+
+
+    async def cycle(self, cycle: int) -> None:
+        """
+        Check the sites which are due, and save them.
+        """
+        sites = self.store.due(time.time())
+        self.events = {event: 0 for event in EVENTS}
+        checked: list[Site] = []
+
+        async def worker(queue: list[Site]) -> None:
+            while len(queue) > 0:
+                site = queue.pop()
+                await self.check(site)
+                checked.append(site)
+                if len(checked) >= STORE_BATCH_SIZE:
+                    self.store.save(checked)
+                    checked.clear()
+
+        # The most overdue sites are popped first.
+        queue = sites[::-1]
+        await asyncio.gather(*(worker(queue) for _ in range(min(self.concurrency, len(sites)))))
+        self.store.save(checked)
+        if self.output is not None:
+            self.output.flush()
+
+        total, up, down = self.store.count()
+        self.console.print(
+            f"Cycle {cycle}: checked {len(sites)} of {total} sites ({up} up, {down} down). " \
+            + ", ".join(f"{count} {event}" for event, count in self.events.items()))
+
+
+    async def check(self, site: Site) -> None:
+        """
+        Check a site and report its change.
+        """
+        result = await self.fetch(site.url)
+        if result is None:
+            # robots.txt may allow it later.
+            site.next_check = time.time() + self.policy.max_interval
+            self.console.print(f"Skip {site.url}: disallowed by robots.txt.", style="yellow")\
+                if self.verbose else None
+            return
+        event = self.policy.record(site, result, time.time())
+        self.console.print(
+            f"Checked {site.url}: {'up' if result.alive else 'failed'}, next check in {site.interval:.0f} s")\
+            if self.verbose else None
+        if event is not None:
+            self.report(site, event)
+
+        if self.discover and result.links is not None:
+            added = self.store.add(dict.fromkeys(top_page(url) for url in result.links), time.time())
+            self.console.print(f"{added} new sites linked from {site.url}.") if self.verbose and added > 0 else None
+
+
+    async def fetch(self, url: str) -> Optional[CheckResult]:
+        """
+        Fetch a page, and hash its text to compare it with the previous check.
+        None if robots.txt disallows the page.
+        """
+        async with self.scheduler.slot(url):
+            try:
+                robots = await self.robots.get(url)
+            except Exception:
+                self.console.print(f"could not access to robots.txt of {url}.") if self.verbose else None
+                return CheckResult(False)
+            if robots is not None and robots.can_fetch(url) is False:
+                return None
+
+            try:
+                resp = await self.pool.fetch(
+                    url, max_bytes=self.max_bytes, status_codes=[200], content_types=HTML_CONTENT_TYPES)
+            except Exception:
+                self.console.print(f"could not access to {url}.") if self.verbose else None
+                return CheckResult(False)
+
+        if resp.status_code >= DOWN_STATUS_CODE:
+            return CheckResult(False, resp.status_code, resp.ttfb)
+
+        parts = [str(resp.status_code)]
+        if resp.content is None:
+            parts.append(resp.content_type)
+            return CheckResult(True, resp.status_code, resp.ttfb, hash_parts(parts))
+
+        scraped = scrape_page(resp.content, resp.encoding, resp.url, CHANGE_CONTENT_WORDS, self.parser)
+        if scraped.info is None:
+            # The page only redirects with meta refresh.
+            parts.append(scraped.redirect_url or "")
+            return CheckResult(True, resp.status_code, resp.ttfb, hash_parts(parts), title=parse_hostname(url))
+        parts.extend(scraped.info)
+        return CheckResult(
+            True, resp.status_code, resp.ttfb, hash_parts(parts), scraped.simhash, scraped.info[0], scraped.links)
+
+
+    def report(self, site: Site, event: str) -> None:
+        """
+        Print a change of a site and write it to the delta output.
+        """
+        self.events[event] += 1
+        styles = {'new': "green", 'changed': "cyan", 'down': "red", 'up': "green"}
+        self.console.print(f"[{event}] {site.url} {site.title or ''}", style=styles[event], markup=False)
+        if self.output is not None:
+            self.output.write(json.dumps(site.to_event(event), ensure_ascii=False) + "\n")
+
+
+def hash_parts(parts: list[str]) -> str:
+    return hashlib.blake2b("\n".join(parts).encode('utf-8'), digest_size=16).hexdigest()
@@ -0,0 +1,170 @@
+from bs4 import BeautifulSoup
+import re
+from typing import Callable, Optional
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+
+PARSERS = ['auto', 'lxml', 'bs4']
+
+
+class ParsedPage:
+    """
+    Elements of a page used by the extractors.
+
+    Parameters
+    ---------------------------------
+    title: Optional[str]
+        Text in `<title>`, or None if there is no title.
+    description: Optional[str]
+        Content of `<meta name="description">`.
+    refresh: Optional[str]
+        Content of `<meta http-equiv="refresh">`.
+    text: str
+        Text in `<body>`.
+    hrefs: list[str]
+        Links in `<a href>` in the document order.
+    """
+    def __init__(
+        self,
+        title: Optional[str],
+        description: Optional[str],
+        refresh: Optional[str],
+        text: str,
+        hrefs: list[str],
+    ) -> None:
+        self.title = title
+        self.description = description
+        self.refresh = refresh
+        self.text = text
+        self.hrefs = hrefs
+
+
+def parse_bs4(html: str) -> ParsedPage:
+    """
+    Parse HTML with BeautifulSoup and Python's `html.parser`.
+    """
+    s = BeautifulSoup(html, 'html.parser')
+
+    title = s.title.text if s.title is not None else None
+
+    description: Optional[str] = None
+    meta_description = s.find('meta', attrs={'name': 'description'})
+    if meta_description is not None and meta_description.get('content') is not None:
+        description = str(meta_description.get('content'))
+
+    refresh: Optional[str] = None
+    meta_refresh = s.find('meta', attrs={'http-equiv': re.compile('^refresh$', re.I)})
+    if meta_refresh is not None and meta_refresh.get('content') is not None:
+        refresh = str(meta_refresh.get('content'))
+
+    body = s.find('body')
+    text = body.text if body is not None else ""
+
+    hrefs = [str(a['href']) for a in s.find_all('a', href=True)]
+
+    return ParsedPage(title, description, refresh, text, hrefs)
+
+
+class PageTarget:
+    """
+    lxml parser target which collects the elements of a page in one pass,
+    without building a tree.
+    """
+    def __init__(self) -> None:
+        self.title: Optional[list[str]] = None
+        self.in_title = False
+        self.description: Optional[str] = None
+        self.found_description = False
+        self.refresh: Optional[str] = None
+        self.found_refresh = False
+        self.text: list[str] = []
+        self.body_depth = 0
+        self.found_body = False
+        self.hrefs: list[str] = []
+
+
+    def start(self, tag: str, attrib: dict[str, str]) -> None:
+        if tag == 'a':
+            href = attrib.get('href')
+            if href is not None:
+                self.hrefs.append(href)
+        elif tag == 'meta':
+            if self.found_description is False and attrib.get('name') == 'description':
+                self.found_description = True
+                self.description = attrib.get('content')
+            if self.found_refresh is False \
+                    and (attrib.get('http-equiv') or '').lower() == 'refresh':
+                self.found_refresh = True
+                self.refresh = attrib.get('content')
+        elif tag == 'title':
+            if self.title is None:
+                self.title = []
+                self.in_title = True
+        elif tag == 'body':
+            if self.found_body is False or self.body_depth > 0:
+                self.found_body = True
+                self.body_depth += 1
+
+
+    def end(self, tag: str) -> None:
+        if tag == 'title':
+            self.in_title = False
+        elif tag == 'body' and self.body_depth > 0:
+            self.body_depth -= 1
+
+
+    def data(self, data: str) -> None:
+        if self.in_title and self.title is not None:
+            self.title.append(data)
+        if self.body_depth > 0:
+            self.text.append(data)
+
+
+    def comment(self, text: str) -> None:
+        pass
+
+
+    def close(self) -> ParsedPage:
+        return ParsedPage(
+            "".join(self.title) if self.title is not None else None,
+            self.description,
+            self.refresh,
+            "".join(self.text),
+            self.hrefs)
+
+
+def parse_lxml(html: str) -> ParsedPage:
+    """
+    Parse HTML with lxml's C parser in one pass.
+    """
+    if html.strip() == "":
+        return ParsedPage(None, None, None, "", [])
+
+    parser = etree.HTMLParser(target=PageTarget(), encoding='utf-8')
+    parser.feed(html.encode('utf-8', errors='replace'))
+    return parser.close()
+
+
+def get_parser(name: str = 'auto') -> Callable[[str], ParsedPage]:
+    """
+    Get a function to parse HTML.
+
+    Parameters
+    ---------------------------------
+    name: str
+        `lxml`, `bs4`, or `auto` which uses lxml if it's installed.
+    """
+    if name == 'auto':
+        name = 'lxml' if etree is not None else 'bs4'
+
+    if name == 'lxml':
+        if etree is None:
+            raise Exception("lxml is not installed. Install it with `pip install hiddenbot[fast]`.")
+        return parse_lxml
+    if name == 'bs4':
+        return parse_bs4
+    raise Exception(f"Unknown parser: {name}")
@@ -1,23 +1,72 @@
 import json
-from rich.console import Console
+from json.encoder import encode_basestring
+import sys
+from typing import TYPE_CHECKING, Any, Optional
+
+from .canonical import parse_hostname
+
+if TYPE_CHECKING:
+    from rich.console import Console
 
 
 class OnionSite:
     """
     An onion site information which is crawled.
+    `mirror_of` is the URL of the site which this site is a near-duplicate of.
+
+    Records are slotted, and strings which repeat across the pages of a site,
+    i.e. the hostname, the title, the description and the parent URL, are interned,
+    so that millions of them can be kept in memory.
+
+    Parameters
+    ------------------------------
+    depth: Optional[int]
+        Depth where the page was found. The initial URL is 0.
+    parent: Optional[str]
+        URL of the page which linked to this page.
+    fetched_at: Optional[float]
+        UNIX time when the page was fetched.
+    status: Optional[int]
+        HTTP status code of the page.
+    artifacts: Optional[dict[str, list[str]]]
+        Emails, cryptocurrency addresses, PGP keys, onion addresses in plain text and keywords
+        found in the page, by type.
     """
-    def __init__(self, title: str, description: str, content: str, url: str) -> None:
-        self.title = title
-        self.description = description
+    __slots__ = (
+        'title', 'description', 'content', 'url', 'host', 'mirror_of',
+        'depth', 'parent', 'fetched_at', 'status', 'artifacts')
+
+    def __init__(
+        self,
+        title: str,
+        description: str,
+        content: str,
+        url: str,
+        mirror_of: Optional[str] = None,
+        depth: Optional[int] = None,
+        parent: Optional[str] = None,
+        fetched_at: Optional[float] = None,
+        status: Optional[int] = None,
+        artifacts: Optional[dict[str, list[str]]] = None,
+    ) -> None:
+        self.title = sys.intern(title)
+        self.description = sys.intern(description)
         self.content = content
         self.url = url
+        self.host = sys.intern(parse_hostname(url) or "")
+        self.mirror_of = sys.intern(mirror_of) if mirror_of is not None else None
+        self.depth = depth
+        self.parent = sys.intern(parent) if parent is not None else None
+        self.fetched_at = fetched_at
+        self.status = status
+        self.artifacts = artifacts
 
 
-    def print_info(self, console: Console):
+    def print_info(self, console: 'Console'):
         """
         Print information of an onion site.
 
-        Parameterss
+        Parameters
         ------------------------------
         console: Console
             Console instance for outputs.
@@ -27,11 +76,69 @@ class OnionSite:
         console.print("-"*32)
         console.print(f"Title: {self.title}")
         console.print(f"Description: {self.description}")
+        # Only the first words are split off the content.
         console.print(
-            f"Content: {' '.join(self.content.split()[:10])+'...' if len(self.content) >= 10 else self.content}")
+            f"Content: {' '.join(self.content.split(maxsplit=10)[:10])+'...' if len(self.content) >= 10 else self.content}")
         console.print(f"URL: {self.url}")
+        console.print(f"Mirror of: {self.mirror_of}") if self.mirror_of is not None else None
+        console.print(
+            "Artifacts: " + ", ".join(f"{len(values)} {name}" for name, values in self.artifacts.items()))\
+            if self.artifacts is not None else None
         console.print()
 
 
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> 'OnionSite':
+        return cls(
+            data['title'], data['description'], data['content'], data['url'], data.get('mirror_of'),
+            data.get('depth'), data.get('parent'), data.get('fetched_at'), data.get('status'),
+            data.get('artifacts'))
+
+
+    def to_dict(self) -> dict[str, Any]:
+        # Keys are in sorted order. Optional fields are omitted if they are not set.
+        data: dict[str, Any] = {}
+        if self.artifacts is not None:
+            data['artifacts'] = self.artifacts
+        data['content'] = self.content
+        if self.depth is not None:
+            data['depth'] = self.depth
+        data['description'] = self.description
+        if self.fetched_at is not None:
+            data['fetched_at'] = self.fetched_at
+        if self.mirror_of is not None:
+            data['mirror_of'] = self.mirror_of
+        if self.parent is not None:
+            data['parent'] = self.parent
+        if self.status is not None:
+            data['status'] = self.status
+        data['title'] = self.title
+        data['url'] = self.url
+        return data
+
+
+    def to_jsonl(self) -> str:
+        """
+        Serialize to one line of JSON, the same as `json.dumps(self.to_dict(), ensure_ascii=False)`,
+        without building the dict.
+        """
+        line = '{'
+        if self.artifacts is not None:
+            line += '"artifacts": ' + json.dumps(self.artifacts, ensure_ascii=False) + ', '
+        line += '"content": ' + encode_basestring(self.content)
+        if self.depth is not None:
+            line += f', "depth": {self.depth}'
+        line += ', "description": ' + encode_basestring(self.description)
+        if self.fetched_at is not None:
+            line += f', "fetched_at": {self.fetched_at!r}'
+        if self.mirror_of is not None:
+            line += ', "mirror_of": ' + encode_basestring(self.mirror_of)
+        if self.parent is not None:
+            line += ', "parent": ' + encode_basestring(self.parent)
+        if self.status is not None:
+            line += f', "status": {self.status}'
+        return line + ', "title": ' + encode_basestring(self.title) + ', "url": ' + encode_basestring(self.url) + '}'
+
+
     def to_json(self) -> str:
-        return json.dumps(self, default=lambda o: o.__dict__, sort_keys=True, indent=4)
\ No newline at end of file
+        return json.dumps(self.to_dict(), sort_keys=True, indent=4)
@@ -0,0 +1,268 @@
+import asyncio
+import re
+import time
+from typing import TYPE_CHECKING, Iterable, Optional, Union
+from urllib.parse import urlsplit
+
+from .state import CrawlState
+
+if TYPE_CHECKING:
+    from ..tor import TorPool
+
+
+# Product token to find our group in robots.txt
+ROBOTS_USER_AGENT = 'hiddenbot'
+
+# Seconds to keep robots.txt of a host
+DEFAULT_ROBOTS_TTL = 24 * 60 * 60
+# Seconds to remember that a host has no robots.txt
+DEFAULT_ROBOTS_NEGATIVE_TTL = 60 * 60
+
+# Maximum bytes of robots.txt to read. Google also reads the first 500 KiB.
+ROBOTS_MAX_BYTES = 500 * 1024
+
+
+class RobotsRules:
+    """
+    Rules in robots.txt which apply to us.
+
+    Each rule is compiled once into a prefix or a regular expression.
+    As Google's crawler does, the longest matching rule wins and `Allow` wins a tie.
+    """
+    def __init__(self, base_url: str, allow: list[str], disallow: list[str]) -> None:
+        self.base_url = base_url
+        self.allow = allow
+        self.disallow = disallow
+
+        self.rules: list[tuple[int, bool, Union[str, re.Pattern]]] = []
+        for path in allow:
+            self.rules.append((len(path), True, compile_rule(path)))
+        for path in disallow:
+            # An empty `Disallow` allows everything.
+            if path != '':
+                self.rules.append((len(path), False, compile_rule(path)))
+        # Longer rules first, `Allow` first for the same length.
+        self.rules.sort(key=lambda r: (r[0], r[1]), reverse=True)
+
+        # URLs in `Allow` are also crawled.
+        self.allowed_urls: set[str] = set(
+            base_url + path for path in allow
+            if path.startswith('/') and '*' not in path and '$' not in path)
+
+
+    def can_fetch(self, url: str) -> bool:
+        """
+        Check if specified URL is allowed to fetch.
+        """
+        u = urlsplit(url)
+        path = u.path or '/'
+        if u.query:
+            path += '?' + u.query
+
+        for _, allowed, matcher in self.rules:
+            if isinstance(matcher, str):
+                if path.startswith(matcher):
+                    return allowed
+            elif matcher.match(path):
+                return allowed
+        return True
+
+
+def compile_rule(path: str) -> Union[str, re.Pattern]:
+    """
+    Compile a path in robots.txt into a prefix or a regular expression for wildcards.
+    """
+    if '*' not in path and not path.endswith('$'):
+        return path
+
+    anchored = path.endswith('$')
+    if anchored:
+        path = path[:-1]
+    pattern = '.*'.join(re.escape(p) for p in path.split('*'))
+    return re.compile(pattern + ('$' if anchored else ''))
+
+
+def parse_robots(text: str, user_agent: str = ROBOTS_USER_AGENT) -> tuple[list[str], list[str]]:
+    """
+    Parse robots.txt and get the paths of `Allow` and `Disallow` for the user agent.
+
+    Directives are case-insensitive. Rules of the groups naming the user agent are used,
+    otherwise rules of the `*` groups.
+
+    Parameters
+    ---------------------------------------
+    text: str
+        Content of robots.txt.
+    user_agent: str
+        Product token of the crawler.
+
+    Returns
+    ---------------------------------------
+    tuple[list[str], list[str]]
+        Paths of `Allow` and `Disallow`.
+    """
+    user_agent = user_agent.lower()
+
+    groups: list[tuple[list[str], list[str], list[str]]] = []
+    agents: list[str] = []
+    in_rules = False
+
+    for line in text.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        key = key.strip().lower()
+        value = value.strip()
+
+        if key == 'user-agent':
+            # A user-agent line after rules starts a new group.
+            if in_rules:
+                agents = []
+                in_rules = False
+            if len(agents) == 0:
+                groups.append((agents, [], []))
+            agents.append(value.lower())
+        elif key in ('allow', 'disallow'):
+            if len(groups) == 0:
+                continue
+            in_rules = True
+            _, allow, disallow = groups[-1]
+            (allow if key == 'allow' else disallow).append(value)
+
+    matched = [g for g in groups if any(a.split('/')[0] == user_agent for a in g[0])]
+    if len(matched) == 0:
+        matched = [g for g in groups if '*' in g[0]]
+
+    allow = [path for g in matched for path in g[1]]
+    disallow = [path for g in matched for path in g[2]]
+    return allow, disallow
+
+
+class RobotsCache:
+    """
+    Cache of robots.txt per host.
+
+    robots.txt is fetched once per host and kept for the TTL.
+    Hosts without robots.txt are remembered for the negative TTL.
+    A host which could not be reached is not remembered: its robots.txt is fetched again next time.
+    When the crawl state is given, fetched robots.txt is saved to it.
+    """
+    def __init__(
+        self,
+        pool: 'TorPool',
+        ttl: float = DEFAULT_ROBOTS_TTL,
+        negative_ttl: float = DEFAULT_ROBOTS_NEGATIVE_TTL,
+        state: Optional[CrawlState] = None,
+    ) -> None:
+        self.pool = pool
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.state = state
+
+        self.entries: dict[str, tuple[float, Optional[RobotsRules]]] = {}
+        self.locks: dict[str, asyncio.Lock] = {}
+        # Number of requests which hold or wait for the lock of a host
+        self.waiters: dict[str, int] = {}
+        # Monotonic time when fetching robots.txt of a host failed last
+        self.failures: dict[str, float] = {}
+
+
+    async def get(self, url: str) -> Optional[RobotsRules]:
+        """
+        Get the rules of robots.txt for the host of specified URL.
+
+        Returns
+        ---------------------------------------
+        Optional[RobotsRules]
+            Rules of robots.txt, or None if the host has no robots.txt.
+
+        Raises
+        ---------------------------------------
+        Exception
+            robots.txt could not be fetched because the host could not be reached.
+        """
+        base_url = "{0.scheme}://{0.netloc}".format(urlsplit(url))
+        started = time.monotonic()
+
+        entry = self.entries.get(base_url)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        # Only one request per host fetches robots.txt. The others wait for it.
+        # The lock and the last failure of a host are kept only while requests wait for them.
+        lock = self.locks.setdefault(base_url, asyncio.Lock())
+        self.waiters[base_url] = self.waiters.get(base_url, 0) + 1
+        try:
+            async with lock:
+                entry = self.entries.get(base_url)
+                if entry is not None and entry[0] > time.monotonic():
+                    return entry[1]
+
+                # Requests which waited for a failed fetch fail with it, instead of trying again each.
+                failed = self.failures.get(base_url)
+                if failed is not None and failed >= started:
+                    raise Exception(f"could not access to {base_url}/robots.txt.")
+
+                try:
+                    rules = await get_robots(self.pool, base_url)
+                except Exception:
+                    self.failures[base_url] = time.monotonic()
+                    raise
+                self.failures.pop(base_url, None)
+                ttl = self.ttl if rules is not None else self.negative_ttl
+                self.entries[base_url] = (time.monotonic() + ttl, rules)
+                if self.state is not None:
+                    self.state.set_robots(
+                        base_url,
+                        (rules.allow, rules.disallow) if rules is not None else None,
+                        time.time() + ttl)
+        finally:
+            self.waiters[base_url] -= 1
+            if self.waiters[base_url] == 0:
+                del self.waiters[base_url]
+                self.locks.pop(base_url, None)
+                self.failures.pop(base_url, None)
+        return rules
+
+
+    def restore(
+        self,
+        entries: Iterable[tuple[str, Optional[tuple[list[str], list[str]]], float]],
+    ) -> None:
+        """
+        Restore robots.txt saved in the crawl state.
+
+        Parameters
+        ---------------------------------------
+        entries: Iterable[tuple[str, Optional[tuple[list[str], list[str]]], float]]
+            Base URL, paths of `Allow` and `Disallow` and UNIX time when they expire.
+        """
+        now, now_monotonic = time.time(), time.monotonic()
+        for base_url, rules, expires in entries:
+            self.entries[base_url] = (
+                now_monotonic + expires - now,
+                RobotsRules(base_url, *rules) if rules is not None else None)
+
+
+async def get_robots(pool: 'TorPool', base_url: str) -> Optional[RobotsRules]:
+    """
+    Get rules in `robots.txt`.
+
+    Returns None if the host has no robots.txt, i.e. it's answered with other than plain text.
+    Errors of the transport are raised, because the host may have robots.txt which couldn't be read.
+    """
+    robots_url = base_url + "/robots.txt"
+
+    started = time.monotonic()
+    try:
+        resp = await pool.fetch(
+            robots_url, max_bytes=ROBOTS_MAX_BYTES,
+            status_codes=[200], content_types=('text/plain',))
+    finally:
+        pool.metrics.observe('robots', time.monotonic() - started) if pool.metrics is not None else None
+    if resp.content is None:
+        return None
+
+    allow, disallow = parse_robots(resp.text)
+    return RobotsRules(base_url, allow, disallow)
@@ -0,0 +1,131 @@
+import asyncio
+from contextlib import asynccontextmanager
+import time
+from typing import AsyncIterator, Optional
+
+from .utils import parse_hostname
+
+
+class HostState:
+    """
+    Politeness state of a host.
+    """
+    def __init__(self, burst: int, max_connections: int) -> None:
+        # Token bucket. Tokens can become negative while requests are
+        # reserved ahead of time, so each waiter sleeps only for its own share.
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.connections = asyncio.Semaphore(max_connections)
+
+        # Statistics
+        self.requests = 0
+        self.wait_time = 0.0
+        self.fetch_time = 0.0
+
+
+class HostScheduler:
+    """
+    Schedule requests so that the delay is enforced per host.
+
+    Each host has its own token bucket refilled at `1 / delay` tokens per second
+    and a cap on simultaneous connections.
+    While a host is cooling down, requests to other hosts keep being fetched.
+    The global concurrency limit is applied after the host is ready,
+    so a waiting host never holds one of the global slots.
+    """
+    def __init__(
+        self,
+        concurrency: int,
+        delay: float,
+        max_connections_per_host: int,
+        burst: int = 1,
+    ) -> None:
+        self.delay = delay
+        self.burst = burst
+        self.max_connections_per_host = max_connections_per_host
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+        self.hosts: dict[str, HostState] = {}
+
+
+    def get_host(self, host: str) -> HostState:
+        """
+        Get the state of the host, creating it at the first request.
+        """
+        state = self.hosts.get(host)
+        if state is None:
+            state = HostState(self.burst, self.max_connections_per_host)
+            self.hosts[host] = state
+        return state
+
+
+    async def wait_token(self, state: HostState) -> None:
+        """
+        Take a token from the host's bucket, sleeping until it's available.
+        """
+        if self.delay <= 0:
+            return
+
+        now = time.monotonic()
+        rate = 1 / self.delay
+        state.tokens = min(float(self.burst), state.tokens + (now - state.updated) * rate)
+        state.updated = now
+
+        state.tokens -= 1
+        if state.tokens < 0:
+            await asyncio.sleep(-state.tokens / rate)
+
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """
+        Hold a slot to request the URL.
+
+        Parameters
+        ---------------------------------------
+        url: str
+            URL to be requested.
+        """
+        state = self.get_host(parse_hostname(url) or "")
+
+        started = time.monotonic()
+        async with state.connections:
+            await self.wait_token(state)
+            async with self.semaphore:
+                fetch_started = time.monotonic()
+                state.wait_time += fetch_started - started
+                try:
+                    yield
+                finally:
+                    state.requests += 1
+                    state.fetch_time += time.monotonic() - fetch_started
+
+
+    def restore(self, host: str, last_request: float) -> None:
+        """
+        Restore the cooldown of a host from the UNIX time of its last request.
+        """
+        state = self.get_host(host)
+        state.tokens = 0.0
+        state.updated = time.monotonic() - max(0.0, time.time() - last_request)
+
+
+    def report(self, limit: Optional[int] = None) -> list[tuple[str, int, float, float]]:
+        """
+        Report how long each host spent waiting versus being fetched.
+
+        Parameters
+        ---------------------------------------
+        limit: Optional[int]
+            Maximum number of hosts to report. Hosts which waited longest come first.
+
+        Returns
+        ---------------------------------------
+        list[tuple[str, int, float, float]]
+            Hostname, number of requests, waiting time and fetching time.
+        """
+        stats = [
+            (host, s.requests, s.wait_time, s.fetch_time)
+            for host, s in self.hosts.items()]
+        stats.sort(key=lambda s: s[2], reverse=True)
+        return stats[:limit] if limit is not None else stats
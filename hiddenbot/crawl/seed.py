@@ -0,0 +1,273 @@
+import asyncio
+import time
+from typing import TYPE_CHECKING, Optional
+from urllib.parse import parse_qs, quote_plus, urlsplit
+
+from ..urls import search_engines
+from .canonical import Canonicalizer, fingerprint
+from .fetch import HTML_CONTENT_TYPES
+from .parser import ParsedPage, get_parser
+from .utils import classify_link, parse_hostname
+
+if TYPE_CHECKING:
+    from rich.console import Console
+    from ..tor import TorPool
+
+
+# Seconds between requests to the same search engine
+DEFAULT_ENGINE_DELAY = 2.0
+# Maximum number of result pages per engine and query
+DEFAULT_SEED_PAGES = 5
+# Maximum bytes of a result page
+SEED_MAX_BYTES = 2 * 1024 * 1024
+
+
+class SearchEngine:
+    """
+    How to query a search engine in `urls.search_engines` and read its results.
+
+    Parameters
+    ---------------------------------------
+    name: str
+        Name in `urls.search_engines`.
+    path: str
+        Path of the result page relative to the URL of the engine, with `{query}`,
+        and `{offset}` of the first result or `{page}` from 1. An engine without `{query}`
+        is a link directory, whose page is fetched once and all of its links are seeds.
+    per_page: int
+        Number of results per page. `0` if results are not paged.
+    redirect_param: Optional[str]
+        Query parameter of the result links which has the URL of the result,
+        for engines which link results through a redirect.
+    """
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        per_page: int = 0,
+        redirect_param: Optional[str] = None,
+    ) -> None:
+        self.name = name
+        self.url = search_engines[name]
+        self.path = path
+        self.per_page = per_page
+        self.redirect_param = redirect_param
+
+
+    @property
+    def is_directory(self) -> bool:
+        return '{query}' not in self.path
+
+
+    def search_url(self, query: str, page: int) -> str:
+        """
+        URL of a result page.
+
+        Parameters
+        ---------------------------------------
+        query: str
+            Keywords.
+        page: int
+            Page from 0.
+        """
+        return self.url + self.path.format(
+            query=quote_plus(query), offset=page * self.per_page, page=page + 1)
+
+
+    def extract_results(self, page: ParsedPage, page_url: str) -> list[str]:
+        """
+        Onion URLs of the results in a page, without links to this or another search engine.
+        """
+        results = []
+        for href in page.hrefs:
+            if self.redirect_param is not None and self.redirect_param in href:
+                targets = parse_qs(urlsplit(href).query).get(self.redirect_param)
+                if targets is not None:
+                    href = targets[0]
+            url = classify_link(page_url, href)
+            if url is not None and parse_hostname(url) not in ENGINE_HOSTS:
+                results.append(url)
+        return results
+
+
+# Result pages of the search engines
+SEARCH_ENGINES = {
+    engine.name: engine for engine in [
+        # Ahmia returns all the results in one page, linked through its redirect.
+        SearchEngine('Ahmia', "search/?q={query}", redirect_param='redirect_url'),
+        SearchEngine('DuckDuckGo', "html/?q={query}&s={offset}", per_page=30, redirect_param='uddg'),
+        SearchEngine('Haystack', "?q={query}&offset={offset}", per_page=20),
+        SearchEngine('TheHiddenWiki', ""),
+        SearchEngine('Torch', "?P={query}&DEFAULTOP=and&TOPDOC={offset}", per_page=10),
+    ]
+}
+
+# Hosts of the search engines, whose links are not results
+ENGINE_HOSTS = {urlsplit(url).hostname for url in search_engines.values()}
+
+
+class Seeder:
+    """
+    Harvest onion URLs to start a crawl from, by querying the search engines at once.
+
+    Engines are queried concurrently, and the pages of each engine are requested
+    one by one at its own rate. An engine stops paging through the results of a query
+    when a page has no URL which the engine has not returned for the query yet,
+    i.e. the page is empty or repeats a previous one. URLs found by other engines or queries
+    don't stop it. URLs are deduplicated in their canonical form.
+
+    Parameters
+    ---------------------------------------
+    console: Console
+        Console for outputs.
+    pool: TorPool
+        Pool to request the search engines.
+    queries: list[str]
+        Keywords to search for.
+    engines: list[str]
+        Names of the engines in `SEARCH_ENGINES`.
+    max_pages: int
+        Maximum number of result pages per engine and query.
+    delay: float
+        Seconds between requests to the same engine.
+    parser: str
+        HTML parser.
+    strip_params: list[str]
+        Query parameters removed from URLs, as in the crawl.
+    verbose: bool
+        Print every result page.
+    """
+    def __init__(
+        self,
+        console: 'Console',
+        pool: 'TorPool',
+        queries: list[str],
+        engines: list[str],
+        max_pages: int = DEFAULT_SEED_PAGES,
+        delay: float = DEFAULT_ENGINE_DELAY,
+        parser: str = 'auto',
+        strip_params: Optional[list[str]] = None,
+        verbose: bool = False,
+    ) -> None:
+        for name in engines:
+            if name not in SEARCH_ENGINES:
+                raise Exception(f"Unknown search engine: {name}")
+        self.console = console
+        self.pool = pool
+        self.queries = queries
+        self.engines = [SEARCH_ENGINES[name] for name in engines]
+        self.max_pages = max_pages
+        self.delay = delay
+        self.parse = get_parser(parser)
+        self.canonicalizer = Canonicalizer(strip_params if strip_params is not None else [])
+        self.verbose = verbose
+
+        self.urls: list[str] = []
+        # Fingerprints of the URLs harvested
+        self.seen: set[int] = set()
+        # Number of pages and new URLs per engine
+        self.pages: dict[str, int] = {}
+        self.found: dict[str, int] = {}
+
+
+    async def harvest(self) -> list[str]:
+        """
+        Query the engines for all the queries, and return the onion URLs found.
+        """
+        # Created here because they must belong to the running event loop.
+        self.locks = {engine.name: asyncio.Lock() for engine in self.engines}
+        self.requested_at: dict[str, float] = {}
+
+        searches = []
+        for engine in self.engines:
+            self.pages[engine.name] = 0
+            self.found[engine.name] = 0
+            # A directory doesn't depend on the query.
+            queries = self.queries if engine.is_directory is False else [""]
+            searches += [self.search(engine, query) for query in queries]
+        await asyncio.gather(*searches)
+
+        for engine in self.engines:
+            self.console.print(
+                f"{engine.name}: {self.found[engine.name]} onion URLs from {self.pages[engine.name]} pages")
+        self.console.print(f"Harvested {len(self.urls)} onion URLs.")
+        return self.urls
+
+
+    async def search(self, engine: SearchEngine, query: str) -> None:
+        """
+        Page through the results of a query on an engine.
+        """
+        pages = self.max_pages if engine.per_page > 0 else 1
+        # Fingerprints of the results of this engine and query
+        returned: set[int] = set()
+        for page in range(pages):
+            url = engine.search_url(query, page)
+            results = await self.fetch_results(engine, url)
+            if results is None:
+                return
+            new, unseen = self.add(results, returned)
+            self.found[engine.name] += new
+            self.console.print(f"{engine.name} (page {page + 1}): {new} new onion URLs for '{query}'")\
+                if self.verbose else None
+            if unseen == 0:
+                return
+
+
+    async def fetch_results(self, engine: SearchEngine, url: str) -> Optional[list[str]]:
+        """
+        Fetch a result page at the rate of the engine, and extract the results.
+        None if the page could not be fetched.
+        """
+        async with self.locks[engine.name]:
+            wait = self.requested_at.get(engine.name, 0) + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.requested_at[engine.name] = time.monotonic()
+            try:
+                resp = await self.pool.fetch(
+                    url, max_bytes=SEED_MAX_BYTES, status_codes=[200], content_types=HTML_CONTENT_TYPES)
+            except Exception:
+                self.console.print(f"could not access to {url}.")
+                return None
+            finally:
+                # The delay is counted from the end of the request, as for crawled hosts.
+                self.requested_at[engine.name] = time.monotonic()
+
+        if resp.content is None:
+            self.console.print(f"{engine.name} returned {resp.status_code} for {url}.", style="yellow")\
+                if self.verbose else None
+            return None
+        self.pages[engine.name] += 1
+        return engine.extract_results(self.parse(resp.text), resp.url)
+
+
+    def add(self, urls: list[str], returned: set[int]) -> tuple[int, int]:
+        """
+        Add URLs which have not been harvested yet.
+
+        Parameters
+        ---------------------------------------
+        urls: list[str]
+            Results in a page.
+        returned: set[int]
+            Fingerprints of the results of the same engine and query so far. The results are added to it.
+
+        Returns
+        ---------------------------------------
+        tuple[int, int]
+            Number of URLs new to the harvest, and of URLs new to the engine and query.
+        """
+        new = unseen = 0
+        for url in urls:
+            url = self.canonicalizer.canonicalize(url)
+            key = fingerprint(url)
+            if key not in returned:
+                returned.add(key)
+                unseen += 1
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            self.urls.append(url)
+            new += 1
+        return new, unseen
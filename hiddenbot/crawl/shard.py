@@ -0,0 +1,408 @@
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+from typing import Iterator, Optional
+
+from .canonical import parse_hostname
+from .result import OnionSite
+
+
+# Number of forwarded URLs or results which triggers a flush to the shared queue
+DEFAULT_FORWARD_BATCH = 500
+# Seconds between flushes and claims of workers, and checks of the coordinator
+DEFAULT_EXCHANGE_INTERVAL = 0.2
+# Maximum number of URLs claimed at once
+DEFAULT_CLAIM_BATCH = 1000
+# Seconds without a claim after which a worker is dead
+DEFAULT_WORKER_TIMEOUT = 60.0
+# Number of times the coordinator restarts the worker of a shard
+DEFAULT_WORKER_RESTARTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    url TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    claimed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS queue_shard ON queue (shard, claimed, depth, id);
+CREATE INDEX IF NOT EXISTS queue_url ON queue (shard, url);
+CREATE TABLE IF NOT EXISTS workers (
+    shard INTEGER PRIMARY KEY,
+    host TEXT,
+    pid INTEGER,
+    seen_at REAL
+);
+CREATE TABLE IF NOT EXISTS results (
+    url TEXT PRIMARY KEY,
+    shard INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+"""
+
+
+def shard_of(url: str, shards: int) -> int:
+    """
+    Shard which owns the host of the URL.
+    The host is the same key as the scheduler, the robots cache and the health tracker use.
+    The hash is stable across processes and machines, unlike `hash()`.
+    """
+    host = parse_hostname(url) or ""
+    h = int.from_bytes(hashlib.blake2b(host.encode('utf-8'), digest_size=8).digest(), 'big')
+    return h % shards
+
+
+def is_running(pid: int) -> bool:
+    """
+    Check if a process of this machine is running.
+    """
+    # `os.kill` terminates the process on Windows.
+    if os.name == 'nt':
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ShardQueue:
+    """
+    Queue shared by the coordinator and the workers of a sharded crawl, in a SQLite database.
+
+    It holds URLs to crawl in each shard, the workers' heartbeats, and results.
+    A URL stays in the queue until the worker which claimed it has crawled it,
+    and URLs which a worker finds for its own shard are written as claimed by it.
+    Acks of crawled URLs are written in the same transaction as the URLs and results found in them.
+    So every URL to crawl is in the queue, the crawl is over when the queue is empty,
+    and URLs claimed by a worker which has died are queued again for its successor.
+
+    It's the stand-in of a network queue for workers on one machine or on a shared disk.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Transactions are begun explicitly, to take the write lock before reading.
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+
+    def is_empty(self) -> bool:
+        """
+        Check if no crawl has been started in the queue.
+        """
+        return self.get_meta('shards') is None
+
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+
+    def start(self, url: str, depth: int, shards: int) -> None:
+        """
+        Start a crawl from the URL.
+        """
+        with self.transaction():
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [('url', url), ('depth', str(depth)), ('shards', str(shards)), ('done', '0')])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO workers (shard) VALUES (?)", ((i,) for i in range(shards)))
+            self.conn.execute(
+                "INSERT INTO queue (shard, url, depth) VALUES (?, ?, 0)", (shard_of(url, shards), url))
+
+
+    def transaction(self) -> 'Transaction':
+        return Transaction(self.conn)
+
+
+    def forward(self, urls: list[tuple[int, str, int, int]]) -> None:
+        """
+        Add URLs to the queues of their shards.
+
+        Parameters
+        ---------------------------------------
+        urls: list[tuple[int, str, int, int]]
+            Shard, URL, depth, and whether the worker of the shard has already claimed it.
+        """
+        self.conn.executemany("INSERT INTO queue (shard, url, depth, claimed) VALUES (?, ?, ?, ?)", urls)
+
+
+    def ack(self, shard: int, urls: list[str]) -> None:
+        """
+        Remove URLs which the worker of the shard has crawled.
+        """
+        self.conn.executemany(
+            "DELETE FROM queue WHERE shard = ? AND url = ? AND claimed = 1", ((shard, url) for url in urls))
+
+
+    def add_results(self, shard: int, results: list[tuple[str, str]]) -> None:
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO results (url, shard, data) VALUES (?, ?, ?)",
+            ((url, shard, data) for url, data in results))
+
+
+    def register(self, shard: int) -> int:
+        """
+        Register this process as the worker of the shard.
+        URLs claimed by a previous worker of the shard are queued again.
+
+        Returns
+        ---------------------------------------
+        int
+            Number of URLs queued again.
+        """
+        with self.transaction():
+            requeued = self.requeue(shard)
+            self.heartbeat(shard)
+        return requeued
+
+
+    def claim(self, shard: int, limit: int) -> list[tuple[str, int]]:
+        """
+        Claim queued URLs of the shard, shallowest first. It's also the heartbeat of the worker.
+        """
+        with self.transaction():
+            rows = self.conn.execute(
+                "SELECT id, url, depth FROM queue WHERE shard = ? AND claimed = 0 ORDER BY depth, id LIMIT ?",
+                (shard, limit)).fetchall()
+            self.conn.executemany("UPDATE queue SET claimed = 1 WHERE id = ?", ((row[0],) for row in rows))
+            self.heartbeat(shard)
+        return [(url, depth) for _, url, depth in rows]
+
+
+    def heartbeat(self, shard: int) -> None:
+        self.conn.execute(
+            "UPDATE workers SET host = ?, pid = ?, seen_at = ? WHERE shard = ?",
+            (socket.gethostname(), os.getpid(), time.time(), shard))
+
+
+    def requeue(self, shard: int) -> int:
+        """
+        Queue the URLs claimed by the worker of the shard again, when it has died.
+
+        Returns
+        ---------------------------------------
+        int
+            Number of URLs queued again.
+        """
+        requeued = self.conn.execute(
+            "UPDATE queue SET claimed = 0 WHERE shard = ? AND claimed = 1", (shard,)).rowcount
+        self.conn.execute("UPDATE workers SET pid = NULL, seen_at = NULL WHERE shard = ?", (shard,))
+        return requeued
+
+
+    def dead_workers(self, timeout: float) -> list[int]:
+        """
+        Shards whose workers hold claimed URLs but have died:
+        their processes are gone if they are on this machine,
+        or they have not claimed for `timeout` seconds.
+        """
+        hostname = socket.gethostname()
+        dead = []
+        for shard, host, pid, seen_at in self.conn.execute(
+            "SELECT shard, host, pid, seen_at FROM workers AS w " \
+            "WHERE EXISTS (SELECT 1 FROM queue WHERE shard = w.shard AND claimed = 1)"):
+            if pid is None or seen_at is None or seen_at < time.time() - timeout \
+                    or (host == hostname and is_running(pid) is False):
+                dead.append(shard)
+        return dead
+
+
+    def is_finished(self) -> bool:
+        """
+        Check if no URL is left to crawl.
+        """
+        return self.conn.execute("SELECT EXISTS (SELECT 1 FROM queue)").fetchone()[0] == 0
+
+
+    def finish(self) -> None:
+        """
+        Tell the workers that the crawl is over.
+        """
+        self.conn.execute("UPDATE meta SET value = '1' WHERE key = 'done'")
+
+
+    def is_done(self) -> bool:
+        return self.get_meta('done') == '1'
+
+
+    def report(self) -> tuple[int, int, int]:
+        """
+        Number of queued URLs, URLs claimed by the workers, and results.
+        """
+        queued, claimed = self.conn.execute(
+            "SELECT COUNT(*) - COALESCE(SUM(claimed), 0), COALESCE(SUM(claimed), 0) FROM queue").fetchone()
+        results = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return queued, claimed, results
+
+
+    def load_results(self) -> Iterator[OnionSite]:
+        """
+        Load the results of all the shards.
+        """
+        for (data,) in self.conn.execute("SELECT data FROM results ORDER BY rowid"):
+            yield OnionSite.from_dict(json.loads(data))
+
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class Transaction:
+    """
+    Write transaction which takes the lock of the database at its beginning.
+    """
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+
+    def __enter__(self) -> None:
+        self.conn.execute("BEGIN IMMEDIATE")
+
+
+    def __exit__(self, exc_type: Optional[type], exc: Optional[BaseException], tb: object) -> None:
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+class Shard:
+    """
+    A worker's side of a sharded crawl.
+
+    Hosts are partitioned by a hash of their hostnames, so each host is crawled by one worker
+    and its politeness and robots.txt stay local. URLs of hosts of other shards, URLs of this shard,
+    results and acks of crawled URLs are buffered and written to the shared queue in batches.
+
+    Parameters
+    ---------------------------------------
+    queue: ShardQueue
+        Queue shared with the coordinator and the other workers.
+    index: int
+        Shard of this worker, from 0.
+    shards: int
+        Number of shards.
+    batch_size: int
+        Number of buffered URLs and results which triggers a flush.
+    claim_batch: int
+        Maximum number of URLs claimed at once.
+    """
+    def __init__(
+        self,
+        queue: ShardQueue,
+        index: int,
+        shards: int,
+        batch_size: int = DEFAULT_FORWARD_BATCH,
+        claim_batch: int = DEFAULT_CLAIM_BATCH,
+    ) -> None:
+        self.queue = queue
+        self.index = index
+        self.shards = shards
+        self.batch_size = batch_size
+        self.claim_batch = claim_batch
+
+        self.outbox: list[tuple[int, str, int, int]] = []
+        self.results: list[tuple[str, str]] = []
+        self.acks: list[str] = []
+        # URLs of this shard in the frontier which have not been crawled yet
+        self.pending: set[str] = set()
+        self.forwarded = 0
+        self.received = 0
+        self.requeued = queue.register(index)
+
+
+    def owns(self, url: str) -> bool:
+        return self.shards == 1 or shard_of(url, self.shards) == self.index
+
+
+    def forward(self, url: str, depth: int) -> None:
+        """
+        Forward a URL to the shard which owns its host.
+        """
+        self.outbox.append((shard_of(url, self.shards), url, depth, 0))
+        self.forwarded += 1
+        if len(self.outbox) >= self.batch_size:
+            self.flush()
+
+
+    def keep(self, url: str, depth: int) -> None:
+        """
+        Write a URL of this shard added to the frontier, as claimed by this worker,
+        so that it's crawled by the next worker if this one dies.
+        """
+        self.outbox.append((self.index, url, depth, 1))
+        self.pending.add(url)
+        if len(self.outbox) >= self.batch_size:
+            self.flush()
+
+
+    def hold(self, url: str) -> None:
+        """
+        Mark a claimed URL added to the frontier.
+        """
+        self.pending.add(url)
+
+
+    def drop(self, url: str) -> None:
+        """
+        Ack a claimed URL which is not added to the frontier,
+        unless the same URL is in the frontier and is acked when it's crawled.
+        """
+        if url not in self.pending:
+            self.acks.append(url)
+
+
+    def ack(self, url: str) -> None:
+        """
+        Ack a URL which has been crawled.
+        """
+        self.pending.discard(url)
+        self.acks.append(url)
+        if len(self.acks) >= self.batch_size:
+            self.flush()
+
+
+    def add_result(self, onion: OnionSite) -> None:
+        self.results.append((onion.url, onion.to_jsonl()))
+        if len(self.results) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self) -> None:
+        """
+        Write the buffered URLs, results and acks in a transaction.
+        """
+        if len(self.outbox) == 0 and len(self.results) == 0 and len(self.acks) == 0:
+            return
+        with self.queue.transaction():
+            # URLs are written before the acks, which may be of the same URLs.
+            self.queue.forward(self.outbox)
+            self.queue.add_results(self.index, self.results)
+            self.queue.ack(self.index, self.acks)
+        self.outbox = []
+        self.results = []
+        self.acks = []
+
+
+    def claim(self) -> list[tuple[str, int]]:
+        """
+        Claim URLs forwarded to this shard.
+        """
+        urls = self.queue.claim(self.index, self.claim_batch)
+        self.received += len(urls)
+        return urls
+
+
+    def is_done(self) -> bool:
+        return self.queue.is_done()
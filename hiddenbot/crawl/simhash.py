@@ -0,0 +1,109 @@
+import hashlib
+from typing import Optional
+
+
+# Number of bits of a SimHash
+SIMHASH_BITS = 64
+
+# Number of words in a shingle
+SHINGLE_SIZE = 3
+
+# Pages with fewer words are too short to be compared.
+SIMHASH_MIN_WORDS = 20
+
+# Maximum Hamming distance between SimHashes of near-duplicate pages
+DEFAULT_MIRROR_DISTANCE = 3
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    64-bit SimHash of word shingles in the text.
+    Similar texts have SimHashes which differ in a few bits.
+
+    Returns
+    ---------------------------------------
+    Optional[int]
+        The SimHash, or None if the text has fewer than `SIMHASH_MIN_WORDS` words.
+    """
+    words = text.lower().split()
+    if len(words) < SIMHASH_MIN_WORDS:
+        return None
+
+    counts = [0] * SIMHASH_BITS
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        shingle = ' '.join(words[i:i + SHINGLE_SIZE]).encode('utf-8')
+        h = int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            counts[bit] += 1 if h >> bit & 1 else -1
+
+    result = 0
+    for bit, count in enumerate(counts):
+        if count > 0:
+            result |= 1 << bit
+    return result
+
+
+class SimHashIndex:
+    """
+    Index of SimHashes to find a near-duplicate without comparing all of them.
+
+    A SimHash is split into `max_distance + 1` bands, and each band is a bucket key.
+    Two SimHashes within `max_distance` bits differ in at most `max_distance` bands,
+    so they share at least one bucket and only the SimHashes in the same buckets are compared.
+
+    Parameters
+    ---------------------------------------
+    max_distance: int
+        Maximum Hamming distance of near-duplicates.
+    """
+    def __init__(self, max_distance: int = DEFAULT_MIRROR_DISTANCE) -> None:
+        self.max_distance = max_distance
+        self.num_bands = max_distance + 1
+        self.band_bits = SIMHASH_BITS // self.num_bands
+
+        # Buckets per band: value of the band -> SimHashes and their keys
+        self.buckets: list[dict[int, list[tuple[int, str]]]] = [{} for _ in range(self.num_bands)]
+        self.size = 0
+
+
+    def bands(self, h: int) -> list[int]:
+        """
+        Split the SimHash into bands. The last band has the remaining bits.
+        """
+        mask = (1 << self.band_bits) - 1
+        bands = [h >> (i * self.band_bits) & mask for i in range(self.num_bands - 1)]
+        bands.append(h >> ((self.num_bands - 1) * self.band_bits))
+        return bands
+
+
+    def add(self, h: int, key: str) -> None:
+        """
+        Add a SimHash with its key e.g. URL.
+        """
+        for i, band in enumerate(self.bands(h)):
+            self.buckets[i].setdefault(band, []).append((h, key))
+        self.size += 1
+
+
+    def find(self, h: int) -> Optional[str]:
+        """
+        Find the key of a near-duplicate SimHash.
+
+        Returns
+        ---------------------------------------
+        Optional[str]
+            Key of the closest SimHash within `max_distance` bits, or None.
+        """
+        found: Optional[str] = None
+        best = self.max_distance + 1
+        for i, band in enumerate(self.bands(h)):
+            for other, key in self.buckets[i].get(band, []):
+                distance = (h ^ other).bit_count()
+                if distance < best:
+                    found = key
+                    best = distance
+        return found
+
+
+    def __len__(self) -> int:
+        return self.size
@@ -0,0 +1,253 @@
+import json
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from .result import OnionSite
+
+if TYPE_CHECKING:
+    from ..save import JsonlWriter
+    from .bloom import ScalableBloomFilter
+
+
+# Seconds between checkpoints
+DEFAULT_COMMIT_INTERVAL = 5.0
+# Number of buffered changes which triggers a checkpoint
+DEFAULT_BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS urls (
+    url TEXT PRIMARY KEY,
+    depth INTEGER NOT NULL,
+    visited INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS robots (
+    base_url TEXT PRIMARY KEY,
+    rules TEXT,
+    expires REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    last_request REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    url TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+"""
+
+
+class CrawlState:
+    """
+    Crawl state saved to a SQLite database to resume the crawl.
+
+    It keeps URLs to crawl with their depth, visited URLs,
+    robots.txt and the last request time per host, and results.
+    Changes are buffered and written in one transaction per checkpoint,
+    so the cost of saving the state stays small compared with crawling.
+    Checkpoints are taken between crawled URLs, so that a URL is marked as visited
+    in the same transaction as the URLs and the result found in it.
+    """
+    def __init__(
+        self,
+        path: str,
+        commit_interval: float = DEFAULT_COMMIT_INTERVAL,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        self.path = path
+        self.commit_interval = commit_interval
+        self.batch_size = batch_size
+
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+        self.added_urls: list[tuple[str, int]] = []
+        self.visited_urls: list[str] = []
+        self.robots: dict[str, tuple[Optional[str], float]] = {}
+        self.hosts: dict[str, float] = {}
+        self.results: list[tuple[str, str]] = []
+        # Seen-URL filter whose new keys are written after each commit
+        self.seen: Optional['ScalableBloomFilter'] = None
+        # Streaming output synced before each commit
+        self.stream: Optional['JsonlWriter'] = None
+
+        self.committed_at = time.monotonic()
+
+
+    def attach(self, seen: 'ScalableBloomFilter') -> None:
+        """
+        Write new keys of the seen-URL filter only after the URLs are committed,
+        so that a URL is never in the filter on disk without being in the state.
+        """
+        seen.defer()
+        self.seen = seen
+
+
+    def attach_stream(self, stream: 'JsonlWriter') -> None:
+        """
+        Sync the streaming output before each commit and save its offset with the commit,
+        so that records of URLs which are not committed as visited are cut on resume.
+        """
+        self.stream = stream
+
+
+    def get_stream_offset(self) -> Optional[int]:
+        """
+        Get the offset of the streaming output at the last commit.
+        """
+        offset = self.get_meta('stream_offset')
+        return int(offset) if offset is not None else None
+
+
+    def is_empty(self) -> bool:
+        """
+        Check if no crawl has been saved yet.
+        """
+        return self.conn.execute("SELECT 1 FROM urls LIMIT 1").fetchone() is None
+
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+
+    def set_meta(self, key: str, value: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+        self.conn.commit()
+
+
+    def add_url(self, url: str, depth: int) -> None:
+        """
+        Save a URL added to the frontier.
+        """
+        self.added_urls.append((url, depth))
+
+
+    def visit(self, url: str) -> None:
+        """
+        Save that a URL has been crawled. It's not fetched again after resuming.
+        """
+        self.visited_urls.append(url)
+
+
+    def set_robots(self, base_url: str, rules: Optional[tuple[list[str], list[str]]], expires: float) -> None:
+        """
+        Save robots.txt of a host.
+
+        Parameters
+        ---------------------------------------
+        base_url: str
+            Scheme and netloc of the host.
+        rules: Optional[tuple[list[str], list[str]]]
+            Paths of `Allow` and `Disallow`, or None if the host has no robots.txt.
+        expires: float
+            UNIX time when the rules expire.
+        """
+        self.robots[base_url] = (json.dumps(rules) if rules is not None else None, expires)
+
+
+    def set_host(self, host: str, last_request: float) -> None:
+        """
+        Save the UNIX time of the last request to a host.
+        """
+        self.hosts[host] = last_request
+
+
+    def add_result(self, onion: OnionSite) -> None:
+        """
+        Save an onion site found.
+        """
+        self.results.append((onion.url, onion.to_jsonl()))
+
+
+    def checkpoint(self) -> None:
+        """
+        Commit buffered changes if the interval has passed or the buffer is full.
+        """
+        if len(self.added_urls) + len(self.visited_urls) >= self.batch_size \
+                or time.monotonic() - self.committed_at >= self.commit_interval:
+            self.commit()
+
+
+    def commit(self) -> None:
+        """
+        Commit buffered changes in a transaction.
+        """
+        offset = self.stream.sync() if self.stream is not None else None
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO urls (url, depth) VALUES (?, ?)", self.added_urls)
+            self.conn.executemany(
+                "UPDATE urls SET visited = 1 WHERE url = ?", ((url,) for url in self.visited_urls))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO robots (base_url, rules, expires) VALUES (?, ?, ?)",
+                ((base_url, rules, expires) for base_url, (rules, expires) in self.robots.items()))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO hosts (host, last_request) VALUES (?, ?)",
+                self.hosts.items())
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO results (url, data) VALUES (?, ?)", self.results)
+            if offset is not None:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('stream_offset', ?)", (str(offset),))
+        if self.seen is not None:
+            self.seen.commit()
+
+        self.added_urls = []
+        self.visited_urls = []
+        self.robots = {}
+        self.hosts = {}
+        self.results = []
+        self.committed_at = time.monotonic()
+
+
+    def load_urls(self) -> Iterator[tuple[str, int, bool]]:
+        """
+        Load saved URLs with their depth and whether they have been crawled.
+        """
+        for url, depth, visited in self.conn.execute(
+                "SELECT url, depth, visited FROM urls ORDER BY rowid"):
+            yield url, depth, bool(visited)
+
+
+    def load_robots(self) -> Iterator[tuple[str, Optional[tuple[list[str], list[str]]], float]]:
+        """
+        Load saved robots.txt which has not expired.
+        """
+        for base_url, rules, expires in self.conn.execute(
+                "SELECT base_url, rules, expires FROM robots WHERE expires > ?", (time.time(),)):
+            yield base_url, json.loads(rules) if rules is not None else None, expires
+
+
+    def load_hosts(self) -> Iterator[tuple[str, float]]:
+        """
+        Load the last request time per host.
+        """
+        yield from self.conn.execute("SELECT host, last_request FROM hosts")
+
+
+    def load_results(self) -> Iterator[OnionSite]:
+        """
+        Load saved onion sites.
+        """
+        for (data,) in self.conn.execute("SELECT data FROM results ORDER BY rowid"):
+            yield OnionSite.from_dict(json.loads(data))
+
+
+    def count_results(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+    def close(self) -> None:
+        """
+        Commit buffered changes and close the database.
+        """
+        self.commit()
+        self.conn.close()
@@ -1,11 +1,25 @@
-import httpx
+from functools import lru_cache
 import re
 from tld import get_tld
 from typing import Optional
-from urllib.parse import urlparse, urlsplit
+from urllib.parse import urljoin, urlsplit
 import validators
 from validators import ValidationError
 
+# Re-exported, as hostnames are parsed with the other helpers of URLs.
+from .canonical import parse_hostname  # noqa: F401
+
+
+# Absolute URL of a v2 (16 characters) or v3 (56 characters) onion service,
+# with a path of the characters `validators.url` always accepts.
+# URLs with a query, a fragment, a port, credentials or subdomains don't match
+# and they are checked by the validators.
+REGEX_ONION_URL = re.compile(
+    r"https?://(?:[a-z2-7]{16}|[a-z2-7]{56})\.onion(?:/[a-zA-Z0-9/._~!$&'()*+,;=:@%-]*)?")
+
+# Number of links kept in the cache of `classify_link`.
+LINK_CACHE_SIZE = 65536
+
 
 def is_url(url: str) -> bool:
     """
@@ -50,50 +64,46 @@ def is_internal_link(link: str) -> bool:
     return link.startswith('#')
 
 
-def get_robots_urls(client: httpx.Client, url: str) -> Optional[tuple[set[str], set[str]]]:
+@lru_cache(maxsize=LINK_CACHE_SIZE)
+def is_onion_base_url(base_url: str) -> bool:
     """
-    Get URLs in `robots.txt`.
+    Check if links relative to the base URL (`scheme://netloc`) are HTTP onion URLs.
     """
-    allowed_urls = set()
-    disallowed_urls = set()
-
-    base_url = "{0.scheme}://{0.netloc}".format(urlsplit(url))
-    robots_url = base_url + "/robots.txt"
-
-    try:
-        resp = client.get(robots_url)
-    except:
-        return None
+    return is_http(base_url) and is_onion_url(f"{base_url}/")
 
-    matches_allow = re.findall('Allow: (.*)', resp.text)
-    for match in matches_allow:
-        match = ''.join(match)
-        if '*' not in match:
-            allowed_urls.add(base_url + match)
 
-    matches_disallow = re.findall('Disallow: (.*)', resp.text)
-    for match in matches_disallow:
-        match = ''.join(match)
-        if '*' not in match:
-            disallowed_urls.add(base_url + match)
-
-    return allowed_urls, disallowed_urls
+@lru_cache(maxsize=LINK_CACHE_SIZE)
+def classify_link(page_url: str, link: str) -> Optional[str]:
+    """
+    Get the HTTP onion URL of a link, or None if it's not an onion site.
 
+    This returns the same as checking the link with `is_url`, `urljoin`,
+    `is_http` and `is_onion_url`, but common onion URLs and relative links
+    are classified without the validators.
 
-def parse_hostname(url: str) -> Optional[str]:
+    Parameters
+    ----------------------------------
+    page_url: str
+        URL of the page which has the link.
+    link: str
+        Value of `href`.
     """
-    Get a hostname from URL
-    """
-    return urlparse(url).hostname
+    if link == '' or is_internal_link(link):
+        return None
 
+    if REGEX_ONION_URL.fullmatch(link) is not None:
+        return link
 
-def parse_link_url(url: str, link: str) -> str:
-    """
-    Get a URL from a link
-    """
-    base_url = "{0.scheme}://{0.netloc}".format(urlsplit(url))
-    link = f"/{link}" if link[0] != '/' else link 
-    return f"{base_url}{link}" 
+    # A link without a scheme is never a valid URL, so it's relative to the page.
+    # Only a network-path reference (`//host/path`) changes the host.
+    if (link[0].isalpha() is False or ':' not in link) and link.startswith('//') is False:
+        base_url = "{0.scheme}://{0.netloc}".format(urlsplit(page_url))
+        return urljoin(page_url, link) if is_onion_base_url(base_url) else None
+
+    url = link if is_url(link) else urljoin(page_url, link)
+    if is_http(url) is False or is_onion_url(url) is False:
+        return None
+    return url
 
 
 def adjust_text(text: str) -> str:
@@ -1,19 +1,54 @@
-import httpx
-from rich.console import Console
+import os
+import sys
+import time
 import typer
-from typing_extensions import Annotated
+from typing import TYPE_CHECKING, Annotated, Optional
 
-from .config import get_proxy, check_tor
+from .config import (
+    DEFAULT_TOR_CHECK_TTL, TOR_CHECK_MODES, check_tor, get_proxy, load_tor_check, parse_size,
+    probe_socks, save_tor_check
+)
 from .__version__ import __version__
-from .crawl.crawler import Crawler
-from .crawl.utils import is_url, is_onion_url
-from .save import save_onions
-from .tor import TorProxy
+from .crawl.bloom import DEFAULT_FP_RATE, ScalableBloomFilter
+from .crawl.cache import DEFAULT_CACHE_TTL, ResponseCache
+from .crawl.canonical import DEFAULT_STRIP_PARAMS, Canonicalizer
+from .crawl.health import (
+    DEFAULT_HOST_FAILURES, DEFAULT_MAX_RETRIES, DEFAULT_RETRY_BACKOFF, HealthTracker
+)
+from .crawl.metrics import DEFAULT_STATS_INTERVAL, Metrics
+from .crawl.shard import (
+    DEFAULT_EXCHANGE_INTERVAL, DEFAULT_WORKER_RESTARTS, DEFAULT_WORKER_TIMEOUT, Shard, ShardQueue
+)
+from .crawl.simhash import DEFAULT_MIRROR_DISTANCE
+from .crawl.state import CrawlState
+from .options import (
+    DEFAULT_CONCURRENCY, DEFAULT_DELAY, DEFAULT_MAX_BYTES, DEFAULT_PARSER, DEFAULT_PROXY, DEFAULT_TIMEOUT,
+    DEFAULT_TOR_CHECK, AdaptiveTimeoutOption, ArtifactsOption, CircuitsOption, ConcurrencyOption, DelayOption,
+    DepthOption, FollowRedirectsOption, HostBudgetOption, HostFailuresOption, KeywordsFileOption,
+    KeywordsOption, MaxBytesOption, MaxConnectionsPerHostOption, MaxContentLengthOption, MaxRetriesOption,
+    MirrorDistanceOption, OnlyToppageOption, ParserOption, ParseWorkersOption, ProxyOption, QuietOption,
+    RetryBackoffOption, RobotsTtlOption, StatsOption, StrategyOption, StripParamsOption, TimeoutOption,
+    TorCheckOption, TorCheckTtlOption, VerboseOption
+)
+from .save import DEFAULT_FSYNC_INTERVAL, JsonlWriter, open_stream, save_onions
+from .urls import search_engines
+
+# httpx, rich, stem, tld, validators and parsers take most of the startup time.
+# They are imported by the commands which use them, so that `version` and `--help` start fast.
+if TYPE_CHECKING:
+    from rich.console import Console
+    from .crawl.crawler import Crawler
+    from .crawl.exporter import MetricsExporter
+    from .crawl.monitor import Monitor
+    from .crawl.result import OnionSite
+    from .crawl.seed import Seeder
+    from .tor import TorPool
 
 
 app = typer.Typer(pretty_exceptions_enable=False)
 
-console = Console()
+# Seconds between progress reports of the coordinator
+COORDINATOR_REPORT_INTERVAL = 10.0
 
 
 @app.callback()
@@ -29,131 +64,1057 @@ def callback() -> None:
     rich_help_panel="Crawl Commands")
 def run(
     url: Annotated[
-        str, typer.Option(
+        Optional[str], typer.Option(
             "--url", "-u",
             help="A URL of an onion service to crawl.",
             rich_help_panel="Run Options")
-    ],
-    proxy: Annotated[
+    ] = None,
+    seeds_path: Annotated[
+        Optional[str], typer.Option(
+            "--seeds",
+            help="A file of onion URLs to crawl, one per line, e.g. written by `seed`.",
+            rich_help_panel="Run Options")
+    ] = None,
+    seed_query: Annotated[
+        Optional[str], typer.Option(
+            "--seed-query",
+            help="Search the engines for these keywords, separated by commas, " \
+                "and crawl the onion URLs found.",
+            rich_help_panel="Run Options")
+    ] = None,
+    seed_engines: Annotated[
         str, typer.Option(
-            "--proxy", "-x",
-            help="A SOCKS5 proxy address e.g. 10.0.0.1:1234.",
+            "--seed-engines",
+            help="Search engines for `--seed-query`, separated by commas.",
             rich_help_panel="Run Options")
-    ] = "127.0.0.1:9050",
-    depth: Annotated[
+    ] = ",".join(search_engines),
+    seed_pages: Annotated[
         int, typer.Option(
-            "--depth", "-d",
-            help="Depth to follow links.",
+            "--seed-pages",
+            help="Maximum number of result pages per engine and keyword.",
             rich_help_panel="Run Options")
-    ] = 2,
-    delay: Annotated[
-        int, typer.Option(
-            "--delay",
-            help="Delay between requests.",
+    ] = 5,
+    proxy: ProxyOption = DEFAULT_PROXY,
+    circuits: CircuitsOption = 1,
+    control_port: Annotated[
+        Optional[int], typer.Option(
+            "--control-port",
+            help="Tor control port to send NEWNYM when a circuit degrades e.g. 9051.",
+            rich_help_panel="Tor Options")
+    ] = None,
+    control_password: Annotated[
+        Optional[str], typer.Option(
+            "--control-password",
+            help="Password of the Tor control port.",
+            rich_help_panel="Tor Options")
+    ] = None,
+    depth: DepthOption = 2,
+    strategy: StrategyOption = "bfs",
+    host_budget: HostBudgetOption = 0,
+    delay: DelayOption = DEFAULT_DELAY,
+    concurrency: ConcurrencyOption = DEFAULT_CONCURRENCY,
+    max_connections_per_host: MaxConnectionsPerHostOption = 2,
+    robots_ttl: RobotsTtlOption = 86400,
+    follow_redirects: FollowRedirectsOption = False,
+    timeout: TimeoutOption = DEFAULT_TIMEOUT,
+    adaptive_timeout: AdaptiveTimeoutOption = True,
+    host_failures: HostFailuresOption = DEFAULT_HOST_FAILURES,
+    retry_backoff: RetryBackoffOption = DEFAULT_RETRY_BACKOFF,
+    max_retries: MaxRetriesOption = DEFAULT_MAX_RETRIES,
+    max_content_length: MaxContentLengthOption = 100,
+    max_bytes: MaxBytesOption = DEFAULT_MAX_BYTES,
+    only_toppage: OnlyToppageOption = False,
+    parser: ParserOption = DEFAULT_PARSER,
+    parse_workers: ParseWorkersOption = 0,
+    strip_params: StripParamsOption = ",".join(DEFAULT_STRIP_PARAMS),
+    mirror_distance: MirrorDistanceOption = DEFAULT_MIRROR_DISTANCE,
+    artifacts: ArtifactsOption = "",
+    keywords: KeywordsOption = None,
+    keywords_file: KeywordsFileOption = None,
+    output: Annotated[
+        str, typer.Option(
+            "--output", "-o",
+            help="Output results to specific file. " \
+                "Results are written as soon as they are found to `.jsonl` or `.jsonl.gz`.",
             rich_help_panel="Run Options"
         )
-    ] = 2,
-    follow_redirects: Annotated[
-        bool, typer.Option(
-            "--follow-redirects", "-r",
-            help="Follow redirects.",
+    ] = "onions.json",
+    fsync_interval: Annotated[
+        float, typer.Option(
+            "--fsync-interval",
+            help="Seconds between syncs of a `.jsonl` output to the disk.",
             rich_help_panel="Run Options"
         )
-    ] = False,
-    timeout: Annotated[
-        int, typer.Option(
-            "--timeout", "-t",
-            help="Timeout",
+    ] = DEFAULT_FSYNC_INTERVAL,
+    state_path: Annotated[
+        Optional[str], typer.Option(
+            "--state",
+            help="Save the crawl state to a SQLite database to resume it later.",
             rich_help_panel="Run Options"
         )
-    ] = 60,
-    max_content_length: Annotated[
-        int, typer.Option(
-            "--max-content-length",
-            help="Maximum length of content to extract. `-1` is unlimited.",
+    ] = None,
+    resume: Annotated[
+        Optional[str], typer.Option(
+            "--resume",
+            help="Resume the crawl saved with `--state`.",
             rich_help_panel="Run Options"
         )
-    ] = 100,
-    only_toppage: Annotated[
-        bool, typer.Option(
-            "--top",
-            help="Crawl only the top page of each site.",
+    ] = None,
+    seen_filter: Annotated[
+        Optional[str], typer.Option(
+            "--seen-filter",
+            help="Remember crawled URLs in a Bloom filter saved to this directory instead of memory. " \
+                "Pass it again with `--resume`.",
             rich_help_panel="Run Options"
         )
-    ] = False,
-    output: Annotated[
+    ] = None,
+    seen_fp_rate: Annotated[
+        float, typer.Option(
+            "--seen-fp-rate",
+            help="False positive rate of the Bloom filter, i.e. new URLs skipped as crawled.",
+            rich_help_panel="Run Options"
+        )
+    ] = DEFAULT_FP_RATE,
+    seen_max_memory: Annotated[
         str, typer.Option(
-            "--output", "-o",
-            help="Output results to specific file.",
+            "--seen-max-memory",
+            help="Maximum size of the Bloom filter e.g. 1GB. The false positive rate goes up beyond it. " \
+                "`-1` is unlimited.",
             rich_help_panel="Run Options"
         )
-    ] = "onions.json",
-    quiet: Annotated[
-        bool, typer.Option(
-            "--quiet", "-q",
-            help="The minimum output while running a crawler.",
+    ] = "-1",
+    cache_path: Annotated[
+        Optional[str], typer.Option(
+            "--cache",
+            help="Cache responses in this directory, and revalidate them with ETag and Last-Modified.",
             rich_help_panel="Run Options"
         )
-    ] = False,
-    verbose: Annotated[
+    ] = None,
+    cache_max_size: Annotated[
+        str, typer.Option(
+            "--cache-max-size",
+            help="Maximum size of the cache e.g. 1GB. Least recently used responses are evicted. " \
+                "`-1` is unlimited.",
+            rich_help_panel="Run Options"
+        )
+    ] = "1GB",
+    cache_ttl: Annotated[
+        float, typer.Option(
+            "--cache-ttl",
+            help="Seconds in which a cached response is used without revalidation.",
+            rich_help_panel="Run Options"
+        )
+    ] = DEFAULT_CACHE_TTL,
+    offline: Annotated[
         bool, typer.Option(
-            "--verbose", "-v",
-            help="Verbose mode.",
+            "--offline",
+            help="Crawl only the responses in `--cache` without the network.",
             rich_help_panel="Run Options"
         )
     ] = False,
+    stats: StatsOption = False,
+    stats_file: Annotated[
+        Optional[str], typer.Option(
+            "--stats-file",
+            help="Write the stats to this JSON file periodically while crawling.",
+            rich_help_panel="Run Options"
+        )
+    ] = None,
+    stats_interval: Annotated[
+        float, typer.Option(
+            "--stats-interval",
+            help="Seconds between writes of `--stats-file`.",
+            rich_help_panel="Run Options"
+        )
+    ] = DEFAULT_STATS_INTERVAL,
+    metrics_port: Annotated[
+        Optional[int], typer.Option(
+            "--metrics-port",
+            help="Serve the stats in the Prometheus text format on this port of localhost.",
+            rich_help_panel="Run Options"
+        )
+    ] = None,
+    tor_check: TorCheckOption = DEFAULT_TOR_CHECK,
+    tor_check_ttl: TorCheckTtlOption = DEFAULT_TOR_CHECK_TTL,
+    quiet: QuietOption = False,
+    verbose: VerboseOption = False,
 ) -> None:
+    import asyncio
+    import httpx
+    from rich.console import Console
+    from .crawl.crawler import Crawler
+    from .crawl.exporter import MetricsExporter
+    from .crawl.frontier import STRATEGIES
+    from .crawl.seed import Seeder
+    from .crawl.utils import is_url, is_onion_url
+    from .tor import TorPool, TorProxy
+
     console = Console(quiet=quiet)
 
-    if is_url(url) is False or is_onion_url(url) is False:
-        console.print("Specified URL is not valid or not onion site.", style="red")
+    if tor_check not in TOR_CHECK_MODES:
+        console.print(f"Please set the Tor check to one of {', '.join(TOR_CHECK_MODES)}.", style="red")
+        return
+
+    if strategy not in STRATEGIES:
+        console.print(f"Please set the strategy to one of {', '.join(STRATEGIES)}.", style="red")
+        return
+
+    artifact_options = get_artifact_options(console, artifacts, keywords, keywords_file)
+    if artifact_options is None:
+        return
+    artifact_types, keyword_list = artifact_options
+
+    seeds: list[str] = []
+    if seeds_path is not None:
+        if os.path.exists(seeds_path) is False:
+            console.print(f"{seeds_path} does not exist.", style="red")
+            return
+        with open(seeds_path, encoding='utf-8') as f:
+            lines = [line.strip() for line in f if line.strip() != '' and line.startswith('#') is False]
+        seeds = [line for line in lines if is_url(line) and is_onion_url(line)]
+        console.print(f"Skip {len(lines) - len(seeds)} invalid URLs in {seeds_path}.", style="yellow")\
+            if len(seeds) < len(lines) else None
+
+    _max_bytes = parse_size(max_bytes)
+    if _max_bytes is None:
+        console.print("Please set the maximum size correctly e.g. 2MB.", style="red")
+        return
+
+    _cache_max_size: Optional[int] = None
+    if cache_path is not None:
+        _cache_max_size = parse_size(cache_max_size)
+        if _cache_max_size is None:
+            console.print("Please set the maximum size of the cache correctly e.g. 1GB.", style="red")
+            return
+    elif offline:
+        console.print("Please specify the cache to replay with `--cache`.", style="red")
         return
+    if offline:
+        # Nothing is requested to hosts.
+        delay = 0
+        tor_check = 'skip'
 
-    _proxy = get_proxy(proxy)
-    if _proxy is None:
+    _seen_max_memory: Optional[int] = None
+    if seen_filter is not None:
+        _seen_max_memory = parse_size(seen_max_memory)
+        if _seen_max_memory is None or not 0 < seen_fp_rate < 1:
+            console.print("Please set the Bloom filter correctly e.g. 1GB, 0.001.", style="red")
+            return
+
+    proxies = [get_proxy(p) for p in proxy.split(',')]
+    if any(p is None for p in proxies):
         console.print("Please set proxy correctly.", style="red")
         return
-    socks5_host, socks5_port = _proxy
+    _proxies = [p for p in proxies if p is not None]
 
-    # Setup TorProxy instance
-    # tp = TorProxy(socks5_host, int(socks5_port)) <- currently not working and I don't know the reason.
+    if resume is not None:
+        if len(seeds) > 0 or seed_query is not None:
+            console.print("Seeds cannot be added to a crawl to resume.", style="red")
+            return
+        if os.path.exists(resume) is False:
+            console.print(f"{resume} does not exist.", style="red")
+            return
+    elif url is None and len(seeds) == 0 and seed_query is None:
+        console.print(
+            "Please specify a URL with `--url`, seeds with `--seeds` or `--seed-query`, " \
+            "or a state to resume with `--resume`.", style="red")
+        return
 
-    socks5_proxy = f'socks5://{socks5_host}:{socks5_port}'
-    console.print(f"Proxy: {socks5_proxy}")
-    with httpx.Client(
-        timeout=timeout,
-        proxies=socks5_proxy,
-        follow_redirects=follow_redirects,
-    ) as client:
-        result = check_tor(client)
-        if result is None:
+    # Options are all valid here. The files opened from here are closed on every exit.
+    state: Optional[CrawlState] = None
+    seen: Optional[ScalableBloomFilter] = None
+    cache: Optional[ResponseCache] = None
+    stream: Optional[JsonlWriter] = None
+    try:
+        if resume is not None:
+            state = CrawlState(resume)
+            # The initial URL and depth are restored from the state.
+            url = state.get_meta('url')
+            depth = int(state.get_meta('depth') or depth)
+
+        if url is not None and (is_url(url) is False or is_onion_url(url) is False):
+            console.print("Specified URL is not valid or not onion site.", style="red")
             return
 
-        connected, tor_ip = result
-        console.print(f"Tor Connection: {connected}")
+        if resume is None and state_path is not None:
+            state = CrawlState(state_path)
+            if state.is_empty() is False:
+                console.print(f"{state_path} already has a crawl. Use `--resume` to continue it.", style="red")
+                return
+
+        if seen_filter is not None:
+            assert _seen_max_memory is not None
+            seen = ScalableBloomFilter(seen_filter, fp_rate=seen_fp_rate, max_bytes=_seen_max_memory)
+            if resume is None and seen.is_empty() is False:
+                console.print(f"{seen_filter} already has a crawl. Use `--resume` to continue it.", style="red")
+                return
+
+        if cache_path is not None:
+            assert _cache_max_size is not None
+            cache = ResponseCache(cache_path, max_bytes=_cache_max_size, ttl=cache_ttl, offline=offline)
+
+        # The controller is connected to the control port, not the SOCKS port.
+        tp: Optional[TorProxy] = None
+        if control_port is not None:
+            try:
+                tp = TorProxy(_proxies[0][0], control_port, control_password)
+            except Exception as e:
+                console.print(f"Could not connect to the Tor control port: {e}", style="red")
+                return
+
+        for socks5_host, socks5_port in _proxies:
+            console.print(f"Proxy: socks5://{socks5_host}:{socks5_port}")
+        # Timings are only recorded when they are asked for.
+        metrics: Optional[Metrics] = None
+        exporter: Optional[MetricsExporter] = None
+        if stats or stats_file is not None or metrics_port is not None:
+            metrics = Metrics()
+            exporter = MetricsExporter(metrics, stats_file, interval=stats_interval, port=metrics_port)
+
+        health = HealthTracker(
+            timeout, adaptive_timeout=adaptive_timeout, max_failures=host_failures,
+            retry_backoff=retry_backoff, max_retries=max_retries)
+        pool = TorPool(
+            _proxies, circuits=circuits, controller=tp, cache=cache, health=health,
+            metrics=metrics, timeout=timeout,
+            follow_redirects=follow_redirects,
+            limits=httpx.Limits(max_connections=concurrency),
+        )
+
+        seeder: Optional[Seeder] = None
+        if seed_query is not None:
+            try:
+                seeder = Seeder(
+                    console, pool, queries=seed_query.split(','), engines=seed_engines.split(','),
+                    max_pages=seed_pages, delay=delay, parser=parser,
+                    strip_params=strip_params.split(','), verbose=verbose)
+            except Exception as e:
+                console.print(str(e), style="red")
+                # The pool owns the controller, but it's closed only after crawling.
+                tp.close() if tp is not None else None
+                return
+
+        # The new crawl is saved once nothing can stop it from starting.
+        if resume is None and state is not None:
+            state.set_meta('url', url) if url is not None else None
+            state.set_meta('depth', str(depth))
+
+        # Records after the last commit of the state to resume are cut, since their URLs are crawled again.
+        stream = open_stream(
+            output, fsync_interval=fsync_interval, append=resume is not None,
+            offset=state.get_stream_offset() if resume is not None and state is not None else None)
+
+        crawler = Crawler(
+            console=console, pool=pool, url=url,
+            depth=depth, delay=delay, robots_ttl=robots_ttl, concurrency=concurrency,
+            max_connections_per_host=max_connections_per_host,
+            max_content_length=max_content_length, max_bytes=_max_bytes,
+            only_toppage=only_toppage, parser=parser, parse_workers=parse_workers,
+            strip_params=strip_params.split(','), mirror_distance=mirror_distance,
+            output=output, verbose=verbose, stream=stream, state=state, seen=seen, seeds=seeds,
+            strategy=strategy, host_budget=host_budget, artifacts=artifact_types, keywords=keyword_list)
+
+        try:
+            onion_sites = asyncio.run(start_crawler(
+                console, pool, crawler, tor_check=tor_check, tor_check_ttl=tor_check_ttl, exporter=exporter,
+                seeder=seeder))
+        except KeyboardInterrupt:
+            console.print("\nStop crawling.", style="yellow")
+            onion_sites = crawler.onions
+    finally:
+        # The state syncs the stream when it's committed.
+        if state is not None:
+            state.close()
+        if stream is not None:
+            stream.close()
+        if seen is not None:
+            seen.close()
+        if cache is not None:
+            cache.close()
+
+    if stats and metrics is not None:
+        # The stats are printed even in the quiet mode since they are asked for.
+        metrics.print_summary(Console())
+
+    if onion_sites is None:
+        return
+
+    if crawler.num_onions == 0:
+        console.print("There are no onion sites found.")
+        return
+
+    if stream is not None:
+        console.print(f"Saved {stream.count} onion sites to {output}.")
+        return
+
+    # Save to a file
+    save_onions(console=console, data=onion_sites, output=output)
+
+
+async def start_crawler(
+    console: 'Console',
+    pool: 'TorPool',
+    crawler: 'Crawler',
+    tor_check: str = 'full',
+    tor_check_ttl: float = DEFAULT_TOR_CHECK_TTL,
+    exporter: Optional['MetricsExporter'] = None,
+    seeder: Optional['Seeder'] = None,
+) -> Optional[list['OnionSite']]:
+    """
+    Check the Tor connection and start crawling in the event loop.
+    The check is skipped when replaying the cache offline.
+    With a seeder, the search engines are queried for URLs to start from first.
+    """
+    if exporter is not None:
+        await exporter.start()
+    try:
+        if await check_connection(console, pool, tor_check, tor_check_ttl) is False:
+            return None
+
+        if seeder is not None:
+            crawler.seeds.extend(await seeder.harvest())
+            if crawler.url is None and len(crawler.seeds) == 0:
+                console.print("There are no onion URLs found by the search engines.", style="red")
+                return None
+
+        # Start crawling target URL
+        return await crawler.run()
+    finally:
+        await pool.close()
+        if exporter is not None:
+            await exporter.stop()
+
+
+def get_artifact_options(
+    console: 'Console',
+    artifacts: str,
+    keywords: Optional[str],
+    keywords_file: Optional[str],
+) -> Optional[tuple[list[str], list[str]]]:
+    """
+    Types of artifacts and keywords to extract, from the options.
+    None if they are not valid.
+    """
+    from .crawl.artifacts import ARTIFACT_TYPES
+
+    types = ARTIFACT_TYPES if artifacts == 'all' else [t for t in artifacts.split(',') if t != '']
+    for t in types:
+        if t not in ARTIFACT_TYPES:
+            console.print(f"Please set the artifacts to {', '.join(ARTIFACT_TYPES)} or all.", style="red")
+            return None
+
+    keyword_list = [k for k in keywords.split(',') if k.strip() != ''] if keywords is not None else []
+    if keywords_file is not None:
+        if os.path.exists(keywords_file) is False:
+            console.print(f"{keywords_file} does not exist.", style="red")
+            return None
+        with open(keywords_file, encoding='utf-8') as f:
+            keyword_list += [line.strip() for line in f if line.strip() != '' and line.startswith('#') is False]
+    return types, keyword_list
+
+
+async def check_connection(console: 'Console', pool: 'TorPool', mode: str, ttl: float) -> bool:
+    """
+    Check the Tor connection before crawling.
+
+    Parameters
+    ---------------------------------------
+    console: Console
+        Console to print the result.
+    pool: TorPool
+        Pool of the proxies to check.
+    mode: str
+        `full` requests check.torproject.org through the first proxy, unless it succeeded
+        within the TTL. `probe` does a SOCKS5 handshake with every proxy. `skip` doesn't check.
+    ttl: float
+        Seconds in which a successful full check is reused.
+
+    Returns
+    ---------------------------------------
+    bool
+        Crawling can start.
+    """
+    if mode == 'skip':
+        return True
+
+    if mode == 'probe':
+        for host, port in dict.fromkeys((c.host, c.port) for c in pool.circuits):
+            if await probe_socks(host, port) is False:
+                console.print(f"Could not connect to the SOCKS5 proxy {host}:{port}.", style="red")
+                return False
+        console.print("Tor Connection: SOCKS5 proxies are reachable (not checked through Tor)")
+        return True
+
+    proxy = pool.circuits[0].proxy
+    tor_ip = load_tor_check(proxy, ttl) if ttl > 0 else None
+    if tor_ip is not None:
+        console.print("Tor Connection: True (cached)")
         console.print(f"Tor IP: {tor_ip}")
+        return True
+
+    connected, tor_ip = await check_tor(pool.client)
+    console.print(f"Tor Connection: {connected}")
+    console.print(f"Tor IP: {tor_ip}")
 
-        if connected is False or tor_ip == "":
-            console.print(
-                "You're not connecting Tor or could not retrieve your Tor IP address.",
-                style="red")
+    if connected is False or tor_ip == "":
+        console.print(
+            "You're not connecting Tor or could not retrieve your Tor IP address.",
+            style="red")
+        return False
+    save_tor_check(proxy, tor_ip) if ttl > 0 else None
+    return True
+
+
+@app.command(
+    name="coordinator",
+    help="Start a crawl sharded by host across workers, and merge their results.",
+    rich_help_panel="Crawl Commands",
+    context_settings={"allow_extra_args": True, "ignore_unknown_options": True})
+def coordinator(
+    ctx: typer.Context,
+    queue_path: Annotated[
+        str, typer.Option(
+            "--queue",
+            help="SQLite database shared with the workers.",
+            rich_help_panel="Coordinator Options")
+    ],
+    url: Annotated[
+        str, typer.Option(
+            "--url", "-u",
+            help="A URL of an onion service to crawl.",
+            rich_help_panel="Coordinator Options")
+    ],
+    shards: Annotated[
+        int, typer.Option(
+            "--shards", "-n",
+            help="Number of shards. Each host is crawled by the worker of its shard.",
+            rich_help_panel="Coordinator Options")
+    ] = 4,
+    spawn: Annotated[
+        bool, typer.Option(
+            "--spawn/--no-spawn",
+            help="Start a worker process per shard on this machine. " \
+                "Arguments after `--` are passed to them e.g. `-- --proxy 127.0.0.1:9050 -q`.",
+            rich_help_panel="Coordinator Options")
+    ] = True,
+    depth: DepthOption = 2,
+    strip_params: StripParamsOption = ",".join(DEFAULT_STRIP_PARAMS),
+    output: Annotated[
+        str, typer.Option(
+            "--output", "-o",
+            help="Output the results of all the workers to specific file.",
+            rich_help_panel="Coordinator Options")
+    ] = "onions.json",
+    interval: Annotated[
+        float, typer.Option(
+            "--interval",
+            help="Seconds between checks of whether the crawl is over.",
+            rich_help_panel="Coordinator Options")
+    ] = DEFAULT_EXCHANGE_INTERVAL,
+    worker_timeout: Annotated[
+        float, typer.Option(
+            "--worker-timeout",
+            help="Seconds without a heartbeat after which a worker is dead, " \
+                "and the URLs it has claimed are queued again.",
+            rich_help_panel="Coordinator Options")
+    ] = DEFAULT_WORKER_TIMEOUT,
+    max_restarts: Annotated[
+        int, typer.Option(
+            "--max-restarts",
+            help="Number of times the worker of a shard is restarted when it dies.",
+            rich_help_panel="Coordinator Options")
+    ] = DEFAULT_WORKER_RESTARTS,
+    quiet: QuietOption = False,
+) -> None:
+    import subprocess
+    from rich.console import Console
+    from .crawl.utils import is_url, is_onion_url
+
+    console = Console(quiet=quiet)
+
+    if is_url(url) is False or is_onion_url(url) is False:
+        console.print("Specified URL is not valid or not onion site.", style="red")
+        return
+    if shards < 1:
+        console.print("Please set the number of shards to 1 or more.", style="red")
+        return
+    if any(arg.split('=', 1)[0] == '--strip-params' for arg in ctx.args):
+        console.print("Please set `--strip-params` before `--`. It's passed to the workers.", style="red")
+        return
+
+    # The start URL is queued as the workers queue the URLs they find.
+    url = Canonicalizer(strip_params.split(',')).canonicalize(url)
+    queue = ShardQueue(queue_path)
+    if queue.is_empty() is False:
+        console.print(f"{queue_path} already has a crawl. Remove it to start a new one.", style="red")
+        queue.close()
+        return
+    queue.start(url, depth, shards)
+    console.print(f"Start crawling from {url} in {shards} shards: {queue_path}")
+
+    def start_worker(shard: int) -> subprocess.Popen:
+        return subprocess.Popen([
+            sys.executable, '-m', 'hiddenbot', 'worker',
+            '--queue', queue_path, '--shard', str(shard), '--strip-params', strip_params, *ctx.args])
+
+    processes: list[subprocess.Popen] = []
+    if spawn:
+        processes = [start_worker(i) for i in range(shards)]
+    else:
+        console.print(f"Start the workers with `hiddenbot worker --queue {queue_path} --shard N`.")
+    restarts = [0] * shards
+
+    reported_at = time.monotonic()
+    try:
+        while queue.is_finished() is False:
+            # Workers which have exited are restarted, and their claimed URLs are queued again.
+            failed = False
+            for i, p in enumerate(processes):
+                if p.poll() is None:
+                    continue
+                if restarts[i] >= max_restarts:
+                    console.print(f"The worker of shard {i} has exited {restarts[i] + 1} times.", style="red")
+                    failed = True
+                    break
+                requeued = queue.requeue(i)
+                console.print(
+                    f"The worker of shard {i} has exited. Restart it with {requeued} URLs queued again.",
+                    style="yellow")
+                processes[i] = start_worker(i)
+                restarts[i] += 1
+            if failed:
+                break
+
+            for i in queue.dead_workers(worker_timeout):
+                if spawn:
+                    # It's restarted when it has exited.
+                    console.print(f"The worker of shard {i} is not responding. Kill it.", style="yellow")
+                    processes[i].kill()
+                    continue
+                requeued = queue.requeue(i)
+                console.print(
+                    f"The worker of shard {i} seems to be dead. Its {requeued} URLs are queued again " \
+                    f"for a new worker: `hiddenbot worker --queue {queue_path} --shard {i}`.",
+                    style="yellow")
+
+            if time.monotonic() - reported_at >= COORDINATOR_REPORT_INTERVAL:
+                queued, claimed, found = queue.report()
+                console.print(f"Queued URLs: {queued}, claimed URLs: {claimed}, onion sites found: {found}")
+                reported_at = time.monotonic()
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        console.print("\nStop crawling.", style="yellow")
+    finally:
+        # Workers exit when they see that the crawl is over.
+        queue.finish()
+        for p in processes:
+            p.wait()
+
+    onion_sites = list(queue.load_results())
+    queue.close()
+
+    if len(onion_sites) == 0:
+        console.print("There are no onion sites found.")
+        return
+
+    # Save to a file
+    save_onions(console=console, data=onion_sites, output=output)
+
+
+@app.command(
+    name="worker",
+    help="Crawl the hosts of a shard of a crawl started by `coordinator`.",
+    rich_help_panel="Crawl Commands")
+def worker(
+    queue_path: Annotated[
+        str, typer.Option(
+            "--queue",
+            help="SQLite database shared with the coordinator.",
+            rich_help_panel="Worker Options")
+    ],
+    shard: Annotated[
+        int, typer.Option(
+            "--shard",
+            help="Shard to crawl, from 0.",
+            rich_help_panel="Worker Options")
+    ],
+    proxy: ProxyOption = DEFAULT_PROXY,
+    circuits: CircuitsOption = 1,
+    delay: DelayOption = DEFAULT_DELAY,
+    strategy: StrategyOption = "bfs",
+    host_budget: HostBudgetOption = 0,
+    concurrency: ConcurrencyOption = DEFAULT_CONCURRENCY,
+    max_connections_per_host: MaxConnectionsPerHostOption = 2,
+    robots_ttl: RobotsTtlOption = 86400,
+    follow_redirects: FollowRedirectsOption = False,
+    timeout: TimeoutOption = DEFAULT_TIMEOUT,
+    adaptive_timeout: AdaptiveTimeoutOption = True,
+    host_failures: HostFailuresOption = DEFAULT_HOST_FAILURES,
+    retry_backoff: RetryBackoffOption = DEFAULT_RETRY_BACKOFF,
+    max_retries: MaxRetriesOption = DEFAULT_MAX_RETRIES,
+    max_content_length: MaxContentLengthOption = 100,
+    max_bytes: MaxBytesOption = DEFAULT_MAX_BYTES,
+    only_toppage: OnlyToppageOption = False,
+    parser: ParserOption = DEFAULT_PARSER,
+    parse_workers: ParseWorkersOption = 0,
+    strip_params: StripParamsOption = ",".join(DEFAULT_STRIP_PARAMS),
+    mirror_distance: MirrorDistanceOption = DEFAULT_MIRROR_DISTANCE,
+    artifacts: ArtifactsOption = "",
+    keywords: KeywordsOption = None,
+    keywords_file: KeywordsFileOption = None,
+    stats: StatsOption = False,
+    tor_check: TorCheckOption = DEFAULT_TOR_CHECK,
+    tor_check_ttl: TorCheckTtlOption = DEFAULT_TOR_CHECK_TTL,
+    quiet: QuietOption = False,
+    verbose: VerboseOption = False,
+) -> None:
+    import asyncio
+    import httpx
+    from rich.console import Console
+    from .crawl.crawler import Crawler
+    from .crawl.frontier import STRATEGIES
+    from .tor import TorPool
+
+    console = Console(quiet=quiet)
+
+    if tor_check not in TOR_CHECK_MODES:
+        console.print(f"Please set the Tor check to one of {', '.join(TOR_CHECK_MODES)}.", style="red")
+        return
+
+    if strategy not in STRATEGIES:
+        console.print(f"Please set the strategy to one of {', '.join(STRATEGIES)}.", style="red")
+        return
+
+    artifact_options = get_artifact_options(console, artifacts, keywords, keywords_file)
+    if artifact_options is None:
+        return
+    artifact_types, keyword_list = artifact_options
+
+    if os.path.exists(queue_path) is False:
+        console.print(f"{queue_path} does not exist. Start the crawl with `coordinator` first.", style="red")
+        return
+    queue = ShardQueue(queue_path)
+    url = queue.get_meta('url')
+    num_shards = int(queue.get_meta('shards') or 0)
+    if url is None or not 0 <= shard < num_shards:
+        console.print(f"{queue_path} has no shard {shard}.", style="red")
+        queue.close()
+        return
+
+    _max_bytes = parse_size(max_bytes)
+    if _max_bytes is None:
+        console.print("Please set the maximum size correctly e.g. 2MB.", style="red")
+        queue.close()
+        return
+
+    proxies = [get_proxy(p) for p in proxy.split(',')]
+    if any(p is None for p in proxies):
+        console.print("Please set proxy correctly.", style="red")
+        queue.close()
+        return
+    _proxies = [p for p in proxies if p is not None]
+
+    metrics = Metrics() if stats else None
+    health = HealthTracker(
+        timeout, adaptive_timeout=adaptive_timeout, max_failures=host_failures,
+        retry_backoff=retry_backoff, max_retries=max_retries)
+    pool = TorPool(
+        _proxies, circuits=circuits, health=health, metrics=metrics, timeout=timeout,
+        follow_redirects=follow_redirects,
+        limits=httpx.Limits(max_connections=concurrency),
+    )
+
+    crawl_shard = Shard(queue, shard, num_shards)
+    console.print(f"{crawl_shard.requeued} URLs claimed by the previous worker of this shard are crawled again.")\
+        if crawl_shard.requeued > 0 else None
+    crawler = Crawler(
+        console=console, pool=pool, url=url,
+        depth=int(queue.get_meta('depth') or 0), delay=delay, robots_ttl=robots_ttl,
+        concurrency=concurrency, max_connections_per_host=max_connections_per_host,
+        max_content_length=max_content_length, max_bytes=_max_bytes,
+        only_toppage=only_toppage, parser=parser, parse_workers=parse_workers,
+        strip_params=strip_params.split(','), mirror_distance=mirror_distance,
+        output='', verbose=verbose, shard=crawl_shard, strategy=strategy, host_budget=host_budget,
+        artifacts=artifact_types, keywords=keyword_list)
+
+    try:
+        asyncio.run(start_crawler(console, pool, crawler, tor_check=tor_check, tor_check_ttl=tor_check_ttl))
+    except KeyboardInterrupt:
+        console.print("\nStop crawling.", style="yellow")
+    finally:
+        # Results and URLs found since the last batch
+        crawl_shard.flush()
+        queue.close()
+
+    if stats and metrics is not None:
+        metrics.print_summary(Console())
+
+
+@app.command(
+    name="seed",
+    help="Search the engines for onion URLs to start a crawl from.",
+    rich_help_panel="Crawl Commands")
+def seed(
+    query: Annotated[
+        str, typer.Option(
+            "--query", "-k",
+            help="Keywords to search for, separated by commas.",
+            rich_help_panel="Seed Options")
+    ],
+    engines: Annotated[
+        str, typer.Option(
+            "--engines",
+            help="Search engines, separated by commas.",
+            rich_help_panel="Seed Options")
+    ] = ",".join(search_engines),
+    pages: Annotated[
+        int, typer.Option(
+            "--pages",
+            help="Maximum number of result pages per engine and keyword.",
+            rich_help_panel="Seed Options")
+    ] = 5,
+    delay: Annotated[
+        float, typer.Option(
+            "--delay",
+            help="Delay between requests to the same search engine.",
+            rich_help_panel="Seed Options")
+    ] = 2,
+    proxy: ProxyOption = DEFAULT_PROXY,
+    timeout: TimeoutOption = DEFAULT_TIMEOUT,
+    parser: ParserOption = DEFAULT_PARSER,
+    strip_params: StripParamsOption = ",".join(DEFAULT_STRIP_PARAMS),
+    output: Annotated[
+        str, typer.Option(
+            "--output", "-o",
+            help="Write the onion URLs to this file, one per line. Crawl them with `run --seeds`.",
+            rich_help_panel="Seed Options")
+    ] = "seeds.txt",
+    tor_check: TorCheckOption = DEFAULT_TOR_CHECK,
+    tor_check_ttl: TorCheckTtlOption = DEFAULT_TOR_CHECK_TTL,
+    quiet: QuietOption = False,
+    verbose: VerboseOption = False,
+) -> None:
+    import asyncio
+    from rich.console import Console
+    from .crawl.seed import Seeder
+    from .tor import TorPool
+
+    console = Console(quiet=quiet)
+
+    if tor_check not in TOR_CHECK_MODES:
+        console.print(f"Please set the Tor check to one of {', '.join(TOR_CHECK_MODES)}.", style="red")
+        return
+
+    proxies = [get_proxy(p) for p in proxy.split(',')]
+    if any(p is None for p in proxies):
+        console.print("Please set proxy correctly.", style="red")
+        return
+
+    pool = TorPool([p for p in proxies if p is not None], timeout=timeout)
+    try:
+        seeder = Seeder(
+            console, pool, queries=query.split(','), engines=engines.split(','),
+            max_pages=pages, delay=delay, parser=parser,
+            strip_params=strip_params.split(','), verbose=verbose)
+    except Exception as e:
+        console.print(str(e), style="red")
+        return
+
+    try:
+        urls = asyncio.run(start_seeder(console, pool, seeder, tor_check, tor_check_ttl))
+    except KeyboardInterrupt:
+        console.print("\nStop searching.", style="yellow")
+        urls = seeder.urls
+
+    if urls is None:
+        return
+    with open(output, 'w', encoding='utf-8') as f:
+        f.writelines(f"{url}\n" for url in urls)
+    console.print(f"Saved {len(urls)} onion URLs to {output}.")
+
+
+async def start_seeder(
+    console: 'Console',
+    pool: 'TorPool',
+    seeder: 'Seeder',
+    tor_check: str,
+    tor_check_ttl: float,
+) -> Optional[list[str]]:
+    """
+    Check the Tor connection and query the search engines in the event loop.
+    """
+    try:
+        if await check_connection(console, pool, tor_check, tor_check_ttl) is False:
+            return None
+        return await seeder.harvest()
+    finally:
+        await pool.close()
+
+
+@app.command(
+    name="monitor",
+    help="Check known onion sites repeatedly, and report new, changed, down and restored sites.",
+    rich_help_panel="Crawl Commands")
+def monitor(
+    store_path: Annotated[
+        str, typer.Option(
+            "--store", "-s",
+            help="SQLite database of the monitored sites and their history. It's kept across runs.",
+            rich_help_panel="Monitor Options")
+    ] = "monitor.db",
+    url: Annotated[
+        Optional[str], typer.Option(
+            "--url", "-u",
+            help="A URL of an onion site to add to the monitored sites.",
+            rich_help_panel="Monitor Options")
+    ] = None,
+    seeds_path: Annotated[
+        Optional[str], typer.Option(
+            "--seeds",
+            help="Add the URLs in a file to the monitored sites: one per line, " \
+                "or the output of `run` in JSON or JSON Lines.",
+            rich_help_panel="Monitor Options")
+    ] = None,
+    discover: Annotated[
+        bool, typer.Option(
+            "--discover",
+            help="Also monitor the top pages of onion sites linked from the monitored pages.",
+            rich_help_panel="Monitor Options")
+    ] = False,
+    cycles: Annotated[
+        int, typer.Option(
+            "--cycles",
+            help="Number of cycles to run. `0` runs until Ctrl-C.",
+            rich_help_panel="Monitor Options")
+    ] = 0,
+    interval: Annotated[
+        float, typer.Option(
+            "--interval",
+            help="Minimum seconds between cycles. Each cycle checks only the sites which are due.",
+            rich_help_panel="Monitor Options")
+    ] = 60,
+    min_interval: Annotated[
+        float, typer.Option(
+            "--min-interval",
+            help="Minimum seconds between checks of a site, for sites which change at every check.",
+            rich_help_panel="Monitor Options")
+    ] = 600,
+    max_interval: Annotated[
+        float, typer.Option(
+            "--max-interval",
+            help="Maximum seconds between checks of a site, for sites which never change or are dead.",
+            rich_help_panel="Monitor Options")
+    ] = 7 * 86400,
+    down_after: Annotated[
+        int, typer.Option(
+            "--down-after",
+            help="Consecutive failed checks before a site is reported down.",
+            rich_help_panel="Monitor Options")
+    ] = 2,
+    change_distance: Annotated[
+        int, typer.Option(
+            "--change-distance",
+            help="Maximum Hamming distance between SimHashes of a page which has not changed. " \
+                "`0` reports every change of the text.",
+            rich_help_panel="Monitor Options")
+    ] = 3,
+    output: Annotated[
+        str, typer.Option(
+            "--output", "-o",
+            help="Append the changes to this file, one JSON object per line.",
+            rich_help_panel="Monitor Options")
+    ] = "deltas.jsonl",
+    proxy: ProxyOption = DEFAULT_PROXY,
+    circuits: CircuitsOption = 1,
+    concurrency: ConcurrencyOption = DEFAULT_CONCURRENCY,
+    delay: DelayOption = DEFAULT_DELAY,
+    robots_ttl: RobotsTtlOption = 86400,
+    timeout: TimeoutOption = DEFAULT_TIMEOUT,
+    max_bytes: MaxBytesOption = DEFAULT_MAX_BYTES,
+    parser: ParserOption = DEFAULT_PARSER,
+    tor_check: TorCheckOption = DEFAULT_TOR_CHECK,
+    tor_check_ttl: TorCheckTtlOption = DEFAULT_TOR_CHECK_TTL,
+    quiet: QuietOption = False,
+    verbose: VerboseOption = False,
+) -> None:
+    import asyncio
+    from rich.console import Console
+    from .crawl.monitor import Monitor, MonitorStore, RevisitPolicy, read_urls
+    from .crawl.utils import is_url, is_onion_url
+    from .tor import TorPool
+
+    console = Console(quiet=quiet)
+
+    if tor_check not in TOR_CHECK_MODES:
+        console.print(f"Please set the Tor check to one of {', '.join(TOR_CHECK_MODES)}.", style="red")
+        return
+
+    urls: list[str] = [url] if url is not None else []
+    if seeds_path is not None:
+        if os.path.exists(seeds_path) is False:
+            console.print(f"{seeds_path} does not exist.", style="red")
             return
-        
-        # Start crawling target URL
-        crawler = Crawler(
-            console=console, client=client, url=url,
-            depth=depth, delay=delay,
-            max_content_length=max_content_length,
-            only_toppage=only_toppage,
-            output=output, verbose=verbose)
-        onion_sites = crawler.run()
-
-        if len(onion_sites) == 0:
-            console.print("There are no onion sites found.")
+        urls += read_urls(seeds_path)
+    valid_urls = [u for u in urls if is_url(u) and is_onion_url(u)]
+    console.print(f"Skip {len(urls) - len(valid_urls)} invalid URLs.", style="yellow")\
+        if len(valid_urls) < len(urls) else None
+
+    _max_bytes = parse_size(max_bytes)
+    if _max_bytes is None:
+        console.print("Please set the maximum size correctly e.g. 2MB.", style="red")
+        return
+
+    proxies = [get_proxy(p) for p in proxy.split(',')]
+    if any(p is None for p in proxies):
+        console.print("Please set proxy correctly.", style="red")
+        return
+
+    store = MonitorStore(store_path)
+    added = store.add(valid_urls, time.time())
+    total, _, _ = store.count()
+    if total == 0:
+        console.print(
+            f"{store_path} has no sites. Please add them with `--url` or `--seeds`.", style="red")
+        store.close()
+        return
+    console.print(f"Monitor {total} sites in {store_path} ({added} added).")
+
+    pool = TorPool(
+        [p for p in proxies if p is not None], circuits=circuits, timeout=timeout, follow_redirects=True)
+    policy = RevisitPolicy(
+        min_interval=min_interval, max_interval=max_interval, down_failures=down_after,
+        change_distance=change_distance)
+
+    with open(output, 'a', encoding='utf-8') as f:
+        monitor = Monitor(
+            console, pool, store, policy, concurrency=concurrency, delay=delay, max_bytes=_max_bytes,
+            parser=parser, discover=discover, robots_ttl=robots_ttl, output=f, verbose=verbose)
+        try:
+            asyncio.run(start_monitor(console, pool, monitor, cycles, interval, tor_check, tor_check_ttl))
+        except KeyboardInterrupt:
+            console.print("\nStop monitoring.", style="yellow")
+        finally:
+            store.close()
+
+
+async def start_monitor(
+    console: 'Console',
+    pool: 'TorPool',
+    monitor: 'Monitor',
+    cycles: int,
+    interval: float,
+    tor_check: str,
+    tor_check_ttl: float,
+) -> None:
+    """
+    Check the Tor connection and run the monitor cycles in the event loop.
+    """
+    try:
+        if await check_connection(console, pool, tor_check, tor_check_ttl) is False:
             return
-        
-        # Save to a file
-        save_onions(console=console, data=onion_sites, output=output)
+        await monitor.run(cycles, interval)
+    finally:
+        await pool.close()
 
 
 @app.command(
@@ -0,0 +1,221 @@
+import typer
+from typing import Annotated, Optional
+
+# Options shared by the commands.
+# Typer reads options from the signatures of the commands, so each option is an `Annotated` type
+# which a command gives to its parameter with the default, e.g. `proxy: ProxyOption = DEFAULT_PROXY`.
+# This module imports only typer, so that `version` and `--help` start fast.
+
+# Default SOCKS5 proxy of the commands
+DEFAULT_PROXY = "127.0.0.1:9050"
+# Default seconds between requests to the same host
+DEFAULT_DELAY = 2.0
+# Default number of requests in flight
+DEFAULT_CONCURRENCY = 16
+# Default timeout of a request
+DEFAULT_TIMEOUT = 60
+# Default maximum size of a page
+DEFAULT_MAX_BYTES = "2MB"
+# Default HTML parser
+DEFAULT_PARSER = "auto"
+# Default way to check the Tor connection
+DEFAULT_TOR_CHECK = "full"
+
+# Tor Options
+ProxyOption = Annotated[
+    str, typer.Option(
+        "--proxy", "-x",
+        help="A SOCKS5 proxy address e.g. 10.0.0.1:1234. " \
+            "Comma-separated addresses spread requests across them.",
+        rich_help_panel="Tor Options")
+]
+CircuitsOption = Annotated[
+    int, typer.Option(
+        "--circuits",
+        help="Number of isolated Tor circuits per proxy, using SOCKS credentials.",
+        rich_help_panel="Tor Options")
+]
+TimeoutOption = Annotated[
+    int, typer.Option(
+        "--timeout", "-t",
+        help="Timeout",
+        rich_help_panel="Tor Options")
+]
+TorCheckOption = Annotated[
+    str, typer.Option(
+        "--tor-check",
+        help="Check the Tor connection first: `full` requests check.torproject.org " \
+            "and caches the result, `probe` only does a SOCKS5 handshake with the proxies, " \
+            "`skip` doesn't check.",
+        rich_help_panel="Tor Options")
+]
+TorCheckTtlOption = Annotated[
+    float, typer.Option(
+        "--tor-check-ttl",
+        help="Seconds in which a successful full check of a proxy is reused. `0` always checks.",
+        rich_help_panel="Tor Options")
+]
+
+# Crawl Options
+DepthOption = Annotated[
+    int, typer.Option(
+        "--depth", "-d",
+        help="Depth to follow links.",
+        rich_help_panel="Crawl Options")
+]
+StrategyOption = Annotated[
+    str, typer.Option(
+        "--strategy",
+        help="Order of URLs to crawl: `bfs` in the order they are found, or `discovery` " \
+            "which crawls new hosts and top pages first, and favors hosts linking to new hosts.",
+        rich_help_panel="Crawl Options")
+]
+HostBudgetOption = Annotated[
+    int, typer.Option(
+        "--host-budget",
+        help="Maximum number of pages to crawl per host. `0` is unlimited.",
+        rich_help_panel="Crawl Options")
+]
+DelayOption = Annotated[
+    float, typer.Option(
+        "--delay",
+        help="Delay between requests to the same host.",
+        rich_help_panel="Crawl Options")
+]
+ConcurrencyOption = Annotated[
+    int, typer.Option(
+        "--concurrency", "-c",
+        help="Maximum number of requests in flight.",
+        rich_help_panel="Crawl Options")
+]
+MaxConnectionsPerHostOption = Annotated[
+    int, typer.Option(
+        "--max-connections-per-host",
+        help="Maximum number of requests in flight to the same host.",
+        rich_help_panel="Crawl Options")
+]
+RobotsTtlOption = Annotated[
+    float, typer.Option(
+        "--robots-ttl",
+        help="Seconds to keep robots.txt of a host.",
+        rich_help_panel="Crawl Options")
+]
+FollowRedirectsOption = Annotated[
+    bool, typer.Option(
+        "--follow-redirects", "-r",
+        help="Follow redirects.",
+        rich_help_panel="Crawl Options")
+]
+AdaptiveTimeoutOption = Annotated[
+    bool, typer.Option(
+        "--adaptive-timeout/--no-adaptive-timeout",
+        help="Shorten the timeout of each host from the observed latency, up to `--timeout`.",
+        rich_help_panel="Crawl Options")
+]
+HostFailuresOption = Annotated[
+    int, typer.Option(
+        "--host-failures",
+        help="Consecutive failures after which URLs of a host are parked and retried later. " \
+            "`0` never parks them.",
+        rich_help_panel="Crawl Options")
+]
+RetryBackoffOption = Annotated[
+    float, typer.Option(
+        "--retry-backoff",
+        help="Seconds before URLs of a dead host are retried. It doubles at every retry.",
+        rich_help_panel="Crawl Options")
+]
+MaxRetriesOption = Annotated[
+    int, typer.Option(
+        "--max-retries",
+        help="Number of retries before URLs of a dead host are dropped.",
+        rich_help_panel="Crawl Options")
+]
+
+# Page Options
+MaxBytesOption = Annotated[
+    str, typer.Option(
+        "--max-bytes",
+        help="Maximum size of a page to download e.g. 2MB, 512KB. `-1` is unlimited.",
+        rich_help_panel="Page Options")
+]
+MaxContentLengthOption = Annotated[
+    int, typer.Option(
+        "--max-content-length",
+        help="Maximum length of content to extract. `-1` is unlimited.",
+        rich_help_panel="Page Options")
+]
+OnlyToppageOption = Annotated[
+    bool, typer.Option(
+        "--top",
+        help="Crawl only the top page of each site.",
+        rich_help_panel="Page Options")
+]
+ParserOption = Annotated[
+    str, typer.Option(
+        "--parser",
+        help="HTML parser: `lxml`, `bs4`, or `auto` which uses lxml if it's installed.",
+        rich_help_panel="Page Options")
+]
+ParseWorkersOption = Annotated[
+    int, typer.Option(
+        "--parse-workers",
+        help="Number of processes to parse pages. `0` parses pages in the crawling process.",
+        rich_help_panel="Page Options")
+]
+StripParamsOption = Annotated[
+    str, typer.Option(
+        "--strip-params",
+        help="Query parameters removed from URLs, separated by commas. " \
+            "A name ending with `*` is a prefix. Set empty to keep all parameters. " \
+            "The coordinator of a sharded crawl passes it to the workers it starts, " \
+            "and other workers must use the same.",
+        rich_help_panel="Page Options")
+]
+MirrorDistanceOption = Annotated[
+    int, typer.Option(
+        "--mirror-distance",
+        help="Top pages whose SimHashes differ in this number of bits or less are mirrors, " \
+            "and links of mirrors are not crawled. A worker finds mirrors among the hosts of its shard. " \
+            "`-1` crawls mirrors as other sites.",
+        rich_help_panel="Page Options")
+]
+ArtifactsOption = Annotated[
+    str, typer.Option(
+        "--artifacts",
+        help="Extract artifacts from the whole body of pages, separated by commas: " \
+            "`emails`, `btc`, `xmr`, `pgp`, `onions` (in plain text), or `all`.",
+        rich_help_panel="Page Options")
+]
+KeywordsOption = Annotated[
+    Optional[str], typer.Option(
+        "--keywords",
+        help="Keywords to find in the whole body of pages, separated by commas.",
+        rich_help_panel="Page Options")
+]
+KeywordsFileOption = Annotated[
+    Optional[str], typer.Option(
+        "--keywords-file",
+        help="A file of keywords to find, one per line.",
+        rich_help_panel="Page Options")
+]
+
+# Output Options
+StatsOption = Annotated[
+    bool, typer.Option(
+        "--stats",
+        help="Print percentiles of the request stages and counters at the end.",
+        rich_help_panel="Output Options")
+]
+QuietOption = Annotated[
+    bool, typer.Option(
+        "--quiet", "-q",
+        help="The minimum output.",
+        rich_help_panel="Output Options")
+]
+VerboseOption = Annotated[
+    bool, typer.Option(
+        "--verbose", "-v",
+        help="Verbose mode.",
+        rich_help_panel="Output Options")
+]
@@ -1,11 +1,23 @@
+import gzip
 import json
 import os
-from rich.console import Console
+import time
+from typing import IO, TYPE_CHECKING, Optional
 
 from .crawl.result import OnionSite
 
+if TYPE_CHECKING:
+    from rich.console import Console
 
-def save_onions(console: Console, data: list[OnionSite], output: str) -> None:
+
+# Seconds between fsync of streaming outputs
+DEFAULT_FSYNC_INTERVAL = 5.0
+
+# Buffer size of streaming outputs
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def save_onions(console: 'Console', data: list[OnionSite], output: str) -> None:
     """
     Save crawled data to a file.
     """
@@ -13,13 +25,136 @@ def save_onions(console: Console, data: list[OnionSite], output: str) -> None:
     if ext == '.json':
         console.print(f"Save to {output}.")
         save_json(data=data, output=output)
+    elif is_stream_output(output):
+        console.print(f"Save to {output}.")
+        save_jsonl(data=data, output=output)
 
 
 def save_json(data: list[OnionSite], output: str) -> None:
     """
     Save to a json file.
     """
-    json_objs = [json.loads(d.to_json()) for d in data]
+    json_objs = [d.to_dict() for d in data]
 
     with open(output, 'w') as f:
         json.dump(json_objs, f, indent=4, ensure_ascii=False)
+
+
+def save_jsonl(data: list[OnionSite], output: str) -> None:
+    """
+    Save to a JSON Lines file.
+    """
+    writer = JsonlWriter(output)
+    try:
+        for d in data:
+            writer.write(d)
+    finally:
+        writer.close()
+
+
+def is_stream_output(output: str) -> bool:
+    """
+    Check if onion sites can be written to the output as soon as they are found.
+    """
+    return output.endswith('.jsonl') or output.endswith('.jsonl.gz')
+
+
+def open_stream(
+    output: str,
+    fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+    append: bool = False,
+    offset: Optional[int] = None,
+) -> Optional['JsonlWriter']:
+    """
+    Open a streaming writer if the output is a JSON Lines file.
+    """
+    if is_stream_output(output) is False:
+        return None
+    return JsonlWriter(output, fsync_interval=fsync_interval, append=append, offset=offset)
+
+
+class JsonlWriter:
+    """
+    Write onion sites to a JSON Lines file, optionally gzipped, one by one.
+
+    Records are written through a buffer and synced to the disk at an interval,
+    so a crash loses only the last few seconds and the memory use stays flat.
+    A gzipped file is written in a gzip member per sync, so that it's valid up to any synced offset.
+
+    Parameters
+    ---------------------------------------
+    output: str
+        Path of the file.
+    fsync_interval: float
+        Seconds between syncs.
+    append: bool
+        Append to the file instead of overwriting it.
+    offset: Optional[int]
+        Offset of the file returned by the last committed `sync`.
+        Records after it are removed before appending.
+    """
+    def __init__(
+        self,
+        output: str,
+        fsync_interval: float = DEFAULT_FSYNC_INTERVAL,
+        append: bool = False,
+        offset: Optional[int] = None,
+    ) -> None:
+        self.output = output
+        self.fsync_interval = fsync_interval
+
+        if append and offset is not None and os.path.exists(output) and os.path.getsize(output) > offset:
+            os.truncate(output, offset)
+        self.file: IO[bytes] = open(output, 'ab' if append else 'wb', buffering=STREAM_BUFFER_SIZE)
+        self.compress = output.endswith('.gz')
+        # gzip member being written, started at the first record after a sync
+        self.member: Optional[gzip.GzipFile] = None
+
+        self.count = 0
+        self.synced_at = time.monotonic()
+
+
+    def write(self, onion: OnionSite) -> None:
+        """
+        Write an onion site.
+        """
+        line = (onion.to_jsonl() + '\n').encode('utf-8')
+        if self.compress:
+            if self.member is None:
+                self.member = gzip.GzipFile(fileobj=self.file, mode='wb')
+            self.member.write(line)
+        else:
+            self.file.write(line)
+        self.count += 1
+
+        if time.monotonic() - self.synced_at >= self.fsync_interval:
+            self.sync()
+
+
+    def sync(self) -> int:
+        """
+        Flush the buffer and sync the file to the disk.
+
+        Returns
+        ---------------------------------------
+        int
+            Offset of the end of the synced records.
+        """
+        if self.member is not None:
+            # Closing the member doesn't close the file.
+            self.member.close()
+            self.member = None
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.synced_at = time.monotonic()
+        return self.file.tell()
+
+
+    def close(self) -> None:
+        """
+        Sync and close the file.
+        """
+        if self.file.closed:
+            return
+        self.sync()
+        self.file.close()
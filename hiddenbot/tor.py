@@ -1,15 +1,346 @@
+import asyncio
+import hashlib
+import httpx
+import secrets
 from stem import Signal
 from stem.control import Controller
+import statistics
+import time
+from typing import Any, Optional
+
+from .crawl.cache import ResponseCache
+from .crawl.fetch import FetchedResponse, fetch
+from .crawl.health import HealthTracker
+from .crawl.metrics import Metrics
+from .crawl.utils import parse_hostname
+
+
+# Minimum requests before a circuit can be judged
+CIRCUIT_MIN_REQUESTS = 10
+# Error rate which marks a circuit degraded
+CIRCUIT_MAX_ERROR_RATE = 0.8
+# A circuit whose latency is this times the median of the pool is degraded
+CIRCUIT_MAX_LATENCY_RATIO = 3.0
+# Weight of a new sample in the moving averages
+CIRCUIT_EWMA_ALPHA = 0.2
+# Tor rate-limits NEWNYM to one every 10 seconds.
+NEWNYM_INTERVAL = 10.0
+# SOCKS replies about the destination rather than the circuit, e.g. when an onion service is down
+DESTINATION_ERRORS = ("Host unreachable", "Connection refused", "TTL expired", "Network unreachable")
+
+
+def is_circuit_error(e: Exception) -> bool:
+    """
+    Check if a request failed because of the proxy or the circuit, not because of its host.
+    Timeouts and errors after the connection is made are of the host.
+    """
+    if isinstance(e, httpx.ProxyError):
+        return not any(reason in str(e) for reason in DESTINATION_ERRORS)
+    # The proxy itself could not be connected to.
+    return isinstance(e, httpx.ConnectError)
 
 
 class TorProxy:
-    def __init__(self, addr: str, port: int) -> None:
-        controller = Controller.from_port(address=addr, port=port)
-        controller.authenticate()
+    """
+    Tor controller to change circuits.
+
+    Parameters
+    ---------------------------------------
+    addr: str
+        Address of the control port.
+    port: int
+        Control port, usually 9051. Not the SOCKS port.
+    password: Optional[str]
+        Password of the control port if `HashedControlPassword` is set.
+    """
+    def __init__(self, addr: str, port: int, password: Optional[str] = None) -> None:
+        self.controller = Controller.from_port(address=addr, port=port)
+        self.controller.authenticate(password=password)
+        self.changed_at = 0.0
 
 
     def change_ip(self) -> None:
         """
         Cnange Tor IP address.
         """
-        self.controller.signal(Signal.NEWNYM)
\ No newline at end of file
+        self.controller.signal(Signal.NEWNYM)
+        self.changed_at = time.monotonic()
+
+
+    def close(self) -> None:
+        self.controller.close()
+
+
+class Circuit:
+    """
+    A SOCKS endpoint with its own credentials and httpx client.
+
+    Tor isolates streams by SOCKS credentials (`IsolateSOCKSAuth`),
+    so each set of credentials uses its own circuits.
+    """
+    def __init__(self, host: str, port: str, isolation: Optional[str], **client_options: Any) -> None:
+        self.host = host
+        self.port = port
+        self.isolation = isolation
+        self.client_options = client_options
+
+        self.client = self.create_client()
+        # Number of requests in flight per client
+        self.active: dict[httpx.AsyncClient, int] = {}
+        # Clients replaced by `rotate`. They are closed when their requests are over.
+        self.retired_clients: list[httpx.AsyncClient] = []
+
+        self.requests = 0
+        self.errors = 0
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+
+    @property
+    def proxy(self) -> str:
+        return f"socks5://{self.host}:{self.port}"
+
+
+    def create_client(self) -> httpx.AsyncClient:
+        proxy = self.proxy
+        if self.isolation is not None:
+            # A new password gives new circuits for the same username.
+            proxy = f"socks5://{self.isolation}:{secrets.token_hex(8)}@{self.host}:{self.port}"
+        return httpx.AsyncClient(proxies=proxy, **self.client_options)
+
+
+    def acquire(self) -> httpx.AsyncClient:
+        """
+        Take the client for a request. It must be given back by `release`.
+        """
+        self.active[self.client] = self.active.get(self.client, 0) + 1
+        return self.client
+
+
+    async def release(self, client: httpx.AsyncClient) -> None:
+        """
+        Give back a client after a request, and close it if it's retired and idle.
+        """
+        count = self.active[client] - 1
+        if count > 0:
+            self.active[client] = count
+            return
+        del self.active[client]
+        if client in self.retired_clients:
+            self.retired_clients.remove(client)
+            await client.aclose()
+
+
+    def record(self, latency: float, ok: bool) -> None:
+        """
+        Record the result of a request. Failures must be of the circuit, not of the host.
+        """
+        self.requests += 1
+        self.samples += 1
+        if ok:
+            self.latency = latency if self.latency is None \
+                else (1 - CIRCUIT_EWMA_ALPHA) * self.latency + CIRCUIT_EWMA_ALPHA * latency
+        else:
+            self.errors += 1
+        self.error_rate = (1 - CIRCUIT_EWMA_ALPHA) * self.error_rate + CIRCUIT_EWMA_ALPHA * (0 if ok else 1)
+
+
+    def record_host_error(self) -> None:
+        """
+        Count a request which failed because of its host, without judging the circuit by it.
+        """
+        self.requests += 1
+
+
+    async def rotate(self) -> None:
+        """
+        Use new circuits with new credentials, and reset the statistics.
+        The old client is closed when its requests in flight are over.
+        """
+        if self.isolation is not None:
+            old = self.client
+            self.client = self.create_client()
+            if old in self.active:
+                self.retired_clients.append(old)
+            else:
+                await old.aclose()
+        self.latency = None
+        self.error_rate = 0.0
+        self.samples = 0
+
+
+    async def close(self) -> None:
+        for client in [self.client] + self.retired_clients:
+            await client.aclose()
+
+
+class TorPool:
+    """
+    Pool of Tor circuits across SOCKS ports and isolation credentials.
+
+    Each host is mapped to a circuit by rendezvous hashing, so its requests reuse
+    the same onion circuit. Latency and error rate are tracked per circuit.
+    When a circuit degrades, its hosts move to the other circuits,
+    and it gets new circuits with new credentials or NEWNYM.
+
+    Parameters
+    ---------------------------------------
+    proxies: list[tuple[str, str]]
+        Hosts and ports of SOCKS5 proxies.
+    circuits: int
+        Number of isolated circuits per proxy. More than 1 uses SOCKS credentials.
+    controller: Optional[TorProxy]
+        Tor controller to send NEWNYM.
+    cache: Optional[ResponseCache]
+        Response cache in front of the circuits.
+    health: Optional[HealthTracker]
+        Health of hosts, which gives the timeout of each request.
+    metrics: Optional[Metrics]
+        Metrics to record the timings of requests into.
+    """
+    def __init__(
+        self,
+        proxies: list[tuple[str, str]],
+        circuits: int = 1,
+        controller: Optional[TorProxy] = None,
+        cache: Optional[ResponseCache] = None,
+        health: Optional[HealthTracker] = None,
+        metrics: Optional[Metrics] = None,
+        **client_options: Any,
+    ) -> None:
+        self.controller = controller
+        self.cache = cache
+        self.health = health
+        self.metrics = metrics
+        self.circuits: list[Circuit] = []
+        for host, port in proxies:
+            for i in range(circuits):
+                isolation = f"hiddenbot-{i}" if circuits > 1 else None
+                self.circuits.append(Circuit(host, port, isolation, **client_options))
+
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """
+        A client of the first circuit, for requests unrelated to any host.
+        """
+        return self.circuits[0].client
+
+
+    def pick(self, url: str) -> Circuit:
+        """
+        Pick the circuit for the host of the URL.
+        """
+        host = parse_hostname(url) or ""
+        healthy = [c for c in self.circuits if self.is_degraded(c) is False] or self.circuits
+        return max(healthy, key=lambda c: hashlib.blake2b(
+            f"{host}|{c.proxy}|{c.isolation}".encode(), digest_size=8).digest())
+
+
+    def is_degraded(self, circuit: Circuit) -> bool:
+        """
+        Check if the circuit is much slower than the others or fails too often.
+        """
+        if circuit.samples < CIRCUIT_MIN_REQUESTS:
+            return False
+        if circuit.error_rate > CIRCUIT_MAX_ERROR_RATE:
+            return True
+
+        latencies = [c.latency for c in self.circuits if c.latency is not None]
+        if circuit.latency is None or len(latencies) < 2:
+            return False
+        return circuit.latency > CIRCUIT_MAX_LATENCY_RATIO * statistics.median(latencies)
+
+
+    async def fetch(self, url: str, **kwargs: Any) -> FetchedResponse:
+        """
+        Fetch the URL through the cache if it's set, or the circuit of its host.
+        Arguments are the same as `fetch` in `crawl.fetch`.
+        """
+        if self.cache is not None:
+            return await self.cache.fetch(url, self.fetch_network, **kwargs)
+        return await self.fetch_network(url, **kwargs)
+
+
+    async def fetch_network(self, url: str, **kwargs: Any) -> FetchedResponse:
+        """
+        Fetch the URL through the circuit of its host.
+        """
+        circuit = self.pick(url)
+        host = parse_hostname(url) or ""
+        if self.health is not None:
+            kwargs.setdefault('timeout', self.health.timeout_for(host))
+        if self.metrics is not None:
+            kwargs.setdefault('trace', True)
+
+        started = time.monotonic()
+        client = circuit.acquire()
+        try:
+            resp = await fetch(client, url, **kwargs)
+        except httpx.TransportError as e:
+            self.metrics.inc(f"errors.{type(e).__name__}") if self.metrics is not None else None
+            # A dead host must not make its circuit look broken, nor a broken circuit its hosts.
+            if is_circuit_error(e) is False:
+                self.health.record_failure(host) if self.health is not None else None
+                circuit.record_host_error()
+                raise
+            circuit.record(time.monotonic() - started, False)
+            await self.check(circuit)
+            raise
+        except Exception as e:
+            self.metrics.inc(f"errors.{type(e).__name__}") if self.metrics is not None else None
+            raise
+        finally:
+            await circuit.release(client)
+        circuit.record(time.monotonic() - started, True)
+        self.health.record_success(host, resp.ttfb) if self.health is not None else None
+        if self.metrics is not None:
+            self.record_metrics(resp)
+        await self.check(circuit)
+        return resp
+
+
+    def record_metrics(self, resp: FetchedResponse) -> None:
+        """
+        Record the timings and the size of a response.
+        """
+        assert self.metrics is not None
+        self.metrics.inc('requests')
+        self.metrics.observe('ttfb', resp.ttfb)
+        self.metrics.observe_trace(resp.timings)
+        if resp.content is not None:
+            self.metrics.inc('bytes', len(resp.content))
+
+
+    async def check(self, circuit: Circuit) -> None:
+        """
+        Renew the circuit if it has degraded.
+        """
+        if self.is_degraded(circuit) is False:
+            return
+
+        await circuit.rotate()
+        if self.controller is not None \
+                and time.monotonic() - self.controller.changed_at >= NEWNYM_INTERVAL:
+            # stem is blocking, so it runs in a thread.
+            await asyncio.to_thread(self.controller.change_ip)
+
+
+    def report(self) -> list[tuple[str, Optional[str], int, int, Optional[float]]]:
+        """
+        Report statistics of circuits.
+
+        Returns
+        ---------------------------------------
+        list[tuple[str, Optional[str], int, int, Optional[float]]]
+            Proxy, isolation username, requests, errors and average latency.
+        """
+        return [(c.proxy, c.isolation, c.requests, c.errors, c.latency) for c in self.circuits]
+
+
+    async def close(self) -> None:
+        for circuit in self.circuits:
+            await circuit.close()
+        if self.controller is not None:
+            self.controller.close()
@@ -0,0 +1,75 @@
+import pytest
+
+from hiddenbot.crawl.artifacts import (
+    ARTIFACT_TYPES, PGP_BEGIN, PGP_END, ArtifactExtractor, is_base58check, is_bech32, trie_pattern
+)
+
+
+P2PKH = "1A1zP1eP5QGefi2DMPTfTL5SLmv7DivfNa"
+P2SH = "3J98t1WpEZ73CNmQviecrnyiWrnqRhWNLy"
+# Bech32 (SegWit v0) and Bech32m (Taproot) addresses from BIP 173 and BIP 350
+P2WPKH = "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4"
+P2TR = "bc1p0xlxvlhemja6c4dqv22uapctqupfhlxm9h8z3k2e72q4k9hcz7vqzk5jj0"
+ONION = "a" * 52 + "bcdd.onion"
+
+
+def typo(address: str, i: int = 10) -> str:
+    """
+    Change a character of the address, keeping it in the alphabet.
+    """
+    c = address[i]
+    return address[:i] + ('2' if c != '2' else '3') + address[i + 1:]
+
+
+@pytest.mark.parametrize("address", [P2PKH, P2SH])
+def test_base58check(address: str) -> None:
+    assert is_base58check(address)
+    assert is_base58check(typo(address)) is False
+    # A valid checksum of a payload of the wrong length
+    assert is_base58check(address[:-1]) is False
+
+
+@pytest.mark.parametrize("address", [P2WPKH, P2TR])
+def test_bech32(address: str) -> None:
+    assert is_bech32(address)
+    assert is_bech32(typo(address)) is False
+    assert is_bech32(address[:-1]) is False
+
+
+def test_btc_addresses_are_extracted_by_checksum() -> None:
+    extractor = ArtifactExtractor(('btc',))
+    text = f"Pay to {P2PKH}, {P2SH}. Or {P2WPKH}! Not {typo(P2PKH)} nor {typo(P2WPKH)}."
+    assert extractor.extract(text) == {'btc': [P2PKH, P2SH, P2WPKH]}
+
+
+def test_uppercase_bech32_is_extracted_in_lowercase() -> None:
+    extractor = ArtifactExtractor(('btc',))
+    assert extractor.extract(f"QR: {P2TR.upper()}") == {'btc': [P2TR]}
+    # The same address in both cases is found once.
+    assert extractor.extract(f"{P2WPKH} {P2WPKH.upper()}") == {'btc': [P2WPKH]}
+    # Mixed case is invalid.
+    mixed = P2WPKH[:20] + P2WPKH[20:].upper()
+    assert extractor.extract(mixed) == {}
+    assert extractor.extract("BC1" + P2WPKH[3:]) == {}
+
+
+def test_all_types_in_one_pass() -> None:
+    extractor = ArtifactExtractor(tuple(ARTIFACT_TYPES), ('escrow', 'bitcoin mixer'))
+    xmr = "4" + "A" * 94
+    pgp = f"{PGP_BEGIN}<br>\nmQINBF&amp;x<br>\n{PGP_END}"
+    text = (
+        f"<p>Mail admin@Market.ONION or logo@2x.png. Wallet {P2PKH}, {xmr}.</p>"
+        f"<pre>{pgp}</pre> Mirror: {ONION[:-6].upper()}.onion. Escrow and Bitcoin\n Mixer.")
+    assert extractor.extract(text) == {
+        'emails': ["admin@market.onion"],
+        'btc': [P2PKH],
+        'xmr': [xmr],
+        'pgp': [f"{PGP_BEGIN}\nmQINBF&x\n{PGP_END}"],
+        'onions': [ONION],
+        'keywords': ["escrow", "bitcoin mixer"],
+    }
+
+
+def test_trie_pattern() -> None:
+    assert trie_pattern(["bit", "bitcoin"]) == "bit(?:coin)?"
+    assert trie_pattern(["ab", "ac"]) == "a(?:b|c)"
@@ -0,0 +1,74 @@
+from pathlib import Path
+
+from hiddenbot.crawl.bloom import MASK64, ScalableBloomFilter
+from hiddenbot.crawl.state import CrawlState
+
+
+def keys(start: int, stop: int) -> list[int]:
+    # Spread the keys over 64 bits like the hashes of URLs.
+    return [i * 0x9e3779b97f4a7c15 & MASK64 for i in range(start, stop)]
+
+
+def test_filter_grows_past_its_capacity() -> None:
+    seen = ScalableBloomFilter(fp_rate=0.01, initial_capacity=100)
+    added = sum(seen.add(key) for key in keys(0, 1000))
+    # A few new keys are false positives, which are not added.
+    assert added > 1000 * 0.98 and len(seen) == added
+    assert len(seen.filters) > 1
+
+    assert all(key in seen for key in keys(0, 1000))
+    assert all(seen.add(key) is False for key in keys(0, 1000))
+    # Filters this small miss the rate by a little, but not by the number of filters.
+    false_positives = sum(key in seen for key in keys(1000, 11000))
+    assert false_positives < 10000 * 0.02
+    seen.close()
+
+
+def test_filter_stops_growing_at_the_memory_budget() -> None:
+    seen = ScalableBloomFilter(fp_rate=0.01, max_bytes=1000, initial_capacity=100)
+    for key in keys(0, 5000):
+        seen.add(key)
+    assert seen.full and seen.nbytes <= 1000
+    assert all(key in seen for key in keys(0, 5000))
+    seen.close()
+
+
+def test_filter_is_reopened_from_its_files(tmp_path: Path) -> None:
+    seen = ScalableBloomFilter(str(tmp_path), fp_rate=0.01, initial_capacity=100)
+    added = sum(seen.add(key) for key in keys(0, 500))
+    num_filters = len(seen.filters)
+    seen.close()
+
+    seen = ScalableBloomFilter(str(tmp_path), fp_rate=0.01)
+    assert len(seen.filters) == num_filters and len(seen) == added
+    assert all(key in seen for key in keys(0, 500))
+
+    # Next filters are sized from the first one on the disk.
+    assert seen.initial_capacity == 100
+    for key in keys(500, 1000):
+        seen.add(key)
+    assert seen.filters[-1].capacity == 100 * 2 ** (len(seen.filters) - 1)
+    seen.close()
+
+
+def test_keys_are_written_only_when_the_state_is_committed(tmp_path: Path) -> None:
+    state = CrawlState(str(tmp_path / "state.db"))
+    seen = ScalableBloomFilter(str(tmp_path / "seen"), fp_rate=0.01, initial_capacity=100)
+    state.attach(seen)
+    committed, uncommitted = keys(0, 10), keys(10, 20)
+    for key in committed:
+        seen.add(key)
+    state.commit()
+    for key in uncommitted:
+        assert seen.add(key)
+    # New keys are seen in the process, but not written to the filters.
+    assert all(key in seen for key in uncommitted)
+    assert all(key not in f for f in seen.filters for key in uncommitted)
+
+    # A crash before the next commit loses them with the state, so their URLs are crawled again.
+    seen.close()
+    state.conn.close()
+    seen = ScalableBloomFilter(str(tmp_path / "seen"), fp_rate=0.01)
+    assert all(key in seen for key in committed)
+    assert all(key not in seen for key in uncommitted)
+    seen.close()
@@ -0,0 +1,133 @@
+import asyncio
+from pathlib import Path
+from typing import Any, Optional
+
+import pytest
+
+from hiddenbot.crawl.cache import ResponseCache
+from hiddenbot.crawl.fetch import FetchedResponse
+
+
+URL = "http://" + "a" * 56 + ".onion/"
+BODY = b"<html><body>" + b"hello " * 100 + b"</body></html>"
+
+
+class FakeNetwork:
+    """
+    Network which serves one page with an ETag and a Last-Modified date,
+    and answers `304` to a matching `If-None-Match` or `If-Modified-Since`.
+    """
+    def __init__(self, etag: Optional[str] = '"v1"', last_modified: Optional[str] = None) -> None:
+        self.etag = etag
+        self.last_modified = last_modified
+        self.requests: list[Optional[dict[str, str]]] = []
+
+
+    async def fetch(
+        self,
+        url: str,
+        max_bytes: int = 0,
+        headers: Optional[dict[str, str]] = None,
+        **kwargs: Any,
+    ) -> FetchedResponse:
+        self.requests.append(headers)
+        if headers is not None and (
+                self.etag is not None and headers.get('If-None-Match') == self.etag
+                or self.last_modified is not None and headers.get('If-Modified-Since') == self.last_modified):
+            return FetchedResponse(url, 304, '', None, None, False, self.etag, self.last_modified)
+        truncated = 0 < max_bytes < len(BODY)
+        content = BODY[:max_bytes] if truncated else BODY
+        return FetchedResponse(
+            url, 200, 'text/html', 'utf-8', content, truncated, self.etag, self.last_modified)
+
+
+def test_truncated_body_is_fetched_again_for_a_larger_limit(tmp_path: Path) -> None:
+    async def main() -> None:
+        network = FakeNetwork()
+        cache = ResponseCache(str(tmp_path), ttl=3600)
+        resp = await cache.fetch(URL, network.fetch, max_bytes=100)
+        assert resp.truncated and resp.content == BODY[:100]
+
+        # The same limit is served from the cache.
+        resp = await cache.fetch(URL, network.fetch, max_bytes=100)
+        assert len(network.requests) == 1 and resp.content == BODY[:100]
+
+        # A larger limit is not revalidated, which would keep the truncated body.
+        resp = await cache.fetch(URL, network.fetch, max_bytes=0)
+        assert network.requests[-1] is None
+        assert resp.truncated is False and resp.content == BODY
+        resp = await cache.fetch(URL, network.fetch, max_bytes=0)
+        assert len(network.requests) == 2 and resp.content == BODY
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_stale_response_is_revalidated_with_its_etag(tmp_path: Path) -> None:
+    async def main() -> None:
+        network = FakeNetwork()
+        cache = ResponseCache(str(tmp_path), ttl=0)
+        await cache.fetch(URL, network.fetch)
+        assert network.requests == [None] and cache.misses == 1
+
+        resp = await cache.fetch(URL, network.fetch)
+        assert network.requests[-1] == {'If-None-Match': '"v1"'}
+        assert cache.revalidated == 1 and cache.misses == 1
+        assert resp.status_code == 200 and resp.content == BODY
+
+        # A changed page replaces the cached one.
+        network.etag = '"v2"'
+        await cache.fetch(URL, network.fetch)
+        assert cache.revalidated == 1 and cache.misses == 2
+        resp = await cache.fetch(URL, network.fetch)
+        assert network.requests[-1] == {'If-None-Match': '"v2"'} and cache.revalidated == 2
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_stale_response_is_revalidated_with_its_last_modified_date(tmp_path: Path) -> None:
+    async def main() -> None:
+        last_modified = "Wed, 21 Oct 2015 07:28:00 GMT"
+        network = FakeNetwork(etag=None, last_modified=last_modified)
+        cache = ResponseCache(str(tmp_path), ttl=0)
+        await cache.fetch(URL, network.fetch)
+        resp = await cache.fetch(URL, network.fetch)
+        assert network.requests[-1] == {'If-Modified-Since': last_modified}
+        assert cache.revalidated == 1 and resp.content == BODY
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_fresh_response_is_used_without_the_network(tmp_path: Path) -> None:
+    async def main() -> None:
+        network = FakeNetwork()
+        cache = ResponseCache(str(tmp_path), ttl=3600)
+        await cache.fetch(URL, network.fetch)
+        resp = await cache.fetch(URL, network.fetch)
+        assert len(network.requests) == 1 and cache.hits == 1 and resp.content == BODY
+        cache.close()
+
+    asyncio.run(main())
+
+
+def test_cache_is_reopened_and_replayed_offline(tmp_path: Path) -> None:
+    async def main() -> None:
+        network = FakeNetwork()
+        cache = ResponseCache(str(tmp_path))
+        await cache.fetch(URL, network.fetch)
+        cache.close()
+
+        cache = ResponseCache(str(tmp_path), offline=True)
+        resp = await cache.fetch(URL, network.fetch)
+        assert len(network.requests) == 1 and cache.hits == 1
+        assert resp.url == URL and resp.content_type == 'text/html' and resp.encoding == 'utf-8'
+        assert resp.content == BODY and resp.etag == '"v1"'
+
+        with pytest.raises(Exception, match="not in the cache"):
+            await cache.fetch(URL + "missing", network.fetch)
+        assert len(network.requests) == 1 and cache.misses == 1
+        cache.close()
+
+    asyncio.run(main())
@@ -0,0 +1,70 @@
+from urllib.parse import urlsplit
+
+import pytest
+
+from hiddenbot.crawl.canonical import Canonicalizer, fingerprint, parse_hostname, remove_dot_segments
+
+
+HOST = "a" * 56 + ".onion"
+
+
+@pytest.mark.parametrize("url, expected", [
+    # Scheme, host and default port
+    (f"HTTP://{HOST.upper()}", f"http://{HOST}/"),
+    (f"http://{HOST}:80/a", f"http://{HOST}/a"),
+    (f"http://{HOST}:8080/a", f"http://{HOST}:8080/a"),
+    (f"https://{HOST}:443/a", f"https://{HOST}/a"),
+    (f"http://{HOST}./a", f"http://{HOST}/a"),
+    # Dot segments and percent-encoding
+    (f"http://{HOST}/a/./b/../c", f"http://{HOST}/a/c"),
+    (f"http://{HOST}/a/..", f"http://{HOST}/"),
+    (f"http://{HOST}/%7euser/%2f", f"http://{HOST}/~user/%2F"),
+    # Index pages
+    (f"http://{HOST}/dir/index.html", f"http://{HOST}/dir/"),
+    (f"http://{HOST}/dir/INDEX.HTM", f"http://{HOST}/dir/"),
+    (f"http://{HOST}/index.php", f"http://{HOST}/index.php"),
+    (f"http://{HOST}/index.php?page=2", f"http://{HOST}/index.php?page=2"),
+    # Query and fragment
+    (f"http://{HOST}/?b=2&a=1&&utm_source=x#top", f"http://{HOST}/?a=1&b=2"),
+    (f"http://{HOST}/?PHPSESSID=abc&id=1", f"http://{HOST}/?id=1"),
+    (f"http://{HOST}/page;jsessionid=abc?id=1", f"http://{HOST}/page?id=1"),
+    (f"http://{HOST}/?utm_source=x", f"http://{HOST}/"),
+    # `sid` is often the ID of the content.
+    (f"http://{HOST}/viewtopic?sid=5", f"http://{HOST}/viewtopic?sid=5"),
+])
+def test_canonicalize(url: str, expected: str) -> None:
+    assert Canonicalizer().canonicalize(url) == expected
+
+
+def test_strip_params_are_opt_in() -> None:
+    canonicalizer = Canonicalizer(['sid', 'ref*'])
+    assert canonicalizer.canonicalize(f"http://{HOST}/?SID=5&referrer=x&id=1") == f"http://{HOST}/?id=1"
+    # Parameters which are not given are kept.
+    assert canonicalizer.canonicalize(f"http://{HOST}/?utm_source=x") == f"http://{HOST}/?utm_source=x"
+    assert Canonicalizer([]).canonicalize(f"http://{HOST}/?sid=1&utm_source=x") \
+        == f"http://{HOST}/?sid=1&utm_source=x"
+
+
+@pytest.mark.parametrize("path, expected", [
+    ("/a/b/c/./../../g", "/a/g"),
+    ("/../a", "/a"),
+    ("/a/.", "/a/"),
+    ("/a/b", "/a/b"),
+])
+def test_remove_dot_segments(path: str, expected: str) -> None:
+    assert remove_dot_segments(path) == expected
+
+
+def test_spellings_have_the_same_fingerprint() -> None:
+    canonicalizer = Canonicalizer()
+    urls = [f"http://{HOST}", f"HTTP://{HOST}:80/index.html", f"http://{HOST}/./#top"]
+    assert len({fingerprint(canonicalizer.canonicalize(url)) for url in urls}) == 1
+
+
+@pytest.mark.parametrize("url", [
+    f"http://{HOST}", f"http://{HOST.upper()}/a?b#c", f"http://{HOST}?q=1", f"http://{HOST}#top",
+    f"http://user:pass@{HOST}:8080/", "http://u@v@Host/", "http://[::1]:80/", "http:///path", "http://:80/",
+    "//host/path", "/path", "mailto:admin@host", "",
+])
+def test_parse_hostname(url: str) -> None:
+    assert parse_hostname(url) == urlsplit(url).hostname
@@ -0,0 +1,104 @@
+import pytest
+
+from hiddenbot.crawl.frontier import Frontier
+from hiddenbot.crawl.health import HealthTracker
+
+
+def url(host: str, path: str = "") -> str:
+    return f"http://{host * 56}.onion/{path}"
+
+
+def take_all(frontier: Frontier) -> list[str]:
+    urls = []
+    while frontier.empty() is False:
+        urls.append(frontier.get_nowait()[0])
+    return urls
+
+
+def test_bfs_takes_urls_in_order_once() -> None:
+    frontier = Frontier(max_depth=3)
+    assert frontier.add(url('a'), 0)
+    assert frontier.add(url('a', 'x'), 1)
+    assert frontier.add(url('b'), 1)
+    assert frontier.add(url('a', 'x'), 2) is False
+    assert frontier.add(url('c'), 3) is False
+    assert take_all(frontier) == [url('a'), url('a', 'x'), url('b')]
+    assert url('a', 'x') in frontier
+    assert url('c') not in frontier
+
+
+def test_host_budget() -> None:
+    frontier = Frontier(max_depth=3, host_budget=2)
+    assert [frontier.add(url('a', str(i)), 1) for i in range(4)] == [True, True, False, False]
+    assert frontier.add(url('b'), 1)
+    assert frontier.over_budget == 2
+    # URLs over the budget are seen, and not counted again.
+    assert frontier.add(url('a', '2'), 1) is False
+    assert frontier.over_budget == 2
+
+
+def test_unknown_strategy() -> None:
+    with pytest.raises(Exception, match="Unknown strategy"):
+        Frontier(max_depth=3, strategy='dfs')
+
+
+def test_discovery_takes_new_hosts_then_top_pages_then_shallow_pages() -> None:
+    frontier = Frontier(max_depth=5, strategy='discovery')
+    frontier.add(url('a', 'start'), 0)
+    assert take_all(frontier) == [url('a', 'start')]
+
+    frontier.add(url('a', 'x/y/z'), 1)
+    frontier.add(url('a', 'x'), 1)
+    frontier.add(url('a'), 1)
+    frontier.add(url('b', 'deep/page'), 2)
+    assert take_all(frontier) == [url('b', 'deep/page'), url('a'), url('a', 'x'), url('a', 'x/y/z')]
+
+
+def test_discovery_spreads_pages_and_favours_hosts_which_lead_to_new_hosts() -> None:
+    frontier = Frontier(max_depth=5, strategy='discovery')
+    for host in 'abc':
+        frontier.add(url(host), 0)
+    take_all(frontier)
+
+    # Pages of `a` found new hosts, pages of `b` didn't.
+    frontier.add(url('d'), 1, parent=url('a'))
+    frontier.add(url('e'), 1, parent=url('a'))
+    frontier.add(url('b', '1'), 1, parent=url('b'))
+    frontier.add(url('a', '1'), 1, parent=url('a'))
+    assert frontier.get_nowait()[0] == url('d')
+    assert frontier.get_nowait()[0] == url('e')
+    assert take_all(frontier) == [url('a', '1'), url('b', '1')]
+
+    # A host which has more pages taken comes later.
+    for i in range(2, 6):
+        frontier.add(url('b', str(i)), 1)
+    frontier.add(url('c', '1'), 1)
+    assert frontier.get_nowait()[0] == url('c', '1')
+
+
+def test_discovery_delays_failing_hosts() -> None:
+    health = HealthTracker(timeout=30, max_failures=0)
+    frontier = Frontier(max_depth=5, strategy='discovery', health=health)
+    for host in 'ab':
+        frontier.add(url(host), 0)
+    take_all(frontier)
+
+    health.record_failure(url('a')[7:-1])
+    health.record_success(url('b')[7:-1], 1.0)
+    frontier.add(url('a', '1'), 1)
+    frontier.add(url('b', '1'), 1)
+    assert take_all(frontier) == [url('b', '1'), url('a', '1')]
+
+
+def test_see_and_restore() -> None:
+    frontier = Frontier(max_depth=3, strategy='discovery')
+    # A URL crawled by another worker is not queued, and credits its parent.
+    assert frontier.see(url('b'), 1, parent=url('a'))
+    assert frontier.add(url('b'), 1) is False
+    assert frontier.yields == {url('a')[7:-1]: 1}
+    assert frontier.empty()
+
+    frontier.restore(url('c'), 0, visited=True)
+    frontier.restore(url('c', '1'), 1, visited=False)
+    assert url('c') in frontier
+    assert take_all(frontier) == [url('c', '1')]
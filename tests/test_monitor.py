@@ -0,0 +1,65 @@
+import asyncio
+import io
+from pathlib import Path
+from typing import Any
+
+from rich.console import Console
+
+from hiddenbot.crawl.fetch import FetchedResponse
+from hiddenbot.crawl.monitor import Monitor, MonitorStore, RevisitPolicy
+
+
+HOST = "a" * 56 + ".onion"
+
+
+class FakePool:
+    """
+    Pool which answers robots.txt and pages of one site.
+    """
+    def __init__(self, robots: str) -> None:
+        self.robots = robots
+        self.metrics = None
+        self.requests: list[str] = []
+
+
+    async def fetch(self, url: str, **kwargs: Any) -> FetchedResponse:
+        self.requests.append(url)
+        if url.endswith("/robots.txt"):
+            return FetchedResponse(url, 200, 'text/plain', None, self.robots.encode(), False)
+        body = b"<html><head><title>Site</title></head><body>Hello</body></html>"
+        return FetchedResponse(url, 200, 'text/html', 'utf-8', body, False)
+
+
+def check(pool: FakePool, store: MonitorStore) -> None:
+    async def main() -> None:
+        monitor = Monitor(
+            Console(file=io.StringIO()), pool, store, RevisitPolicy(),  # type: ignore[arg-type]
+            concurrency=1, delay=0, max_bytes=1024 * 1024, parser='auto')
+        await monitor.run(cycles=1, cycle_interval=0)
+
+    asyncio.run(main())
+
+
+def test_spellings_of_a_url_are_one_site(tmp_path: Path) -> None:
+    store = MonitorStore(str(tmp_path / "monitor.db"))
+    assert store.add([f"http://{HOST}", f"HTTP://{HOST.upper()}/", f"http://{HOST}:80/#top"], 0) == 1
+    assert [site.url for site in store.due(0)] == [f"http://{HOST}/"]
+    store.close()
+
+
+def test_robots_txt_is_obeyed(tmp_path: Path) -> None:
+    store = MonitorStore(str(tmp_path / "monitor.db"))
+    store.add([f"http://{HOST}/", f"http://{HOST}/private/"], 0)
+
+    pool = FakePool("User-agent: *\nDisallow: /private/\n")
+    check(pool, store)
+    assert pool.requests.count(f"http://{HOST}/robots.txt") == 1
+    assert f"http://{HOST}/private/" not in pool.requests
+
+    sites = {site.url: site for site in store.due(float('inf'))}
+    assert sites[f"http://{HOST}/"].alive is True
+    # The disallowed site is not checked, and waits for the longest interval.
+    private = sites[f"http://{HOST}/private/"]
+    assert private.checks == 0
+    assert private.next_check - private.added_at >= RevisitPolicy().max_interval
+    store.close()
@@ -0,0 +1,159 @@
+import asyncio
+from typing import Any, Optional
+
+import httpx
+import pytest
+
+from hiddenbot.crawl.fetch import FetchedResponse
+from hiddenbot.crawl.robots import RobotsCache, RobotsRules, parse_robots
+
+
+BASE_URL = "http://" + "a" * 56 + ".onion"
+
+
+class FakePool:
+    """
+    Pool which answers robots.txt with a fixed response or a transport error.
+    """
+    def __init__(self, status_code: int = 200, text: str = "", error: Optional[Exception] = None) -> None:
+        self.status_code = status_code
+        self.text = text
+        self.error = error
+        self.metrics = None
+        self.requests = 0
+
+
+    async def fetch(self, url: str, **kwargs: Any) -> FetchedResponse:
+        self.requests += 1
+        await asyncio.sleep(0)
+        if self.error is not None:
+            raise self.error
+        ok = self.status_code in kwargs['status_codes']
+        return FetchedResponse(
+            url, self.status_code, 'text/plain', None, self.text.encode() if ok else None, False)
+
+
+def rules(text: str) -> RobotsRules:
+    return RobotsRules(BASE_URL, *parse_robots(text))
+
+
+def test_our_group_is_used_instead_of_the_wildcard_group() -> None:
+    text = """
+# Rules before any user-agent are ignored.
+Disallow: /everything
+User-agent: *
+Disallow: /
+
+user-agent: OtherBot
+USER-AGENT: HiddenBot/1.0  # Our token with a version
+disallow: /private  # comment
+Allow: /private/public
+"""
+    assert parse_robots(text) == (['/private/public'], ['/private'])
+    assert parse_robots(text, 'otherbot') == (['/private/public'], ['/private'])
+    assert parse_robots(text, 'unknown') == ([], ['/'])
+    assert parse_robots("User-agent: otherbot\nDisallow: /\n") == ([], [])
+
+
+def test_groups_of_the_same_agent_are_merged() -> None:
+    text = "User-agent: hiddenbot\nDisallow: /a\n\nUser-agent: hiddenbot\nDisallow: /b\n"
+    assert parse_robots(text) == ([], ['/a', '/b'])
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("/", True),
+    ("/shop", False),
+    ("/shop/", False),
+    # The longest matching rule wins.
+    ("/shop/free/item", True),
+    ("/shop/free/item/secret", False),
+    # `Allow` wins a tie.
+    ("/tie", True),
+    ("/shop/cart?id=1", False),
+])
+def test_longest_match_wins(path: str, allowed: bool) -> None:
+    robots = rules("""
+User-agent: *
+Disallow: /shop
+Allow: /shop/free
+Disallow: /shop/free/item/secret
+Disallow: /tie
+Allow: /tie
+""")
+    assert robots.can_fetch(BASE_URL + path) is allowed
+
+
+@pytest.mark.parametrize("path, allowed", [
+    ("/file.php", False),
+    ("/dir/file.php?x=1", False),
+    ("/file.php.bak", True),
+    ("/search?q=1", False),
+    ("/search", True),
+    ("/a/b/private/c", False),
+    ("/private", True),
+    ("/img/logo.png", False),
+    ("/img/logo.png?v=2", True),
+])
+def test_wildcards(path: str, allowed: bool) -> None:
+    robots = rules("""
+User-agent: *
+Disallow: /*.php$
+Disallow: /*.php?
+Disallow: /*?q=
+Disallow: /*/private/
+Disallow: /img/*.png$
+""")
+    assert robots.can_fetch(BASE_URL + path) is allowed
+
+
+def test_empty_disallow_allows_everything() -> None:
+    robots = rules("User-agent: *\nDisallow:\n")
+    assert robots.can_fetch(BASE_URL + "/anything")
+
+
+def test_allowed_urls_are_plain_paths() -> None:
+    robots = rules("User-agent: *\nAllow: /hidden\nAllow: /*.html\nAllow: /end$\nDisallow: /\n")
+    assert robots.allowed_urls == {BASE_URL + "/hidden"}
+
+
+def get(cache: RobotsCache, path: str = "/") -> Any:
+    return asyncio.run(cache.get(BASE_URL + path))
+
+
+def test_missing_robots_is_negatively_cached() -> None:
+    pool = FakePool(status_code=404)
+    cache = RobotsCache(pool)  # type: ignore[arg-type]
+    assert get(cache) is None
+    assert get(cache, "/page") is None
+    assert pool.requests == 1
+
+
+def test_unreachable_robots_is_not_cached() -> None:
+    pool = FakePool(error=httpx.ConnectTimeout("timed out"))
+    cache = RobotsCache(pool)  # type: ignore[arg-type]
+    with pytest.raises(httpx.ConnectTimeout):
+        get(cache)
+    assert BASE_URL not in cache.entries
+    # Nothing is kept for a host which could not be reached.
+    assert cache.locks == {} and cache.waiters == {} and cache.failures == {}
+
+    # The host is asked again once it's back.
+    pool.error = None
+    pool.text = "User-agent: *\nDisallow: /private\n"
+    rules = get(cache)
+    assert rules is not None
+    assert rules.can_fetch(BASE_URL + "/private/1") is False
+    assert pool.requests == 2
+
+
+def test_waiting_requests_share_the_failure() -> None:
+    async def test() -> None:
+        pool = FakePool(error=httpx.ConnectTimeout("timed out"))
+        cache = RobotsCache(pool)  # type: ignore[arg-type]
+        results = await asyncio.gather(
+            *(cache.get(f"{BASE_URL}/{i}") for i in range(5)), return_exceptions=True)
+        assert all(isinstance(r, Exception) for r in results)
+        assert pool.requests == 1
+        assert cache.locks == {} and cache.waiters == {} and cache.failures == {}
+
+    asyncio.run(test())
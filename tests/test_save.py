@@ -0,0 +1,59 @@
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from hiddenbot.crawl.result import OnionSite
+from hiddenbot.crawl.state import CrawlState
+from hiddenbot.save import JsonlWriter
+
+
+def onion(i: int) -> OnionSite:
+    return OnionSite("title", "description", "content", f"http://{'a' * 56}.onion/{i}")
+
+
+def read_urls(path: Path) -> list[str]:
+    f = gzip.open(path, 'rt') if path.suffix == '.gz' else open(path)
+    with f:
+        return [json.loads(line)['url'] for line in f]
+
+
+@pytest.mark.parametrize("name", ["out.jsonl", "out.jsonl.gz"])
+def test_records_after_the_offset_are_cut_on_append(tmp_path: Path, name: str) -> None:
+    output = tmp_path / name
+    writer = JsonlWriter(str(output))
+    writer.write(onion(0))
+    writer.write(onion(1))
+    offset = writer.sync()
+    writer.write(onion(2))
+    writer.sync()
+    # The process dies before the next commit.
+    writer.file.close()
+
+    writer = JsonlWriter(str(output), append=True, offset=offset)
+    writer.write(onion(3))
+    writer.close()
+    assert read_urls(output) == [onion(i).url for i in (0, 1, 3)]
+
+
+def test_state_commit_saves_the_synced_offset(tmp_path: Path) -> None:
+    output = tmp_path / "out.jsonl"
+    state = CrawlState(str(tmp_path / "state.db"))
+    writer = JsonlWriter(str(output))
+    state.attach_stream(writer)
+
+    state.add_url(onion(0).url, 0)
+    writer.write(onion(0))
+    state.add_result(onion(0))
+    state.visit(onion(0).url)
+    state.commit()
+    offset = state.get_stream_offset()
+    assert offset == output.stat().st_size
+
+    # Records written after the commit are beyond the saved offset.
+    writer.write(onion(1))
+    writer.sync()
+    assert offset < output.stat().st_size
+    writer.close()
+    state.conn.close()
@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from hiddenbot.crawl.scheduler import HostScheduler
+
+
+DELAY = 0.2
+
+
+def host(i: int) -> str:
+    return chr(ord('a') + i) * 56 + ".onion"
+
+
+def url(i: int, path: str = "") -> str:
+    return f"http://{host(i)}/{path}"
+
+
+async def request(scheduler: HostScheduler, url: str, started: list[float]) -> None:
+    async with scheduler.slot(url):
+        started.append(time.monotonic())
+
+
+def test_requests_to_a_host_are_spaced_by_the_delay() -> None:
+    async def main() -> None:
+        scheduler = HostScheduler(concurrency=16, delay=DELAY, max_connections_per_host=4)
+        started: list[float] = []
+        begin = time.monotonic()
+        await asyncio.gather(*(request(scheduler, url(0, str(i)), started) for i in range(3)))
+        started.sort()
+        assert started[0] - begin < DELAY / 2
+        for previous, current in zip(started, started[1:]):
+            assert current - previous >= DELAY * 0.9
+
+        _, requests, wait_time, _ = scheduler.report()[0]
+        assert requests == 3 and wait_time >= DELAY * 0.9 * 3
+
+    asyncio.run(main())
+
+
+def test_other_hosts_are_not_delayed() -> None:
+    async def main() -> None:
+        scheduler = HostScheduler(concurrency=16, delay=DELAY, max_connections_per_host=4)
+        started: list[float] = []
+        begin = time.monotonic()
+        await asyncio.gather(*(request(scheduler, url(i), started) for i in range(5)))
+        assert max(started) - begin < DELAY / 2
+
+    asyncio.run(main())
+
+
+def test_restored_host_waits_out_its_delay() -> None:
+    async def main() -> None:
+        scheduler = HostScheduler(concurrency=16, delay=DELAY, max_connections_per_host=4)
+        scheduler.restore(host(0), time.time())
+        started: list[float] = []
+        begin = time.monotonic()
+        await request(scheduler, url(0), started)
+        assert started[0] - begin >= DELAY * 0.9
+
+    asyncio.run(main())
+
+
+def test_connections_are_capped_per_host_and_in_total() -> None:
+    async def main() -> None:
+        scheduler = HostScheduler(concurrency=3, delay=0, max_connections_per_host=2)
+        active: dict[str, int] = {}
+        peaks: dict[str, int] = {}
+        total_peak = 0
+
+        async def hold(i: int, path: int) -> None:
+            nonlocal total_peak
+            async with scheduler.slot(url(i, str(path))):
+                active[host(i)] = active.get(host(i), 0) + 1
+                peaks[host(i)] = max(peaks.get(host(i), 0), active[host(i)])
+                total_peak = max(total_peak, sum(active.values()))
+                await asyncio.sleep(0.01)
+                active[host(i)] -= 1
+
+        await asyncio.gather(*(hold(i, path) for i in range(3) for path in range(4)))
+        assert max(peaks.values()) == 2 and total_peak == 3
+
+    asyncio.run(main())
@@ -0,0 +1,52 @@
+import asyncio
+import io
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from rich.console import Console
+
+from hiddenbot.crawl.fetch import FetchedResponse
+from hiddenbot.crawl.seed import Seeder
+
+
+# Result pages per query. The first page of both queries is the same.
+RESULTS = {
+    'a': [range(0, 10), range(10, 20)],
+    'b': [range(0, 10), range(20, 30)],
+}
+
+
+def result_url(i: int) -> str:
+    return f"http://{'b' * 50}{i:06d}.onion/"
+
+
+class FakePool:
+    """
+    Pool which answers Torch queries with pages of `RESULTS`, and empty pages after them.
+    """
+    def __init__(self) -> None:
+        self.requests: list[tuple[str, int]] = []
+
+
+    async def fetch(self, url: str, **kwargs: Any) -> FetchedResponse:
+        params = parse_qs(urlsplit(url).query)
+        query, page = params['P'][0], int(params['TOPDOC'][0]) // 10
+        self.requests.append((query, page))
+        await asyncio.sleep(0)
+        pages = RESULTS[query]
+        links = "".join(f'<a href="{result_url(i)}">r</a>' for i in (pages[page] if page < len(pages) else []))
+        body = f"<html><body>{links}</body></html>".encode()
+        return FetchedResponse(url, 200, 'text/html', 'utf-8', body, False)
+
+
+def test_paging_stops_per_engine_and_query() -> None:
+    pool = FakePool()
+    seeder = Seeder(
+        Console(file=io.StringIO()), pool, queries=['a', 'b'], engines=['Torch'],  # type: ignore[arg-type]
+        max_pages=5, delay=0)
+    urls = asyncio.run(seeder.harvest())
+
+    # The page repeated by the second query doesn't stop it before its new results.
+    assert sorted(urls) == [result_url(i) for i in range(30)]
+    # Each query stops at its first empty page.
+    assert sorted(pool.requests) == [('a', 0), ('a', 1), ('a', 2), ('b', 0), ('b', 1), ('b', 2)]
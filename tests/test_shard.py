@@ -0,0 +1,13 @@
+from hiddenbot.crawl.canonical import parse_hostname
+from hiddenbot.crawl.shard import shard_of
+
+
+HOST = "a" * 56 + ".onion"
+
+
+def test_spellings_of_a_host_are_in_one_shard() -> None:
+    urls = [f"http://{HOST}/", f"http://{HOST.upper()}:8080/a", f"http://user@{HOST}/?q=1#top"]
+    assert len({shard_of(url, 16) for url in urls}) == 1
+    assert len({shard_of(f"http://{i:056d}.onion/", 16) for i in range(100)}) == 16
+    assert all(parse_hostname(url) == HOST for url in urls)
+
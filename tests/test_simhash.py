@@ -0,0 +1,62 @@
+import random
+
+import pytest
+
+from hiddenbot.crawl.simhash import SIMHASH_BITS, SIMHASH_MIN_WORDS, SimHashIndex, simhash
+
+
+def flip(h: int, bits: list[int]) -> int:
+    for bit in bits:
+        h ^= 1 << bit
+    return h
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 3, 7])
+def test_bands_cover_all_bits(max_distance: int) -> None:
+    index = SimHashIndex(max_distance)
+    h = random.Random(max_distance).getrandbits(SIMHASH_BITS)
+    bands = index.bands(h)
+    assert len(bands) == max_distance + 1
+    assert sum(band << (i * index.band_bits) for i, band in enumerate(bands)) == h
+
+
+@pytest.mark.parametrize("max_distance", [0, 1, 3, 7])
+def test_near_duplicates_are_always_found(max_distance: int) -> None:
+    rnd = random.Random(max_distance)
+    index = SimHashIndex(max_distance)
+    hashes = [rnd.getrandbits(SIMHASH_BITS) for _ in range(200)]
+    for i, h in enumerate(hashes):
+        index.add(h, str(i))
+    assert len(index) == len(hashes)
+
+    for i, h in enumerate(hashes):
+        # Flipped bits anywhere, including several in one band, are within the distance.
+        near = flip(h, rnd.sample(range(SIMHASH_BITS), rnd.randint(0, max_distance)))
+        assert index.find(near) == str(i)
+        far = flip(h, rnd.sample(range(SIMHASH_BITS), max_distance + 1))
+        assert index.find(far) != str(i)
+
+
+def test_closest_is_found() -> None:
+    index = SimHashIndex(3)
+    index.add(flip(0, [1, 2, 3]), "far")
+    index.add(flip(0, [40]), "near")
+    index.add(flip(0, [50, 60]), "middle")
+    assert index.find(0) == "near"
+    assert index.find(flip(0, [10, 20, 30, 63])) is None
+
+
+def test_simhash_of_similar_texts() -> None:
+    rnd = random.Random(0)
+    words = [rnd.choice(["market", "escrow", "vendor", "shipping", "bitcoin", "forum", "login"]) + str(i)
+             for i in range(300)]
+    text = " ".join(words)
+    edited = " ".join(words[:150] + ["changed"] + words[151:])
+    other = " ".join(reversed(words))
+
+    h = simhash(text)
+    assert h is not None
+    assert h == simhash(text.upper())
+    assert (h ^ (simhash(edited) or 0)).bit_count() <= 3
+    assert (h ^ (simhash(other) or 0)).bit_count() > 10
+    assert simhash(" ".join(words[:SIMHASH_MIN_WORDS - 1])) is None
@@ -0,0 +1,228 @@
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+import httpx
+import pytest
+
+from hiddenbot.crawl.health import HealthTracker
+from hiddenbot.tor import CIRCUIT_MIN_REQUESTS, TorPool, is_circuit_error
+
+
+# SOCKS5 replies
+SOCKS_SUCCEEDED = 0x00
+SOCKS_GENERAL_FAILURE = 0x01
+SOCKS_HOST_UNREACHABLE = 0x04
+
+
+class FakeSocks:
+    """
+    SOCKS5 proxy which answers HTTP itself, and records the credentials of each connection.
+    """
+    def __init__(self) -> None:
+        self.connections: list[tuple[Optional[str], Optional[str], str]] = []
+        # SOCKS replies per host and per username instead of success
+        self.host_replies: dict[str, int] = {}
+        self.username_replies: dict[str, int] = {}
+        # Seconds before the response per host
+        self.delays: dict[str, float] = {}
+        self.port = 0
+
+
+    async def start(self) -> None:
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+
+    def usernames(self, host: str) -> set[Optional[str]]:
+        return {username for username, _, h in self.connections if h == host}
+
+
+    def passwords(self, username: str) -> set[Optional[str]]:
+        return {password for u, password, _ in self.connections if u == username}
+
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            _, num_methods = await reader.readexactly(2)
+            methods = await reader.readexactly(num_methods)
+            username = password = None
+            if 2 in methods:
+                writer.write(b"\x05\x02")
+                await reader.readexactly(1)
+                username = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+                password = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+                writer.write(b"\x01\x00")
+            else:
+                writer.write(b"\x05\x00")
+
+            await reader.readexactly(4)
+            host = (await reader.readexactly((await reader.readexactly(1))[0])).decode()
+            await reader.readexactly(2)
+            self.connections.append((username, password, host))
+
+            reply = self.host_replies.get(host, self.username_replies.get(username or "", SOCKS_SUCCEEDED))
+            writer.write(bytes([5, reply, 0, 1]) + b"\0" * 6)
+            await writer.drain()
+            if reply != SOCKS_SUCCEEDED:
+                return
+
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            await asyncio.sleep(self.delays.get(host, 0))
+            body = b"<html><head><title>fake</title></head><body></body></html>"
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nConnection: close\r\n"
+                + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def run(test: Callable[[FakeSocks], Awaitable[None]]) -> None:
+    """
+    Run a test coroutine with a fake proxy started for it.
+    """
+    async def main() -> None:
+        proxy = FakeSocks()
+        await proxy.start()
+        try:
+            await test(proxy)
+        finally:
+            await proxy.stop()
+    asyncio.run(main())
+
+
+def host(i: int) -> str:
+    return f"{'a' * 50}{i:06d}.onion"
+
+
+async def fetch_ok(pool: TorPool, url: str) -> bool:
+    try:
+        await pool.fetch(url)
+    except httpx.TransportError:
+        return False
+    return True
+
+
+def test_hosts_stick_to_their_circuits() -> None:
+    async def test(proxy: FakeSocks) -> None:
+        pool = TorPool([('127.0.0.1', str(proxy.port))], circuits=4)
+        hosts = [host(i) for i in range(20)]
+        for _ in range(2):
+            for h in hosts:
+                assert await fetch_ok(pool, f"http://{h}/")
+        await pool.close()
+
+        # Requests to a host reuse the circuit of the host, and hosts are spread over the circuits.
+        assert all(len(proxy.usernames(h)) == 1 for h in hosts)
+        assert len(set.union(*(proxy.usernames(h) for h in hosts))) > 1
+
+    run(test)
+
+
+def test_failing_circuit_is_rotated() -> None:
+    async def test(proxy: FakeSocks) -> None:
+        pool = TorPool([('127.0.0.1', str(proxy.port))], circuits=2)
+        url = f"http://{host(1)}/"
+        circuit = pool.pick(url)
+        assert circuit.isolation is not None
+        old_client = circuit.client
+        proxy.username_replies[circuit.isolation] = SOCKS_GENERAL_FAILURE
+
+        for _ in range(CIRCUIT_MIN_REQUESTS):
+            assert await fetch_ok(pool, url) is False
+        # New credentials give new circuits, and the old client is closed.
+        assert circuit.client is not old_client
+        assert old_client.is_closed
+        assert circuit.samples == 0
+
+        del proxy.username_replies[circuit.isolation]
+        assert await fetch_ok(pool, url)
+        assert len(proxy.passwords(circuit.isolation)) == 2
+        await pool.close()
+
+    run(test)
+
+
+def test_dead_host_does_not_rotate_its_circuit() -> None:
+    async def test(proxy: FakeSocks) -> None:
+        pool = TorPool([('127.0.0.1', str(proxy.port))], circuits=2)
+        url = f"http://{host(2)}/"
+        proxy.host_replies[host(2)] = SOCKS_HOST_UNREACHABLE
+        circuit = pool.pick(url)
+        old_client = circuit.client
+
+        for _ in range(CIRCUIT_MIN_REQUESTS * 2):
+            assert await fetch_ok(pool, url) is False
+        assert circuit.client is old_client
+        assert circuit.requests == CIRCUIT_MIN_REQUESTS * 2
+        assert circuit.errors == 0
+        assert circuit.error_rate == 0
+        await pool.close()
+
+    run(test)
+
+
+def test_broken_circuit_does_not_open_the_breakers_of_its_hosts() -> None:
+    async def test(proxy: FakeSocks) -> None:
+        health = HealthTracker(timeout=30, max_failures=2)
+        pool = TorPool([('127.0.0.1', str(proxy.port))], circuits=2, health=health)
+        url = f"http://{host(4)}/"
+        circuit = pool.pick(url)
+        assert circuit.isolation is not None
+        proxy.username_replies[circuit.isolation] = SOCKS_GENERAL_FAILURE
+        for _ in range(3):
+            assert await fetch_ok(pool, url) is False
+        assert health.is_open(host(4)) is False
+        assert health.get_host(host(4)).failures == 0
+
+        # A dead host opens its breaker.
+        proxy.host_replies[host(5)] = SOCKS_HOST_UNREACHABLE
+        for _ in range(2):
+            assert await fetch_ok(pool, f"http://{host(5)}/") is False
+        assert health.is_open(host(5))
+        await pool.close()
+
+    run(test)
+
+
+def test_retired_client_is_closed_when_its_requests_are_over() -> None:
+    async def test(proxy: FakeSocks) -> None:
+        pool = TorPool([('127.0.0.1', str(proxy.port))], circuits=2)
+        url = f"http://{host(3)}/"
+        proxy.delays[host(3)] = 0.2
+        circuit = pool.pick(url)
+        old_client = circuit.client
+
+        request = asyncio.create_task(fetch_ok(pool, url))
+        while len(proxy.connections) == 0:
+            await asyncio.sleep(0.01)
+        await circuit.rotate()
+        assert old_client.is_closed is False
+        assert old_client in circuit.retired_clients
+
+        assert await request
+        assert old_client.is_closed
+        assert circuit.retired_clients == []
+        await pool.close()
+
+    run(test)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (httpx.ProxyError("Proxy Server could not connect: General SOCKS server failure."), True),
+    (httpx.ProxyError("Proxy Server could not connect: Host unreachable."), False),
+    (httpx.ProxyError("Proxy Server could not connect: TTL expired."), False),
+    (httpx.ConnectError("Connection refused"), True),
+    (httpx.ConnectTimeout("timed out"), False),
+    (httpx.ReadTimeout("timed out"), False),
+])
+def test_circuit_errors(error: Exception, expected: bool) -> None:
+    assert is_circuit_error(error) is expected